@@ -0,0 +1,549 @@
+"""Synthetic stand-in for the reegis modules used by scenario_builder.
+
+The fake modules generate deterministic tables (power plants, heat profiles,
+balances, prices...) of a configurable size, so the builders can be
+benchmarked without any data download. Call :func:`install` before
+scenario_builder is imported.
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import calendar
+import configparser
+import os
+import sys
+import types
+import zlib
+
+import numpy as np
+import pandas as pd
+
+FEDERAL_STATES = [
+    "BB", "BE", "BW", "BY", "HB", "HE", "HH", "MV",
+    "NI", "NW", "RP", "SH", "SL", "SN", "ST", "TH",
+]  # fmt: skip
+
+# OPSD name: (share of units, mean capacity in MW, mean efficiency)
+PP_FUELS = {
+    "Bioenergy": (0.30, 2.0, 0.35),
+    "Geothermal": (0.01, 5.0, 0.10),
+    "Hard coal": (0.03, 300.0, 0.40),
+    "Hydro": (0.10, 5.0, 0.85),
+    "Lignite": (0.01, 600.0, 0.38),
+    "Natural gas": (0.10, 80.0, 0.50),
+    "Nuclear": (0.002, 1300.0, 0.33),
+    "Oil": (0.03, 40.0, 0.35),
+    "Other fossil fuels": (0.02, 30.0, 0.35),
+    "Solar": (0.20, 1.0, 1.0),
+    "Waste": (0.02, 20.0, 0.30),
+    "Wind": (0.178, 2.5, 1.0),
+}
+
+CHP_FUELS = ["bioenergy", "gas", "hard coal", "lignite", "oil", "other"]
+HEAT_FUELS = ["district heating", "natural gas", "gas", "oil", "coal", "re"]
+HEAT_SECTORS = ["domestic", "retail", "industrial"]
+FEEDIN_TYPES = ["geothermal", "hydro", "solar", "wind"]
+RE_TYPES = ["bioenergy", "geothermal", "solar", "water", "wind"]
+COMMODITIES = [
+    "bioenergy",
+    "hard coal",
+    "lignite",
+    "natural gas",
+    "nuclear",
+    "oil",
+    "other",
+    "waste",
+]
+VEHICLE_TYPES = [
+    "motorcycle",
+    "passenger car",
+    "small truck (max. 3.5 tons)",
+    "big truck (over 7.5 tons)",
+    "buses",
+]
+
+CONFIG = """
+[paths]
+powerplants = {path}
+demand = {path}
+general = {path}
+feedin = {path}
+entsoe = {path}
+
+[entsoe]
+timeseries_version = fake
+load_file = entsoe_load_DE_{{version}}.h5
+
+[powerplants]
+deflex_pp = deflex_pp_{{map}}.h5
+remove_phes = True
+
+[creator]
+group_transformer = False
+round = 1
+limited_transformer = bioenergy
+use_variable_costs = False
+use_downtime_factor = False
+heat = True
+separate_heat_regions =
+local_fuels = district heating
+costs_source = reegis
+use_CO2_costs = True
+mobility_other = petrol
+
+[general]
+mobility_other = petrol
+
+[source_names]
+Bioenergy = bioenergy
+Geothermal = geothermal
+Hard coal = hard coal
+Hydro = hydro
+Lignite = lignite
+Natural gas = natural gas
+Nuclear = nuclear
+Oil = oil
+Other fossil fuels = other
+Solar = solar
+Waste = waste
+Wind = wind
+
+[source_groups]
+waste = other
+
+[model_classes]
+bioenergy = power plants
+geothermal = volatile plants
+hard coal = power plants
+hydro = volatile plants
+lignite = power plants
+natural gas = power plants
+nuclear = power plants
+oil = power plants
+other = power plants
+solar = volatile plants
+wind = volatile plants
+
+[fuel consumption]
+motorcycle = 0.045, 0.045, 0
+passenger car = 0.067, 0.079, 0
+small truck (max. 3.5 tons) = 0.288, 0.115, 0
+big truck (over 7.5 tons) = 0.288, 0.115, 0
+buses = 0.29, 0.18, 0
+
+[energy_per_liter]
+diesel = 34.7
+petrol = 31.2
+other = 0
+
+[mobility: diesel]
+efficiency = 0.95
+source = oil
+source region = DE
+
+[mobility: petrol]
+efficiency = 0.95
+source = oil
+source region = DE
+
+[mobility: electricity]
+efficiency = 1.0
+source = electricity
+source region = DE
+"""
+
+
+class Dataset:
+    """Size and seed of the synthetic data set.
+
+    Parameters
+    ----------
+    path : str
+        Directory for files the builders write or read (e.g. the pp table).
+    n_regions : int
+        Number of regions. With 16 regions the federal states are used.
+    n_plants : int
+        Number of power plant units.
+    seed : int
+        Seed of the random generator. Equal seeds create equal tables.
+    """
+
+    def __init__(self, path, n_regions=16, n_plants=30000, seed=42):
+        self.path = path
+        self.seed = seed
+        self.resize(n_regions, n_plants)
+
+    def resize(self, n_regions, n_plants):
+        """Change the size of all tables created afterwards."""
+        self.n_regions = n_regions
+        self.n_plants = n_plants
+        if n_regions == len(FEDERAL_STATES):
+            self.name = "federal_states"
+            self.region_ids = list(FEDERAL_STATES)
+        else:
+            self.name = "r{0}".format(n_regions)
+            self.region_ids = [
+                "R{0:03d}".format(n + 1) for n in range(n_regions)
+            ]
+
+    def rng(self, *key):
+        """Return a random generator for the given key, e.g. a year."""
+        return np.random.RandomState(
+            zlib.crc32(repr((self.seed,) + key).encode())
+        )
+
+    def regions(self):
+        """A region table with the region ids as index (no geometries)."""
+        regions = pd.DataFrame(
+            {"area": self.rng(0).uniform(400, 30000, self.n_regions)},
+            index=pd.Index(self.region_ids, name="region"),
+        )
+        regions.name = self.name
+        return regions
+
+    def powerplants(self, name=None):
+        """A reegis-like unit table with regions added."""
+        rng = np.random.RandomState(self.seed)
+        fuels = list(PP_FUELS)
+        share = np.array([PP_FUELS[f][0] for f in fuels])
+        fuel_idx = rng.choice(len(fuels), self.n_plants, p=share / share.sum())
+        capacity = np.array([PP_FUELS[f][1] for f in fuels])[fuel_idx]
+        capacity = capacity * rng.lognormal(0, 0.5, self.n_plants)
+        efficiency = np.array([PP_FUELS[f][2] for f in fuels])[fuel_idx]
+        efficiency = np.clip(
+            efficiency * rng.normal(1, 0.05, self.n_plants), 0.05, 1
+        )
+        com_year = rng.randint(1960, 2020, self.n_plants)
+        technology = np.where(
+            np.array(fuels)[fuel_idx] == "Hydro",
+            np.where(
+                rng.uniform(size=self.n_plants) < 0.2,
+                "Pumped storage",
+                "Run-of-river",
+            ),
+            np.where(
+                np.array(fuels)[fuel_idx] == "Wind",
+                np.where(
+                    rng.uniform(size=self.n_plants) < 0.1,
+                    "Offshore",
+                    "Onshore",
+                ),
+                "Steam turbine",
+            ),
+        )
+        regions = np.array(self.region_ids)
+        region_idx = rng.randint(0, self.n_regions, self.n_plants)
+        states = np.array(FEDERAL_STATES)[
+            region_idx * len(FEDERAL_STATES) // self.n_regions
+        ]
+        pp = pd.DataFrame(
+            {
+                "energy_source_level_2": np.array(fuels)[fuel_idx],
+                "technology": technology,
+                "capacity": capacity.round(3),
+                "capacity_in": (capacity / efficiency).round(3),
+                "efficiency": efficiency,
+                "com_year": com_year,
+                "com_month": rng.randint(1, 13, self.n_plants),
+                "decom_year": com_year + rng.randint(20, 70, self.n_plants),
+                name or self.name: regions[region_idx],
+                "federal_states": states,
+            }
+        )
+        return pp
+
+    def hours(self, year):
+        return 8784 if calendar.isleap(year) else 8760
+
+    def time_index(self, year):
+        return pd.date_range(
+            "{0}-01-01".format(year),
+            periods=self.hours(year),
+            freq="h",
+            tz="Europe/Berlin",
+        )
+
+    def profiles(self, year, n_columns, key):
+        """Non-negative hourly profiles with a daily and an annual cycle."""
+        hours = np.arange(self.hours(year))
+        rng = self.rng(key, year)
+        base = (
+            1.2
+            + np.cos(2 * np.pi * hours / len(hours))[:, None]
+            + 0.3 * np.sin(2 * np.pi * hours / 24)[:, None]
+        )
+        noise = rng.uniform(0.8, 1.2, (len(hours), n_columns))
+        return base * noise * rng.uniform(0.5, 2, n_columns)
+
+    def heat_profiles(self, year):
+        cols = pd.MultiIndex.from_product(
+            [self.region_ids, HEAT_FUELS, HEAT_SECTORS]
+        )
+        return pd.DataFrame(
+            self.profiles(year, len(cols), "heat"),
+            index=self.time_index(year),
+            columns=cols,
+        )
+
+    def entsoe_load(self, year, version=None):
+        """Write the German load of 2000-2030 like reegis and return a year."""
+        filename = os.path.join(
+            self.path, "entsoe_load_DE_{0}.h5".format(version or "fake")
+        )
+        if not os.path.isfile(filename):
+            index = pd.date_range(
+                "2000-01-01", "2031-01-01", freq="h", tz="UTC"
+            ).tz_convert("Europe/Berlin")
+            hours = np.arange(len(index))
+            load = 55000 * (
+                1.2
+                + np.cos(2 * np.pi * hours / 8766)
+                + 0.3 * np.sin(2 * np.pi * hours / 24)
+            )
+            load *= self.rng("load").uniform(0.9, 1.1, len(load))
+            pd.DataFrame({"DE_load_": load}, index=index).to_hdf(
+                filename, key="entsoe"
+            )
+        load = pd.read_hdf(filename, "entsoe")
+        return load.loc[str(year)]
+
+    def ego_demand(self):
+        return pd.Series(
+            self.rng("ego").uniform(1e6, 2e7, self.n_regions),
+            index=self.region_ids,
+        )
+
+    def feedin(self, year):
+        cols = pd.MultiIndex.from_product([self.region_ids, FEEDIN_TYPES])
+        values = self.profiles(year, len(cols), "feedin")
+        return pd.DataFrame(values / values.max(axis=0), columns=cols)
+
+    def transformation_balance(self, year):
+        rows = [
+            "Heizkraftwerke der allgemeinen Versorgung (nur KWK)",
+            "Heizwerke",
+        ]
+        idx = pd.MultiIndex.from_product([self.region_ids, ["input"], rows])
+        columns = [f if f != "bioenergy" else "re" for f in CHP_FUELS]
+        cb = pd.DataFrame(
+            self.rng("cb", year).uniform(0, 1000, (len(idx), len(columns))),
+            index=idx,
+            columns=columns,
+        )
+        cb["district heating"] = cb.sum(axis=1) * 0.01
+        cb["electricity"] = cb.sum(axis=1) * 0.01
+        cb["total"] = cb.sum(axis=1)
+        return cb
+
+    def chp_share_and_efficiency(self, cb):
+        regions = cb.index.get_level_values(0).unique()
+        rng = self.rng("eta")
+        eta = {}
+        for region in regions:
+            fuel_share = cb.loc[[region]]
+            eta[region] = {
+                "sys_heat": rng.uniform(0.85, 0.95),
+                "hp": rng.uniform(0.85, 0.95),
+                "heat_chp": rng.uniform(0.4, 0.5),
+                "elec_chp": rng.uniform(0.3, 0.4),
+                "fuel_share": fuel_share.div(fuel_share.total.sum()),
+                "out_share_factor_chp": rng.uniform(0.8, 1),
+                "out_share_factor_hp": rng.uniform(1, 1.2),
+            }
+        return eta
+
+    def re_energy_capacity(self):
+        years = range(1990, 2051)
+        cols = pd.MultiIndex.from_product([RE_TYPES, ["capacity", "energy"]])
+        return pd.DataFrame(
+            self.rng("bmwi").uniform(1000, 50000, (len(years), len(cols))),
+            index=years,
+            columns=cols,
+        )
+
+    def commodity_sources(self):
+        years = range(1990, 2051)
+        cols = pd.MultiIndex.from_product([COMMODITIES, ["costs", "emission"]])
+        values = self.rng("cs").uniform(1e-9, 1e-8, (len(years), len(cols)))
+        cs = pd.DataFrame(values, index=years, columns=cols)
+        cs.loc[cs.index != 2014, ("nuclear", "emission")] = np.nan
+        return cs
+
+    def storages(self):
+        """Pumped hydro storages in every second region."""
+        regions = self.region_ids[::2]
+        rng = self.rng("storages")
+        turbine = rng.uniform(50, 1500, len(regions))
+        return pd.DataFrame(
+            {
+                "energy": turbine * rng.uniform(4, 8, len(regions)),
+                "energy_inflow": 0.0,
+                "pump": turbine * 0.95,
+                "turbine": turbine,
+                "pump_eff": 0.88,
+                "turbine_eff": 0.88,
+            },
+            index=pd.Index(regions, name="region"),
+        )
+
+    def inhabitants(self, year):
+        return pd.Series(
+            self.rng("inhabitants", year).randint(
+                500000, 18000000, self.n_regions
+            ),
+            index=pd.Index(self.region_ids, name="region"),
+        )
+
+    def mileage(self, year):
+        return pd.DataFrame(
+            self.rng("mileage", year).uniform(1e9, 1e11, (5, 3)),
+            index=VEHICLE_TYPES,
+            columns=["diesel", "petrol", "other"],
+        )
+
+
+def _config_module(path):
+    cfg = configparser.RawConfigParser()
+    cfg.optionxform = str
+    cfg.read_string(CONFIG.format(path=path))
+
+    def get(section, key):
+        for conv in (cfg.getint, cfg.getfloat, cfg.getboolean):
+            try:
+                return conv(section, key)
+            except ValueError:
+                pass
+        value = cfg.get(section, key)
+        return None if value == "None" else value
+
+    def get_list(section, parameter, sep=",", string=False):
+        value = get(section, parameter)
+        if isinstance(value, str):
+            return [x.strip() for x in value.split(sep) if len(x) > 0]
+        return [value]
+
+    module = types.ModuleType("reegis.config")
+    module.cfg = cfg
+    module.init = lambda *args, **kwargs: None
+    module.has_option = cfg.has_option
+    module.has_section = cfg.has_section
+    module.get = get
+    module.get_list = get_list
+    module.get_dict = lambda s: {k: get(s, k) for k in cfg.options(s)}
+    module.get_dict_list = lambda s, string=False: {
+        k: get_list(s, k) for k in cfg.options(s)
+    }
+    module.tmp_set = cfg.set
+    return module
+
+
+def _module(name, **functions):
+    module = types.ModuleType("reegis." + name)
+    for key, func in functions.items():
+        setattr(module, key, func)
+    return module
+
+
+def install(path, n_regions=16, n_plants=30000, seed=42):
+    """Register fake reegis modules in sys.modules and return the dataset.
+
+    Must be called before scenario_builder (or the real reegis) is imported.
+    """
+    if "reegis" in sys.modules and not getattr(
+        sys.modules["reegis"], "FAKE", False
+    ):
+        raise RuntimeError("The real reegis package is already imported.")
+    os.makedirs(path, exist_ok=True)
+    ds = Dataset(path, n_regions=n_regions, n_plants=n_plants, seed=seed)
+
+    def add_regions_to_powerplants(
+        region, column, filename=None, dump=True, pp=None
+    ):
+        if pp is None:
+            return ds.powerplants(column)
+        return pp
+
+    def get_heat_profiles_by_region(
+        regions, year, name="region", from_csv=None, to_csv=None, **kwargs
+    ):
+        return ds.heat_profiles(kwargs.get("weather_year") or year)
+
+    modules = {
+        "config": _config_module(path),
+        "tools": _module("tools", download_file=lambda *a, **k: None),
+        "geometries": _module(
+            "geometries", get_federal_states_polygon=lambda: ds.regions()
+        ),
+        "powerplants": _module(
+            "powerplants",
+            add_regions_to_powerplants=add_regions_to_powerplants,
+            calculate_chp_share_and_efficiency=(
+                lambda eb, fix_total=True: ds.chp_share_and_efficiency(eb)
+            ),
+        ),
+        "energy_balance": _module(
+            "energy_balance",
+            get_transformation_balance_by_region=(
+                lambda regions, year, name="region", fix=False: (
+                    ds.transformation_balance(year)
+                )
+            ),
+        ),
+        "demand_heat": _module(
+            "demand_heat",
+            get_heat_profiles_by_region=get_heat_profiles_by_region,
+        ),
+        "entsoe": _module("entsoe", get_entsoe_load=ds.entsoe_load),
+        "openego": _module(
+            "openego",
+            get_ego_demand_by_region=lambda regions, name, **kwargs: (
+                ds.ego_demand()
+            ),
+        ),
+        "coastdat": _module(
+            "coastdat",
+            scenario_feedin=(
+                lambda year, name, weather_year=None, feedin_ts=None: (
+                    ds.feedin(weather_year or year)
+                )
+            ),
+            get_feedin_per_region=lambda *args, **kwargs: None,
+        ),
+        "bmwi": _module(
+            "bmwi",
+            bmwi_re_energy_capacity=ds.re_energy_capacity,
+            get_annual_electricity_demand_bmwi=lambda year: 520 + year % 7,
+        ),
+        "commodity_sources": _module(
+            "commodity_sources", get_commodity_sources=ds.commodity_sources
+        ),
+        "mobility": _module(
+            "mobility", get_mileage_by_type_and_fuel=ds.mileage
+        ),
+        "inhabitants": _module(
+            "inhabitants",
+            get_inhabitants_by_region=lambda year, geo, name: (
+                ds.inhabitants(year)
+            ),
+        ),
+        "storages": _module(
+            "storages",
+            pumped_hydroelectric_storage_by_region=lambda *args: (
+                ds.storages()
+            ),
+        ),
+    }
+    package = types.ModuleType("reegis")
+    package.__path__ = []
+    package.FAKE = True
+    package.__version__ = "fake"
+    sys.modules["reegis"] = package
+    for name, module in modules.items():
+        setattr(package, name, module)
+        sys.modules["reegis." + name] = module
+    return ds
@@ -0,0 +1,99 @@
+"""Measure the import time of the scenario_builder modules.
+
+Every module is imported in a fresh interpreter. Besides the wall time the
+heavy third-party packages that were actually executed during the import are
+reported. Modules that are deferred with ``scenario_builder.lazy`` are not
+counted.
+
+Usage::
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 scenario_builder.mobility
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = (
+    "scenario_builder",
+    "scenario_builder.settings",
+    "scenario_builder.commodity",
+    "scenario_builder.data",
+    "scenario_builder.demand",
+    "scenario_builder.feedin",
+    "scenario_builder.mobility",
+    "scenario_builder.powerplants",
+    "scenario_builder.storages",
+)
+
+HEAVY = (
+    "geopandas",
+    "shapely",
+    "pvlib",
+    "windpowerlib",
+    "demandlib",
+    "matplotlib",
+    "tables",
+    "requests",
+)
+
+_SCRIPT = """
+import importlib, json, sys, time
+heavy = {heavy!r}
+start = time.perf_counter()
+importlib.import_module({module!r})
+wall = time.perf_counter() - start
+loaded = set()
+for name, mod in list(sys.modules.items()):
+    top = name.split(".")[0]
+    if type(mod).__name__ == "_LazyModule":
+        continue
+    if top in heavy or name.startswith("reegis."):
+        loaded.add(name if top == "reegis" else top)
+print(json.dumps({{"time": wall, "loaded": sorted(loaded)}}))
+"""
+
+
+def import_time(module, repeat=3):
+    """Return the best import time [s] and the loaded heavy modules."""
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SCRIPT.format(heavy=HEAVY, module=module)],
+            check=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        if result["time"] < best:
+            best, loaded = result["time"], result["loaded"]
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("modules", nargs="*", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    for module in args.modules:
+        wall, loaded = import_time(module, repeat=args.repeat)
+        print(
+            "{0:<30} {1:7.3f} s  {2}".format(
+                module, wall, ", ".join(loaded) or "-"
+            ),
+            flush=True,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
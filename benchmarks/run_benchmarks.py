@@ -0,0 +1,244 @@
+"""Offline benchmarks of the scenario builders.
+
+All reegis functions are replaced by the synthetic stand-in of
+``fake_reegis.py``, so the benchmarks run without network access or any
+downloaded data. For each builder and size the best wall time of all repeats
+and the peak memory (tracemalloc) of one extra run are reported.
+
+Usage::
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes federal_states r500 \\
+        --output new.csv --compare old.csv
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import fake_reegis
+import pandas as pd
+
+# name: (number of regions, number of power plant units)
+SIZES = {
+    "federal_states": (16, 30000),
+    "r100": (100, 80000),
+    "r250": (250, 120000),
+    "r500": (500, 200000),
+}
+
+
+def _benchmarks(ds):
+    """Return a dictionary {name: setup} for the given dataset.
+
+    Each setup function prepares (untimed) the inputs and returns a callable
+    that runs the builder once.
+    """
+    from scenario_builder import commodity
+    from scenario_builder import demand
+    from scenario_builder import mobility
+    from scenario_builder import powerplants
+    from scenario_builder import settings
+
+    conf = settings.snapshot()
+    regions = ds.regions()
+    year = 2014
+    raw_pp = ds.powerplants()
+    pp_file = os.path.join(ds.path, "deflex_pp_{0}.h5".format(ds.name))
+
+    def pp_by_year():
+        pp = powerplants.get_deflex_pp_by_year(
+            regions, year, ds.name, overwrite_capacity=True, conf=conf
+        )
+        return pp
+
+    def tables_with_chp():
+        tables = powerplants.create_powerplants(
+            pp_by_year(), {}, year, ds.name, conf=conf
+        )
+        cb = ds.transformation_balance(year)
+        cb.rename(columns={"re": "bioenergy"}, inplace=True)
+        heat_b = ds.chp_share_and_efficiency(cb)
+        heat_demand = demand.get_heat_profiles_deflex(regions, year, conf=conf)
+        return tables, heat_b, heat_demand
+
+    def setup_get_deflex_pp_by_year():
+        if not os.path.isfile(pp_file):
+            raw_pp.to_hdf(pp_file, key="pp")
+        return pp_by_year
+
+    def setup_create_powerplants():
+        pp = pp_by_year()
+        return lambda: powerplants.create_powerplants(
+            pp, {}, year, ds.name, conf=conf
+        )
+
+    def setup_chp_table():
+        tables, heat_b, heat_demand = tables_with_chp()
+        return lambda: powerplants.chp_table(heat_b, heat_demand, tables)
+
+    def setup_substract_chp():
+        tables, heat_b, heat_demand = tables_with_chp()
+        powerplants.chp_table(heat_b, heat_demand, tables)
+        chp = tables["heat-chp plants"]
+        pp = tables["power plants"]
+        return lambda: powerplants.substract_chp_capacity_and_limit_from_pp(
+            {"heat-chp plants": chp, "power plants": pp.copy()}, 0.45, 0.35
+        )
+
+    def setup_get_heat_profiles_deflex():
+        return lambda: demand.get_heat_profiles_deflex(
+            regions, year, conf=conf
+        )
+
+    def setup_scenario_elec_demand():
+        return lambda: demand.scenario_elec_demand(
+            pd.DataFrame(), regions, year, ds.name
+        )
+
+    def setup_scenario_mobility():
+        return lambda: mobility.scenario_mobility(year, {}, conf=conf)
+
+    def setup_create_commodity_sources_reegis():
+        return lambda: commodity.create_commodity_sources_reegis(
+            year, conf=conf
+        )
+
+    return {
+        "get_deflex_pp_by_year": setup_get_deflex_pp_by_year,
+        "create_powerplants": setup_create_powerplants,
+        "chp_table": setup_chp_table,
+        "substract_chp_capacity_and_limit_from_pp": setup_substract_chp,
+        "get_heat_profiles_deflex": setup_get_heat_profiles_deflex,
+        "scenario_elec_demand": setup_scenario_elec_demand,
+        "scenario_mobility": setup_scenario_mobility,
+        "create_commodity_sources_reegis": (
+            setup_create_commodity_sources_reegis
+        ),
+    }
+
+
+def measure(setup, repeat=3, memory=True):
+    """Return the best wall time [s] and the peak memory [MiB] of a builder.
+
+    The setup is called before every run and is not measured.
+    """
+    times = []
+    for _ in range(repeat):
+        func = setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    peak = float("nan")
+    if memory:
+        func = setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return min(times), peak
+
+
+def run(sizes, builders=None, repeat=3, memory=True, seed=42):
+    """Run the benchmarks and return the results as DataFrame."""
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        ds = fake_reegis.install(path, seed=seed)
+        for size in sizes:
+            ds.resize(*SIZES[size])
+            for name, setup in _benchmarks(ds).items():
+                if builders and name not in builders:
+                    continue
+                wall, peak = measure(setup, repeat=repeat, memory=memory)
+                print(
+                    "{0:>15} {1:<42} {2:9.3f} s {3:9.1f} MiB".format(
+                        size, name, wall, peak
+                    ),
+                    flush=True,
+                )
+                results.append(
+                    {
+                        "size": size,
+                        "regions": ds.n_regions,
+                        "plants": ds.n_plants,
+                        "builder": name,
+                        "time [s]": wall,
+                        "peak memory [MiB]": peak,
+                    }
+                )
+    return pd.DataFrame(results).set_index(["size", "builder"])
+
+
+def compare(new, old, threshold=1.25):
+    """Add the ratio to an older result and mark slow-downs."""
+    ratio = new["time [s]"].div(old["time [s]"])
+    new = new.assign(**{"time ratio": ratio})
+    new["regression"] = ratio > threshold
+    return new
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=list(SIZES), choices=list(SIZES)
+    )
+    parser.add_argument("--builders", nargs="+", default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", help="Store the results as csv file.")
+    parser.add_argument("--compare", help="Compare with a stored csv file.")
+    parser.add_argument(
+        "--trace", help="Write a Chrome trace of all builder stages."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Time ratio that is marked as regression (default: 1.25).",
+    )
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    logging.getLogger().setLevel(logging.ERROR)
+    if args.trace:
+        from scenario_builder import profiling
+
+        profiling.enable()
+    results = run(
+        args.sizes,
+        builders=args.builders,
+        repeat=args.repeat,
+        memory=not args.no_memory,
+        seed=args.seed,
+    )
+    if args.trace:
+        profiling.to_chrome_trace(args.trace)
+        print(profiling.summary().to_string())
+    if args.compare:
+        old = pd.read_csv(args.compare, index_col=[0, 1])
+        results = compare(results, old, threshold=args.threshold)
+    if args.output:
+        results.to_csv(args.output)
+    print(results.to_string())
+    if args.compare and results["regression"].any():
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
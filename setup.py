@@ -73,10 +73,21 @@ setup(
     install_requires=[
         "pandas",
     ],
+    entry_points={
+        "console_scripts": [
+            "scenario-builder = scenario_builder.cli:main",
+        ]
+    },
     extras_require={
         "reegis": [
             "reegis",
-        ]
+        ],
+        "parquet": [
+            "pyarrow",
+        ],
+        "feedin": [
+            "scipy",
+        ],
         #   'rst': ['docutils>=0.11'],
         #   ':python_version=="2.6"': ['argparse'],
     },
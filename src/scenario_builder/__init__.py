@@ -1 +1,44 @@
 __version__ = 'v0.0.2'
+
+_SUBMODULES = (
+    "build",
+    "checkpoint",
+    "cli",
+    "collection",
+    "commodity",
+    "compact",
+    "daemon",
+    "data",
+    "demand",
+    "ensemble",
+    "feedin",
+    "lazy",
+    "mobility",
+    "periods",
+    "powerplants",
+    "prefetch",
+    "profiling",
+    "projection",
+    "settings",
+    "storages",
+    "timeindex",
+    "transport",
+    "units",
+    "variants",
+)
+
+
+def __getattr__(name):
+    # Import the submodules on first access (PEP 562), so that
+    # "import scenario_builder" does not pull in reegis and its dependencies.
+    if name in _SUBMODULES:
+        import importlib
+
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError(
+        "module {0!r} has no attribute {1!r}".format(__name__, name)
+    )
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
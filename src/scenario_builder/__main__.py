@@ -0,0 +1,5 @@
+import sys
+
+from scenario_builder.cli import main
+
+sys.exit(main())
@@ -0,0 +1,829 @@
+"""Build complete scenarios for a grid of years, region maps and weather years.
+
+Expensive intermediate results that do not depend on the whole scenario are
+shared: the processed power plant table is read once per map and process,
+the load file and the regional electricity demand are read once per process
+and the heat profiles of a scenario are used for the heat demand and the chp
+plants. With a run directory every stage of a scenario is checkpointed and
+a failed build can be resumed (see :mod:`scenario_builder.checkpoint`).
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import itertools
+import logging
+import os
+from collections import OrderedDict
+from collections import namedtuple
+from concurrent import futures
+
+import pandas as pd
+
+from scenario_builder import checkpoint
+from scenario_builder import collection
+from scenario_builder import commodity
+from scenario_builder import compact
+from scenario_builder import data
+from scenario_builder import demand
+from scenario_builder import feedin
+from scenario_builder import lazy
+from scenario_builder import mobility
+from scenario_builder import periods
+from scenario_builder import powerplants
+from scenario_builder import profiling
+from scenario_builder import projection
+from scenario_builder import settings
+from scenario_builder import storages
+from scenario_builder import timeindex
+from scenario_builder import transport
+
+openego = lazy.module("reegis.openego")
+reegis_geometries = lazy.module("reegis.geometries")
+
+FORMATS = ("csv", "xlsx", "parquet", "feather")
+
+Scenario = namedtuple("Scenario", ["year", "map", "weather_year"])
+
+# Intermediate results shared between the scenarios of one process (the
+# least recently used first).
+_SHARED = OrderedDict()
+# Maximal number of shared results (None: unlimited)
+_SHARED_LIMIT = None
+
+
+def scenario_grid(years, maps, weather_years=None):
+    """Return all combinations of years, maps and weather years.
+
+    If no weather years are given, the weather of the scenario year is used.
+
+    Examples
+    --------
+    >>> grid = scenario_grid([2013, 2014], ["de21"], [2012])
+    >>> [scenario_name(s) for s in grid]
+    ['de21_2013_weather2012', 'de21_2014_weather2012']
+    >>> scenario_grid([2014], ["de21"])
+    [Scenario(year=2014, map='de21', weather_year=None)]
+    """
+    if not weather_years:
+        weather_years = [None]
+    return [
+        Scenario(year, name, weather_year)
+        for name, weather_year, year in itertools.product(
+            maps, weather_years, years
+        )
+    ]
+
+
+def scenario_name(scenario):
+    """Name of the scenario that is used for the output file.
+
+    Examples
+    --------
+    >>> scenario_name(Scenario(2014, "de21", None))
+    'de21_2014'
+    >>> scenario_name(Scenario(2014, "maps/de21.geojson", 2014))
+    'de21_2014'
+    """
+    map_name = os.path.splitext(os.path.basename(scenario.map))[0]
+    name = "{0}_{1}".format(map_name, scenario.year)
+    if scenario.weather_year not in (None, scenario.year):
+        name += "_weather{0}".format(scenario.weather_year)
+    return name
+
+
+def load_regions(name):
+    """Load a region map.
+
+    Parameters
+    ----------
+    name : str
+        "federal_states" or the path of a file that can be read by
+        reegis.geometries.load() (csv, hdf, shp, geojson). The name of the
+        map is the file name without extension.
+
+    Returns
+    -------
+    GeoDataFrame : The name of the map and the fingerprint of the regions
+        (see :func:`scenario_builder.data.map_fingerprint`) are attributes.
+    """
+    if name == "federal_states":
+        regions = reegis_geometries.get_federal_states_polygon()
+    elif os.path.isfile(name):
+        regions = reegis_geometries.load(fullname=name)
+        name = os.path.splitext(os.path.basename(name))[0]
+    else:
+        raise ValueError(
+            "Unknown region map '{0}'. Use 'federal_states' or the path of a "
+            "geometry file.".format(name)
+        )
+    regions.name = name
+    regions.fingerprint = data.map_fingerprint(regions)
+    return regions
+
+
+def _pp_filename(name, conf):
+    return os.path.join(
+        conf.paths.powerplants, conf.powerplants.deflex_pp
+    ).format(map=name)
+
+
+def map_key(regions, conf):
+    """Fingerprint of the inputs of the stages that are shared by all
+    scenarios of a map.
+
+    The power plant file of the map is checked on every call, so a
+    long-running process detects a changed file. The reegis inputs of the
+    heat demand, electricity demand and feed-in are not part of the key.
+    """
+    return checkpoint.fingerprint(
+        conf.fingerprint,
+        regions.fingerprint,
+        checkpoint.file_fingerprint(_pp_filename(regions.name, conf)),
+    )
+
+
+def shared(key, func, *args, **kwargs):
+    """Return the result of func for the given key and store it.
+
+    The result is shared between all scenarios that are built in the same
+    process, so it must not be changed by the caller. If the number of
+    results is limited (see :func:`limit_shared`), the least recently used
+    result is dropped.
+    """
+    if key in _SHARED:
+        _SHARED.move_to_end(key)
+        return _SHARED[key]
+    _SHARED[key] = func(*args, **kwargs)
+    while _SHARED_LIMIT is not None and len(_SHARED) > _SHARED_LIMIT:
+        _SHARED.popitem(last=False)
+    return _SHARED[key]
+
+
+def clear_shared():
+    """Remove all shared intermediate results of this process."""
+    _SHARED.clear()
+
+
+def limit_shared(entries=None):
+    """Limit the number of shared results of this process (None: no
+    limit)."""
+    global _SHARED_LIMIT
+    _SHARED_LIMIT = entries
+    while entries is not None and len(_SHARED) > entries:
+        _SHARED.popitem(last=False)
+
+
+def _pp_table(regions, conf, checkpoints=None):
+    """The power plant table of a map (see
+    :func:`scenario_builder.powerplants.read_deflex_pp`).
+
+    It is shared by the scenarios of the process until the config, the map
+    or the power plant file changes.
+    """
+    key = map_key(regions, conf)
+    run = None
+    if checkpoints is not None:
+        run = checkpoints.scope("maps", regions.name)
+    return shared(
+        ("pp", regions.name, key),
+        checkpoint.run_stage,
+        run,
+        "power plant table",
+        key,
+        powerplants.read_deflex_pp,
+        regions,
+        regions.name,
+        conf=conf,
+    )
+
+
+def _chp_parameters(regions, year, conf, checkpoints=None):
+    run = key = None
+    if checkpoints is not None:
+        run = checkpoints.scope("maps", regions.name)
+        key = map_key(regions, conf)
+    return checkpoint.run_stage(
+        run,
+        "chp parameters {0}".format(year),
+        key,
+        powerplants.chp_parameters,
+        regions,
+        [year],
+        regions.name,
+        conf=conf,
+    )
+
+
+def _elec_demand(regions, scenario):
+    """The electricity demand series of a scenario (see
+    :func:`scenario_builder.demand.elec_demand_series`).
+
+    The load file and the regional demand of the map are read once per
+    process and shared by its scenarios until the load file or the map
+    changes.
+    """
+    demand_year = scenario.weather_year or scenario.year
+    load_file = checkpoint.file_fingerprint(
+        demand.entsoe_load_file(demand_year)
+    )
+    load = shared(
+        ("entsoe load", checkpoint.fingerprint(load_file)),
+        demand.read_entsoe_load,
+        demand_year,
+    )
+    ego_demand = shared(
+        ("ego demand", regions.name, regions.fingerprint),
+        openego.get_ego_demand_by_region,
+        regions,
+        regions.name,
+        grouped=True,
+    )
+    pair = (scenario.year, scenario.weather_year)
+    return demand.elec_demand_series(
+        regions, regions.name, [pair], load=load, ego_demand=ego_demand
+    )[pair]
+
+
+def _scenario_demand(regions, scenario, conf, heat_demand=None):
+    return demand.scenario_demand(
+        regions,
+        scenario.year,
+        regions.name,
+        weather_year=scenario.weather_year,
+        conf=conf,
+        heat_demand=heat_demand,
+        elec_demand=_elec_demand(regions, scenario),
+    )
+
+
+class _Output:
+    """Hand the finished tables of a scenario over to the sink.
+
+    In compact mode the tables are converted first. If the series are reduced
+    to representative periods, the series tables are kept until the end,
+    because they are clustered jointly.
+    """
+
+    def __init__(self, conf, sink=None):
+        self.sink = sink
+        self.compactor = compact.compactor_from_config(conf)
+        self.n_periods = conf.get(
+            "creator", "representative_periods", fallback=None
+        )
+        self.period = conf.get("creator", "period_length", fallback="day")
+        self.held = []
+
+    def finished(self, table_collection, *names):
+        """Hand over finished tables. They are removed from the collection
+        if there is a sink."""
+        for name in names:
+            if self.n_periods and name in periods.series_names([name]):
+                self.held.append(name)
+            else:
+                self._write(table_collection, name)
+
+    def _write(self, table_collection, name):
+        if self.compactor is not None:
+            table_collection[name] = self.compactor(
+                name, table_collection[name]
+            )
+        if self.sink is not None:
+            self.sink.add(name, table_collection.pop(name))
+
+    def close(self, table_collection, scenario):
+        if self.held:
+            reduced = periods.reduce_series(
+                {name: table_collection.pop(name) for name in self.held},
+                self.n_periods,
+                period=self.period,
+            )
+            table_collection.update(reduced)
+            self.held = []
+            for name in reduced:
+                self._write(table_collection, name)
+        if self.compactor is not None:
+            logging.info(
+                "Memory of %s in compact mode:\n%s",
+                scenario_name(scenario),
+                self.compactor.report().to_string(),
+            )
+        return table_collection
+
+
+@profiling.timed()
+def build_scenario(scenario, conf=None, sink=None, checkpoints=None):
+    """Create the table collection of one scenario.
+
+    Parameters
+    ----------
+    scenario : Scenario
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+    sink : collection.CollectionSink or None
+        If a sink is given, every table is handed to the sink as soon as it
+        is finished and is not kept in memory. The peak memory is then
+        determined by the largest table instead of the whole scenario.
+    checkpoints : checkpoint.RunDirectory or checkpoint.MemoryCache or None
+        Store the result of every stage in the run directory (see
+        :mod:`scenario_builder.checkpoint`). If the run directory resumes
+        a build, stages with unchanged inputs are loaded.
+
+    Returns
+    -------
+    dict : All tables that were not handed to a sink.
+
+    Notes
+    -----
+    In compact mode (``compact = True`` in the section "creator" of the
+    config) all finished tables are converted to compact dtypes (see
+    :mod:`scenario_builder.compact`). If ``representative_periods`` is set,
+    the series are reduced to this number of representative days or weeks
+    (``period_length``, see :mod:`scenario_builder.periods`). With
+    ``plant_units = True`` the single power plants are added as table
+    "power plant units" (see :mod:`scenario_builder.units`).
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    output = _Output(conf, sink=sink)
+    year, weather_year = scenario.year, scenario.weather_year
+    regions = shared(("regions", scenario.map), load_regions, scenario.map)
+    name = regions.name
+
+    # Fingerprint of the inputs of the stages
+    run = key = None
+    if checkpoints is not None:
+        run = checkpoints.scope(scenario_name(scenario))
+        key = checkpoint.fingerprint(map_key(regions, conf), scenario)
+
+    table_collection = {
+        "general": pd.Series(
+            {
+                "year": year,
+                "name": scenario_name(scenario),
+                "weather year": weather_year or year,
+                "map": name,
+            },
+            name="value",
+        )
+    }
+    output.finished(table_collection, "general")
+
+    pp = None
+    if not conf.get("creator", "pp_chunksize", fallback=None):
+        pp = _pp_table(regions, conf, checkpoints)
+    table_collection.update(
+        checkpoint.run_stage(
+            run,
+            "power plants",
+            key,
+            powerplants.scenario_powerplants,
+            {},
+            regions,
+            year,
+            name,
+            conf=conf,
+            pp=pp,
+        )
+    )
+    output.finished(table_collection, "volatile plants")
+    if conf.get("creator", "plant_units", fallback=False):
+        table_collection["power plant units"] = checkpoint.run_stage(
+            run,
+            "power plant units",
+            key,
+            powerplants.scenario_units,
+            regions,
+            year,
+            name,
+            conf=conf,
+            pp=pp,
+        ).to_frame()
+        output.finished(table_collection, "power plant units")
+    if "capacity series" in table_collection:
+        table_collection["capacity series"] = timeindex.get_calendar(
+            year, weather_year
+        ).conform(table_collection["capacity series"], "capacity series")
+        output.finished(table_collection, "capacity series")
+
+    heat_demand = None
+    if conf.creator.heat:
+        heat_demand = checkpoint.run_stage(
+            run,
+            "heat demand",
+            key,
+            demand.get_heat_profiles_deflex,
+            regions,
+            year,
+            weather_year=weather_year,
+            conf=conf,
+        )
+        chp = _chp_parameters(regions, year, conf, checkpoints)
+        table_collection.update(
+            checkpoint.run_stage(
+                run,
+                "chp",
+                key,
+                powerplants.scenario_chp,
+                table_collection,
+                regions,
+                year,
+                name,
+                weather_year=weather_year,
+                conf=conf,
+                heat_demand=heat_demand,
+                chp=chp,
+            )
+        )
+        output.finished(table_collection, "heat-chp plants")
+    output.finished(table_collection, "power plants")
+
+    table_collection["commodity sources"] = checkpoint.run_stage(
+        run,
+        "commodity sources",
+        key,
+        commodity.scenario_commodity_sources,
+        year,
+        conf=conf,
+    )
+    output.finished(table_collection, "commodity sources")
+
+    demand_series = checkpoint.run_stage(
+        run,
+        "demand",
+        key,
+        _scenario_demand,
+        regions,
+        scenario,
+        conf,
+        heat_demand=heat_demand,
+    )
+    del heat_demand
+    table_collection.update(demand_series)
+    output.finished(table_collection, *demand_series)
+    del demand_series
+
+    mobility_key = None
+    if checkpoints is not None:
+        mobility_key = checkpoint.fingerprint(
+            key,
+            checkpoint.file_fingerprint(
+                mobility.weights_file(name, conf=conf)
+            ),
+        )
+    table_collection.update(
+        checkpoint.run_stage(
+            run,
+            "mobility",
+            mobility_key,
+            mobility.scenario_mobility,
+            year,
+            {},
+            conf=conf,
+            weather_year=weather_year,
+            regions=regions,
+            name=name,
+        )
+    )
+    output.finished(table_collection, "mobility demand series", "mobility")
+
+    weights = None
+    feedin_weights = conf.get("creator", "feedin_weights", fallback=None)
+    if feedin_weights == "area":
+        weights = shared(
+            ("cell weights", name),
+            feedin.map_weights,
+            regions,
+            name,
+            conf=conf,
+        )
+    elif feedin_weights == "capacity":
+        weights = shared(
+            ("capacity weights", name),
+            feedin.map_capacity_weights,
+            regions,
+            name,
+            pp=pp,
+            conf=conf,
+        )
+    table_collection["volatile series"] = checkpoint.run_stage(
+        run,
+        "feedin",
+        key,
+        feedin.scenario_feedin,
+        regions,
+        year,
+        name,
+        weather_year=weather_year,
+        weights=weights,
+        pp=pp,
+        conf=conf,
+        weights_kind=feedin_weights,
+    )
+    output.finished(table_collection, "volatile series")
+
+    table_collection["storages"] = checkpoint.run_stage(
+        run,
+        "storages",
+        key,
+        storages.scenario_storages,
+        regions,
+        year,
+        name,
+    )
+    output.finished(table_collection, "storages")
+    return output.close(table_collection, scenario)
+
+
+def write_tables(table_collection, path, fmt="csv"):
+    """Write a table collection.
+
+    Parameters
+    ----------
+    table_collection : dict
+    path : str
+        Directory for "csv", "parquet" and "feather" (one file per table),
+        file name without extension for "xlsx" (one sheet per table).
+    fmt : str
+        One of FORMATS. Parquet and Feather collections have a manifest and
+        can be read with collection.read_collection().
+
+    Returns
+    -------
+    str : The path of the written directory or file.
+    """
+    if fmt == "csv":
+        os.makedirs(path, exist_ok=True)
+        for name, table in table_collection.items():
+            table.to_csv(os.path.join(path, "{0}.csv".format(name)))
+    elif fmt in collection.FORMATS:
+        collection.write_collection(table_collection, path, fmt=fmt)
+    elif fmt == "xlsx":
+        path += ".xlsx"
+        with pd.ExcelWriter(path) as writer:
+            for name, table in table_collection.items():
+                table.to_excel(writer, sheet_name=name)
+    else:
+        raise ValueError(
+            "Unknown format '{0}'. Use one of {1}.".format(fmt, FORMATS)
+        )
+    return path
+
+
+def build_and_write(scenario, path, fmt="csv", conf=None, checkpoints=None):
+    """Build one scenario and write it to the directory `path`.
+
+    Parquet and Feather tables are written as soon as they are finished
+    (see :class:`collection.CollectionSink`).
+    """
+    filename = os.path.join(path, scenario_name(scenario))
+    if fmt in collection.FORMATS:
+        with collection.CollectionSink(filename, fmt=fmt) as sink:
+            build_scenario(
+                scenario, conf=conf, sink=sink, checkpoints=checkpoints
+            )
+        return filename
+    table_collection = build_scenario(
+        scenario, conf=conf, checkpoints=checkpoints
+    )
+    with profiling.stage("write scenario"):
+        return write_tables(table_collection, filename, fmt=fmt)
+
+
+def write_projections(base, path, years, fmt="csv", conf=None, **factors):
+    """Project a base scenario to the target years and write them to the
+    directory `path`.
+
+    The base collection must not be compacted or reduced to periods. These
+    options of the config are applied to the projected scenarios.
+
+    Parameters
+    ----------
+    base : dict
+        Table collection of the base scenario.
+    path : str
+    years : list
+        Target years.
+    fmt : str
+        Output format (see :func:`write_tables`).
+    conf : settings.ConfigSnapshot or None
+    factors : pandas.DataFrame
+        The growth factors ``capacity``, ``demand`` and ``costs`` (see
+        :mod:`scenario_builder.projection`).
+
+    Returns
+    -------
+    dict : {year: file name}
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    general = base["general"]
+    filenames = {}
+    for year, table_collection in projection.project(
+        base, years, **factors
+    ).items():
+        scenario = Scenario(year, general["map"], general["weather year"])
+        filename = os.path.join(path, scenario_name(scenario))
+        with profiling.stage("write scenario"):
+            if fmt in collection.FORMATS:
+                with collection.CollectionSink(filename, fmt=fmt) as sink:
+                    output = _Output(conf, sink)
+                    output.finished(table_collection, *list(table_collection))
+                    output.close(table_collection, scenario)
+            else:
+                output = _Output(conf)
+                output.finished(table_collection, *list(table_collection))
+                table_collection = output.close(table_collection, scenario)
+                write_tables(table_collection, filename, fmt=fmt)
+        filenames[year] = filename
+    return filenames
+
+
+def prepare_maps(maps, conf=None, years=(), checkpoints=None):
+    """Create the files that are shared by all scenarios of a map.
+
+    This is done once before the scenarios are distributed to the worker
+    processes, so that the workers do not create the same file at once.
+    If heat is modelled, the chp parameters of all given years are created
+    as well (see :func:`scenario_builder.powerplants.chp_parameters`). The
+    load file of the electricity demand is shared by all maps. With a run
+    directory the checkpoints of the map stages (power plant table, chp
+    parameters) are created as well.
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    if years:
+        demand.entsoe_load_file(min(years))
+    for map_name in maps:
+        regions = shared(("regions", map_name), load_regions, map_name)
+        filename = os.path.join(
+            conf.paths.powerplants, conf.powerplants.deflex_pp
+        ).format(map=regions.name)
+        if not os.path.isfile(filename):
+            powerplants.pp_reegis2deflex(
+                regions, regions.name, filename_out=filename, conf=conf
+            )
+        if conf.creator.heat and years:
+            powerplants.chp_parameters(regions, years, regions.name, conf=conf)
+        if checkpoints is None:
+            continue
+        if not conf.get("creator", "pp_chunksize", fallback=None):
+            _pp_table(regions, conf, checkpoints)
+        if conf.creator.heat:
+            for year in years:
+                _chp_parameters(regions, year, conf, checkpoints)
+
+
+def build_matrix(
+    scenarios, path, workers=None, fmt="csv", conf=None, checkpoints=None
+):
+    """Build and write all scenarios in a pool of worker processes.
+
+    A failing scenario does not stop the other scenarios.
+
+    Parameters
+    ----------
+    scenarios : list
+        List of Scenario objects, e.g. from :func:`scenario_grid`.
+    path : str
+        Output directory. One file or directory per scenario is written.
+    workers : int or None
+        Number of worker processes. The scenarios are built in the current
+        process if set to 1. By default the number of CPUs is used.
+    fmt : str
+        Output format (see :func:`write_tables`).
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+    checkpoints : checkpoint.RunDirectory or None
+        Run directory for the checkpoints of all scenarios (see
+        :func:`build_scenario`).
+
+    Returns
+    -------
+    dict : {Scenario: path of the output or the raised exception}
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    os.makedirs(path, exist_ok=True)
+    prepare_maps(
+        sorted({s.map for s in scenarios}),
+        conf=conf,
+        years=sorted({s.year for s in scenarios}),
+        checkpoints=checkpoints,
+    )
+
+    # Scenarios of the same map follow each other, so a worker can reuse
+    # the shared tables of the previous scenario.
+    scenarios = sorted(
+        scenarios, key=lambda s: (s.map, s.weather_year or s.year, s.year)
+    )
+    results = {}
+    if workers == 1 or len(scenarios) < 2:
+        for scenario in scenarios:
+            try:
+                results[scenario] = build_and_write(
+                    scenario,
+                    path,
+                    fmt=fmt,
+                    conf=conf,
+                    checkpoints=checkpoints,
+                )
+            except Exception as e:
+                logging.exception("Scenario %s failed.", scenario)
+                results[scenario] = e
+        return results
+
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = {
+            pool.submit(
+                build_and_write, scenario, path, fmt, conf, checkpoints
+            ): scenario
+            for scenario in scenarios
+        }
+        for job in futures.as_completed(jobs):
+            scenario = jobs[job]
+            try:
+                results[scenario] = job.result()
+                logging.info("Scenario %s written.", scenario_name(scenario))
+            except Exception as e:
+                logging.error("Scenario %s failed: %r", scenario, e)
+                results[scenario] = e
+    return results
+
+
+def _build_shared(scenario, conf):
+    return transport.share(build_scenario(scenario, conf=conf))
+
+
+def build_collections(scenarios, workers=None, conf=None):
+    """Build scenarios in worker processes and return the table collections.
+
+    The series tables are handed over in shared memory (see
+    :mod:`scenario_builder.transport`), so they are not pickled and exist
+    only once in memory.
+
+    Parameters
+    ----------
+    scenarios : list
+        List of Scenario objects, e.g. from :func:`scenario_grid`.
+    workers : int or None
+        Number of worker processes. The scenarios are built in the current
+        process if set to 1. By default the number of CPUs is used.
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+
+    Returns
+    -------
+    dict : {Scenario: table collection}
+
+    Raises
+    ------
+    Exception
+        The exception of the first failed scenario. The other scenarios are
+        finished first and their shared blocks are freed.
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    if workers == 1 or len(scenarios) < 2:
+        return {s: build_scenario(s, conf=conf) for s in scenarios}
+    prepare_maps(
+        sorted({s.map for s in scenarios}),
+        conf=conf,
+        years=sorted({s.year for s in scenarios}),
+    )
+    jobs = {}
+    collections = {}
+    errors = {}
+    try:
+        with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for scenario in scenarios:
+                job = pool.submit(_build_shared, scenario, conf)
+                jobs[job] = scenario
+            try:
+                for job in futures.as_completed(jobs):
+                    scenario = jobs[job]
+                    try:
+                        collections[scenario] = transport.receive(job.result())
+                    except Exception as e:
+                        logging.error("Scenario %s failed: %r", scenario, e)
+                        errors[scenario] = e
+            finally:
+                # Do not start new scenarios if the parent is interrupted.
+                for job in jobs:
+                    job.cancel()
+    finally:
+        # The blocks of scenarios that were not received are not tracked by
+        # any process and would stay in shared memory.
+        for job, scenario in jobs.items():
+            if scenario in collections or job.cancelled():
+                continue
+            if job.done() and job.exception() is None:
+                transport.release(job.result())
+    for scenario in scenarios:
+        if scenario in errors:
+            raise errors[scenario]
+    return {scenario: collections[scenario] for scenario in scenarios}
@@ -0,0 +1,251 @@
+"""Checkpoints of the stages of a scenario build.
+
+Every stage of a build (e.g. the power plants, the heat demand or the chp
+plants of a scenario) stores its result in a run directory together with
+the fingerprint of its inputs. If the build is started again with
+``resume=True``, a stage with a matching fingerprint is loaded instead of
+computed, so a build that crashed late does not start from scratch. A stage
+with another fingerprint (changed config, map or input file) is computed
+again and replaces the old checkpoint.
+
+The results are pickled. The fingerprint is written after the result, so an
+interrupted write is never taken for a complete checkpoint. Only use run
+directories that were written by yourself.
+
+A long-running process (see :mod:`scenario_builder.daemon`) can keep the
+stages in memory instead (:class:`MemoryCache`).
+
+Examples
+--------
+>>> import tempfile
+>>> run = RunDirectory(tempfile.mkdtemp(), resume=True)
+>>> calls = []
+>>> def square(x):
+...     calls.append(x)
+...     return x * x
+>>> key = fingerprint("square", 3)
+>>> run.stage("square", key, square, 3), run.stage("square", key, square, 3)
+(9, 9)
+>>> calls
+[3]
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import tempfile
+from collections import OrderedDict
+
+MIB = 2 ** 20
+
+
+def fingerprint(*parts):
+    """Deterministic fingerprint (SHA-256 as hex string) of some values.
+
+    Values that are not JSON types are represented by their repr().
+    """
+    content = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(filename):
+    """Path, size and modification time of a file (None if missing)."""
+    if filename is None or not os.path.isfile(filename):
+        return None
+    stat = os.stat(filename)
+    return [os.path.abspath(filename), stat.st_size, stat.st_mtime_ns]
+
+
+def _file_name(stage):
+    return re.sub(r"[^\w\-]", "_", stage)
+
+
+class RunDirectory:
+    """Directory with the checkpoints of a build.
+
+    Parameters
+    ----------
+    path : str
+    resume : bool
+        Load stages with a matching fingerprint. Otherwise all stages are
+        computed and their checkpoints are replaced.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.resume = resume
+
+    def __repr__(self):
+        return "RunDirectory({0!r}, resume={1})".format(self.path, self.resume)
+
+    def scope(self, *names):
+        """Run directory of a part of the build (e.g. one scenario)."""
+        return RunDirectory(
+            os.path.join(self.path, *[_file_name(n) for n in names]),
+            resume=self.resume,
+        )
+
+    def _files(self, stage):
+        base = os.path.join(self.path, _file_name(stage))
+        return base + ".pkl", base + ".json"
+
+    def fingerprint(self, stage):
+        """Fingerprint of the stored checkpoint of a stage (or None)."""
+        meta = self._files(stage)[1]
+        if not os.path.isfile(meta):
+            return None
+        with open(meta) as f:
+            return json.load(f)["fingerprint"]
+
+    def load(self, stage, key):
+        """Return (True, result) if the checkpoint matches the key."""
+        if self.fingerprint(stage) != key:
+            return False, None
+        with open(self._files(stage)[0], "rb") as f:
+            return True, pickle.load(f)
+
+    def _replace(self, filename, write, mode):
+        """Write a file in a unique temporary file and move it in place.
+
+        Processes that save the same stage at once do not disturb each
+        other, the last complete file wins.
+        """
+        fd, tmp = tempfile.mkstemp(
+            dir=self.path, prefix=os.path.basename(filename), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp, filename)
+        except BaseException:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            raise
+
+    def save(self, stage, key, result):
+        """Store the result of a stage."""
+        data, meta = self._files(stage)
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            os.remove(meta)
+        except FileNotFoundError:
+            pass
+        self._replace(
+            data,
+            lambda f: pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL),
+            "wb",
+        )
+        self._replace(
+            meta,
+            lambda f: json.dump({"stage": stage, "fingerprint": key}, f),
+            "w",
+        )
+
+    def stage(self, stage, key, func, *args, **kwargs):
+        """Load a stage or compute it with func(*args, **kwargs) and store
+        the result."""
+        if self.resume:
+            found, result = self.load(stage, key)
+            if found:
+                logging.info("Stage '%s' loaded from %s.", stage, self.path)
+                return result
+        result = func(*args, **kwargs)
+        self.save(stage, key, result)
+        return result
+
+
+def run_stage(run, stage, key, func, *args, **kwargs):
+    """Run a stage with checkpoints if run is a RunDirectory."""
+    if run is None:
+        return func(*args, **kwargs)
+    return run.stage(stage, key, func, *args, **kwargs)
+
+
+class MemoryCache:
+    """Stages of many builds in memory with a size limit.
+
+    The results are stored pickled, so every load returns a new copy that
+    can be changed by the build and the size of an entry is known. The
+    least recently used entries are dropped if the cache exceeds its size.
+    It can be used like a :class:`RunDirectory` that always resumes.
+
+    Parameters
+    ----------
+    max_mib : float
+        Size of the cache in MiB.
+    """
+
+    def __init__(self, max_mib=1024):
+        self.max_bytes = int(max_mib * MIB)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __repr__(self):
+        return "MemoryCache({0} entries, {1:.1f} of {2:.0f} MiB)".format(
+            len(self._entries), self.nbytes / MIB, self.max_bytes / MIB
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def scope(self, *names):
+        """Part of the cache for a part of the build (e.g. one scenario)."""
+        return _CacheScope(self, names)
+
+    def stage(self, stage, key, func, *args, **kwargs):
+        """Load a stage or compute it with func(*args, **kwargs) and store
+        the result."""
+        entry = self._entries.get(stage)
+        if entry is not None and entry[0] == key:
+            self._entries.move_to_end(stage)
+            self.hits += 1
+            return pickle.loads(entry[1])
+        self.misses += 1
+        result = func(*args, **kwargs)
+        self._store(stage, key, result)
+        return result
+
+    def _store(self, stage, key, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        old = self._entries.pop(stage, None)
+        if old is not None:
+            self.nbytes -= len(old[1])
+        if len(data) > self.max_bytes:
+            logging.info("Stage '%s' is too large for the cache.", stage)
+            return
+        self._entries[stage] = (key, data)
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes:
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self.nbytes -= len(dropped)
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+        self.nbytes = 0
+
+
+class _CacheScope:
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = tuple(path)
+
+    def scope(self, *names):
+        return _CacheScope(self.cache, self.path + names)
+
+    def stage(self, stage, key, func, *args, **kwargs):
+        return self.cache.stage(
+            self.path + (stage,), key, func, *args, **kwargs
+        )
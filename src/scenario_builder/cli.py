@@ -0,0 +1,272 @@
+"""Command line interface of the scenario builder.
+
+Usage::
+
+    scenario-builder build --years 2014 2015 --maps federal_states \\
+        --weather-years 2012 2013 --workers 4 --output scenarios
+
+    scenario-builder build --years 2014 --maps federal_states \\
+        --output scenarios --resume
+
+    scenario-builder prefetch --years 2014 2015 --weather-years 2012 \\
+        --manifest inputs.json --mirror /data/mirror
+
+    scenario-builder serve --port 8765 --cache-mib 4096
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import argparse
+import logging
+import os
+import sys
+
+from scenario_builder import build
+from scenario_builder import checkpoint
+from scenario_builder import daemon
+from scenario_builder import periods
+from scenario_builder import prefetch
+from scenario_builder import settings
+
+
+def _prefetch(args):
+    files = prefetch.plan(
+        args.manifest, list(args.years) + list(args.weather_years or [])
+    )
+    try:
+        result = prefetch.prefetch(files, args.mirror, workers=args.jobs)
+    except (prefetch.MissingInputs, prefetch.ChecksumError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(
+        "{0} files copied, {1} files present.".format(
+            len(result["copied"]), len(result["present"])
+        )
+    )
+    return 0
+
+
+def _build(args):
+    if args.manifest is not None:
+        if args.mirror is None:
+            print("--manifest needs --mirror.", file=sys.stderr)
+            return 2
+        failed = _prefetch(args)
+        if failed:
+            return failed
+    scenarios = build.scenario_grid(
+        args.years, args.maps, weather_years=args.weather_years
+    )
+    logging.info("Building %d scenarios.", len(scenarios))
+    conf = settings.snapshot()
+    if args.compact:
+        conf = conf.updated(
+            {"creator": {"compact": True, "memory_budget": args.memory_budget}}
+        )
+    if args.representative_periods:
+        conf = conf.updated(
+            {
+                "creator": {
+                    "representative_periods": args.representative_periods,
+                    "period_length": args.period,
+                }
+            }
+        )
+    if args.capacity_series:
+        conf = conf.updated({"creator": {"capacity_series": True}})
+    if args.pp_chunksize:
+        conf = conf.updated({"creator": {"pp_chunksize": args.pp_chunksize}})
+    checkpoints = None
+    if args.run_dir or args.resume:
+        checkpoints = checkpoint.RunDirectory(
+            args.run_dir or os.path.join(args.output, ".run"),
+            resume=args.resume,
+        )
+    results = build.build_matrix(
+        scenarios,
+        args.output,
+        workers=args.workers,
+        fmt=args.format,
+        conf=conf,
+        checkpoints=checkpoints,
+    )
+    failed = False
+    for scenario in sorted(results, key=build.scenario_name):
+        result = results[scenario]
+        if isinstance(result, Exception):
+            failed = True
+            result = "FAILED ({0!r})".format(result)
+        print("{0}: {1}".format(build.scenario_name(scenario), result))
+    return 1 if failed else 0
+
+
+def _serve(args):
+    daemon.serve(
+        host=args.host,
+        port=args.port,
+        cache_mib=args.cache_mib,
+        shared_entries=args.shared_entries,
+    )
+    return 0
+
+
+def parser():
+    """Return the argument parser of the command line interface."""
+    main_parser = argparse.ArgumentParser(
+        prog="scenario-builder", description=__doc__.split("\n")[0]
+    )
+    main_parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Log info messages."
+    )
+    commands = main_parser.add_subparsers(dest="command")
+    commands.required = True
+
+    build_parser = commands.add_parser(
+        "build",
+        help="Build all combinations of years, maps and weather years.",
+    )
+    build_parser.add_argument("--years", nargs="+", type=int, required=True)
+    build_parser.add_argument(
+        "--maps",
+        nargs="+",
+        required=True,
+        help="'federal_states' or paths of geometry files.",
+    )
+    build_parser.add_argument(
+        "--weather-years",
+        nargs="+",
+        type=int,
+        default=None,
+        help="By default the weather of the scenario year is used.",
+    )
+    build_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs).",
+    )
+    build_parser.add_argument(
+        "--format", choices=build.FORMATS, default=build.FORMATS[0]
+    )
+    build_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Store series as float32 and strings as categoricals.",
+    )
+    build_parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=None,
+        help="With --compact: warn if a scenario needs more memory [MiB].",
+    )
+    build_parser.add_argument(
+        "--representative-periods",
+        type=int,
+        default=None,
+        help="Reduce the series to this number of representative periods.",
+    )
+    build_parser.add_argument(
+        "--period",
+        choices=sorted(periods.PERIOD_LENGTH),
+        default="day",
+        help="Length of a representative period (default: day).",
+    )
+    build_parser.add_argument(
+        "--capacity-series",
+        action="store_true",
+        help="Add the hourly available capacity of the power plants.",
+    )
+    build_parser.add_argument(
+        "--pp-chunksize",
+        type=int,
+        default=None,
+        help="Read the power plant table in chunks of this number of rows.",
+    )
+    build_parser.add_argument("--output", "-o", required=True)
+    build_parser.add_argument(
+        "--run-dir",
+        default=None,
+        help="Store a checkpoint of every stage in this directory.",
+    )
+    build_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Load the stages with unchanged inputs from the run directory "
+            "(default run directory: OUTPUT/.run). The inputs are the config, "
+            "the region map, the power plant file and the scenario. Changed "
+            "reegis data (heat, demand, feed-in) is not detected, use a new "
+            "run directory then."
+        ),
+    )
+    _add_prefetch_arguments(build_parser, required=False)
+    build_parser.set_defaults(func=_build)
+
+    prefetch_parser = commands.add_parser(
+        "prefetch",
+        help="Copy all input files of a planned build from a local mirror.",
+    )
+    prefetch_parser.add_argument("--years", nargs="+", type=int, required=True)
+    prefetch_parser.add_argument(
+        "--weather-years", nargs="+", type=int, default=None
+    )
+    _add_prefetch_arguments(prefetch_parser, required=True)
+    prefetch_parser.set_defaults(func=_prefetch)
+
+    serve_parser = commands.add_parser(
+        "serve",
+        help="Run a local build service with warm intermediate results.",
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=daemon.PORT)
+    serve_parser.add_argument(
+        "--cache-mib",
+        type=float,
+        default=2048,
+        help="Memory for the results of the stages [MiB] (default: 2048).",
+    )
+    serve_parser.add_argument(
+        "--shared-entries",
+        type=int,
+        default=16,
+        help="Number of region maps and power plant tables that are kept.",
+    )
+    serve_parser.set_defaults(func=_serve)
+    return main_parser
+
+
+def _add_prefetch_arguments(command_parser, required):
+    command_parser.add_argument(
+        "--manifest",
+        required=required,
+        help="JSON file with all input files (see scenario_builder.prefetch).",
+    )
+    command_parser.add_argument(
+        "--mirror",
+        required=required,
+        help="Directory with the mirror of the input files.",
+    )
+    command_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=8,
+        help="Number of concurrent copies (default: 8).",
+    )
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
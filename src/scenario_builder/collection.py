@@ -0,0 +1,356 @@
+"""Columnar storage of table collections (Parquet or Feather).
+
+Every table of a collection is written to its own file and a
+``manifest.json`` describes how to restore it: the original index and column
+labels (including MultiIndex columns), the names of the levels and the
+columns that could not be stored natively. The tables are written in
+parallel (:func:`write_collection`) or one by one while a scenario is built
+(:class:`CollectionSink`) and can be read one by one.
+
+Parquet and Feather need the optional dependency pyarrow.
+
+Examples
+--------
+>>> import tempfile
+>>> import pandas as pd
+>>> series = pd.DataFrame(
+...     [[1.0, 2.0]], columns=pd.MultiIndex.from_tuples(
+...         [("DE01", "wind"), ("DE01", "solar")]))
+>>> path = tempfile.mkdtemp()
+>>> _ = write_collection({"volatile series": series}, path)
+>>> tables = read_collection(path)
+>>> list(tables)
+['volatile series']
+>>> tables["volatile series"]["DE01", "solar"].tolist()
+[2.0]
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import json
+import os
+import re
+from collections.abc import Mapping
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+from scenario_builder import profiling
+
+FORMATS = {"parquet": "parquet", "feather": "feather"}
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _label(value):
+    """Convert a label to a JSON value (tuples become lists)."""
+    if isinstance(value, tuple):
+        return [_label(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _unlabel(value):
+    if isinstance(value, list):
+        return tuple(_unlabel(v) for v in value)
+    return value
+
+
+def _json_value(value):
+    return json.dumps(_label(value))
+
+
+def file_name(name, fmt):
+    """Return a file name for a table name.
+
+    Examples
+    --------
+    >>> file_name("heat-chp plants", "parquet")
+    'heat-chp plants.parquet'
+    >>> file_name("a/b", "feather")
+    'a_b.feather'
+    """
+    return "{0}.{1}".format(re.sub(r"[^\w\- ]", "_", name), FORMATS[fmt])
+
+
+def _encode(table):
+    """Split a table into a flat DataFrame and the manifest entry."""
+    entry = {"kind": "series" if isinstance(table, pd.Series) else "frame"}
+    if entry["kind"] == "series":
+        entry["series_name"] = _label(table.name)
+        table = table.to_frame(name=0)
+    entry["columns"] = [_label(c) for c in table.columns]
+    entry["column_names"] = [_label(n) for n in table.columns.names]
+    entry["column_dtype"] = str(table.columns.dtype)
+
+    flat = table.copy(deep=False)
+    flat.columns = [str(n) for n in range(flat.shape[1])]
+
+    index = table.index
+    if isinstance(index, pd.RangeIndex):
+        entry["range_index"] = [index.start, index.stop, index.step]
+        entry["index_names"] = [_label(index.name)]
+        flat = flat.reset_index(drop=True)
+    else:
+        entry["index_names"] = [_label(n) for n in index.names]
+        if getattr(index, "freqstr", None) is not None:
+            entry["index_freq"] = index.freqstr
+        index_columns = [
+            "__index_{0}__".format(n) for n in range(index.nlevels)
+        ]
+        flat.index.names = index_columns
+        flat = flat.reset_index()
+
+    # Object columns with mixed types cannot be stored in a typed column.
+    # They are stored as JSON strings and decoded on reading. Object columns
+    # of strings would be read as string dtype and are converted back.
+    json_columns, object_columns = [], []
+    for column in flat.columns:
+        if flat[column].dtype != object:
+            continue
+        if pd.api.types.infer_dtype(flat[column], skipna=True) in (
+            "string",
+            "empty",
+        ):
+            object_columns.append(column)
+        else:
+            flat[column] = flat[column].map(_json_value)
+            json_columns.append(column)
+    entry["json_columns"] = json_columns
+    entry["object_columns"] = object_columns
+    entry["shape"] = list(table.shape)
+    return flat, entry
+
+
+def _decode(flat, entry):
+    """Restore a table from the flat DataFrame and its manifest entry."""
+    for column in entry["json_columns"]:
+        flat[column] = flat[column].map(json.loads).astype(object)
+    for column in entry["object_columns"]:
+        flat[column] = flat[column].astype(object)
+    if "range_index" in entry:
+        flat.index = pd.RangeIndex(
+            *entry["range_index"], name=_unlabel(entry["index_names"][0])
+        )
+    else:
+        index_columns = [
+            "__index_{0}__".format(n)
+            for n in range(len(entry["index_names"]))
+        ]
+        flat = flat.set_index(index_columns)
+        flat.index.names = [_unlabel(n) for n in entry["index_names"]]
+        if "index_freq" in entry:
+            flat.index.freq = entry["index_freq"]
+    columns = [_unlabel(c) for c in entry["columns"]]
+    names = [_unlabel(n) for n in entry["column_names"]]
+    if len(names) > 1:
+        flat.columns = pd.MultiIndex.from_tuples(columns, names=names)
+    else:
+        flat.columns = pd.Index(
+            columns, name=names[0], dtype=entry["column_dtype"]
+        )
+    if entry["kind"] == "series":
+        flat = flat[0].rename(_unlabel(entry["series_name"]))
+    return flat
+
+
+def write_table(table, path, name, fmt="parquet"):
+    """Write one table and return its manifest entry."""
+    flat, entry = _encode(table)
+    entry["file"] = file_name(name, fmt)
+    filename = os.path.join(path, entry["file"])
+    if fmt == "parquet":
+        flat.to_parquet(filename, index=False)
+    elif fmt == "feather":
+        flat.to_feather(filename)
+    else:
+        raise ValueError(
+            "Unknown format '{0}'. Use one of {1}.".format(fmt, list(FORMATS))
+        )
+    return entry
+
+
+def read_manifest(path):
+    """Return the manifest of a stored collection as dictionary."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def write_manifest(path, fmt, tables, complete=True):
+    """Write the manifest of a collection (tables: {name: entry}).
+
+    The file is replaced atomically, so a reader never sees a partly
+    written manifest.
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "format": fmt,
+        "complete": complete,
+        "tables": tables,
+    }
+    filename = os.path.join(path, MANIFEST)
+    with open(filename + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(filename + ".tmp", filename)
+    return manifest
+
+
+def write_collection(table_collection, path, fmt="parquet", workers=None):
+    """Write all tables of a collection in parallel.
+
+    Parameters
+    ----------
+    table_collection : dict
+        Tables (DataFrame or Series) by name.
+    path : str
+        Directory of the collection. It is created if it does not exist.
+    fmt : str
+        "parquet" or "feather".
+    workers : int or None
+        Number of threads. By default one thread per table (at most the
+        number of CPUs).
+
+    Returns
+    -------
+    dict : The manifest.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(
+            "Unknown format '{0}'. Use one of {1}.".format(fmt, list(FORMATS))
+        )
+    os.makedirs(path, exist_ok=True)
+    if workers is None:
+        workers = min(len(table_collection), os.cpu_count() or 1) or 1
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {
+            name: pool.submit(write_table, table, path, name, fmt)
+            for name, table in table_collection.items()
+        }
+        tables = {name: job.result() for name, job in jobs.items()}
+    return write_manifest(path, fmt, tables)
+
+
+class CollectionSink:
+    """Write the tables of a collection one by one as soon as they are done.
+
+    A table is written when it is added and the sink keeps no reference to
+    it, so the caller can release it immediately. The manifest is updated
+    after every table and marked as complete on :meth:`close`, so the
+    collection can be opened with :func:`read_collection` at any time.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> import pandas as pd
+    >>> path = tempfile.mkdtemp()
+    >>> with CollectionSink(path) as sink:
+    ...     sink.add("storages", pd.DataFrame({"loss rate": [0.0]}))
+    ...     read_collection(path).manifest["complete"]
+    False
+    >>> read_collection(path)["storages"]["loss rate"].tolist()
+    [0.0]
+    """
+
+    def __init__(self, path, fmt="parquet"):
+        if fmt not in FORMATS:
+            raise ValueError(
+                "Unknown format '{0}'. Use one of {1}.".format(
+                    fmt, list(FORMATS)
+                )
+            )
+        self.path = path
+        self.fmt = fmt
+        self.tables = {}
+        os.makedirs(path, exist_ok=True)
+        write_manifest(path, fmt, self.tables, complete=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # An incomplete collection keeps complete=False in its manifest.
+        if exc_type is None:
+            self.close()
+        return False
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def add(self, name, table):
+        """Write a finished table."""
+        if name in self.tables:
+            raise ValueError("Table '{0}' was already written.".format(name))
+        with profiling.stage("write table") as st:
+            st.frame(table)
+            self.tables[name] = write_table(table, self.path, name, self.fmt)
+        write_manifest(self.path, self.fmt, self.tables, complete=False)
+
+    def close(self):
+        """Mark the collection as complete."""
+        return write_manifest(self.path, self.fmt, self.tables)
+
+
+def read_table(path, name, manifest=None):
+    """Read one table of a stored collection."""
+    if manifest is None:
+        manifest = read_manifest(path)
+    try:
+        entry = manifest["tables"][name]
+    except KeyError:
+        raise KeyError(
+            "No table '{0}' in collection '{1}'.".format(name, path)
+        ) from None
+    filename = os.path.join(path, entry["file"])
+    if manifest["format"] == "parquet":
+        flat = pd.read_parquet(filename)
+    else:
+        flat = pd.read_feather(filename)
+    return _decode(flat, entry)
+
+
+class StoredCollection(Mapping):
+    """Read-only mapping of a stored collection.
+
+    Only the manifest is read on creation. A table is read from its file on
+    every access, so unused tables never occupy memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = read_manifest(path)
+
+    def __getitem__(self, name):
+        return read_table(self.path, name, manifest=self.manifest)
+
+    def __iter__(self):
+        return iter(self.manifest["tables"])
+
+    def __len__(self):
+        return len(self.manifest["tables"])
+
+    def __repr__(self):
+        return "StoredCollection({0!r}, tables={1})".format(
+            self.path, list(self)
+        )
+
+    def shape(self, name):
+        """Shape of a table without reading it."""
+        return tuple(self.manifest["tables"][name]["shape"])
+
+    def to_dict(self):
+        """Read all tables."""
+        return {name: self[name] for name in self}
+
+
+def read_collection(path):
+    """Open a stored collection (see StoredCollection)."""
+    return StoredCollection(path)
@@ -9,18 +9,24 @@ import logging
 from warnings import warn
 
 import pandas as pd
-from reegis import commodity_sources
-from reegis import config as cfg
 
 from scenario_builder import data
+from scenario_builder import lazy
+from scenario_builder import profiling
+from scenario_builder import settings
 
+commodity_sources = lazy.module("reegis.commodity_sources")
 
-def scenario_commodity_sources(year):
+
+@profiling.timed()
+def scenario_commodity_sources(year, conf=None):
     """
 
     Parameters
     ----------
     year
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
 
     Returns
     -------
@@ -38,10 +44,12 @@ def scenario_commodity_sources(year):
     >>> round(src.loc[("DE", "natural gas"), "emission"], 2)  # doctest: +SKIP
     201.0
     """
-    if cfg.get("creator", "costs_source") == "reegis":
-        commodity_src = create_commodity_sources_reegis(year)
-    elif cfg.get("creator", "costs_source") == "ewi":
-        commodity_src = create_commodity_sources_ewi()
+    if conf is None:
+        conf = settings.snapshot()
+    if conf.creator.costs_source == "reegis":
+        commodity_src = create_commodity_sources_reegis(year, conf=conf)
+    elif conf.creator.costs_source == "ewi":
+        commodity_src = create_commodity_sources_ewi(conf=conf)
     else:
         commodity_src = None
 
@@ -50,21 +58,26 @@ def scenario_commodity_sources(year):
         [["DE"], commodity_src.index]
     )
 
-    if cfg.get("creator", "use_CO2_costs") is False:
+    if conf.creator.use_CO2_costs is False:
         commodity_src["co2_price"] = 0
 
     commodity_src["annual limit"] = "inf"
     return commodity_src
 
 
-def create_commodity_sources_ewi():
+@profiling.timed()
+def create_commodity_sources_ewi(conf=None):
     """
 
+    Parameters
+    ----------
+    conf : settings.ConfigSnapshot or None
+
     Returns
     -------
 
     """
-    ewi = data.get_ewi_data()
+    ewi = data.get_ewi_data(conf=conf)
     df = pd.DataFrame()
     df["costs"] = ewi.fuel_costs["value"] + ewi.transport_costs["value"]
     df["emission"] = ewi.emission["value"].multiply(1000)
@@ -81,13 +94,15 @@ def create_commodity_sources_ewi():
     return df
 
 
-def create_commodity_sources_reegis(year, use_znes_2014=True):
+@profiling.timed()
+def create_commodity_sources_reegis(year, use_znes_2014=True, conf=None):
     """
 
     Parameters
     ----------
     year
     use_znes_2014
+    conf : settings.ConfigSnapshot or None
 
     Returns
     -------
@@ -103,10 +118,12 @@ def create_commodity_sources_reegis(year, use_znes_2014=True):
         "emission": ["emission", "g/J", 1e6 * 3.6, "kg/MWh"],
     }
 
-    cs = commodity_sources.get_commodity_sources()
+    if conf is None:
+        conf = settings.snapshot()
+    with profiling.stage("reegis commodity sources"):
+        cs = commodity_sources.get_commodity_sources()
     rename_cols = {
-        key.lower(): value
-        for key, value in cfg.get_dict("source_names").items()
+        key.lower(): value for key, value in conf.source_names.items()
     }
     cs = cs.rename(columns=rename_cols)
     cs_year = cs.loc[year]
@@ -0,0 +1,182 @@
+"""Compact mode: smaller dtypes for all tables of a scenario.
+
+Hourly series are stored as float32 (integer series with the smallest
+integer type) and string columns of all tables become categoricals. The
+memory of every table before and after the conversion is reported and a
+warning is raised if the tables of a scenario exceed the memory budget.
+
+The mode is switched on in the config::
+
+    [creator]
+    compact = True
+    # optional, in MiB
+    memory_budget = 2048
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import logging
+from warnings import warn
+
+import numpy as np
+import pandas as pd
+
+MIB = 2 ** 20
+
+
+def is_series_table(name):
+    """Hourly series tables are named "... series".
+
+    Examples
+    --------
+    >>> is_series_table("electricity demand series")
+    True
+    >>> is_series_table("power plants")
+    False
+    """
+    return name.endswith("series")
+
+
+def memory_usage(table):
+    """Memory of a table in bytes including the content of objects."""
+    usage = table.memory_usage(deep=True, index=True)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+
+def _is_string_column(column):
+    if column.dtype == object:
+        return pd.api.types.infer_dtype(column, skipna=True) == "string"
+    return pd.api.types.is_string_dtype(column.dtype)
+
+
+def compact_table(table, series=False):
+    """Return a copy of the table with compact dtypes.
+
+    Parameters
+    ----------
+    table : pandas.DataFrame or pandas.Series
+    series : bool
+        Downcast float columns to float32 and integer columns to the
+        smallest integer type. Should only be used for the hourly series.
+
+    Examples
+    --------
+    >>> df = pd.DataFrame({"capacity": [1.5, 2.5], "fuel": ["oil", "oil"]})
+    >>> compact_table(df).dtypes.astype(str).tolist()
+    ['float64', 'category']
+    >>> series = pd.DataFrame({"DE": [1.0, 2.0], "mobility": [3, 4]})
+    >>> compact_table(series, series=True).dtypes.astype(str).tolist()
+    ['float32', 'int8']
+    """
+    if isinstance(table, pd.Series):
+        frame = compact_table(table.to_frame(), series=series)
+        return frame.iloc[:, 0].rename(table.name)
+    columns = {}
+    for number, (_, column) in enumerate(table.items()):
+        if series and pd.api.types.is_float_dtype(column.dtype):
+            column = column.astype(np.float32)
+        elif series and pd.api.types.is_integer_dtype(column.dtype):
+            column = pd.to_numeric(column, downcast="integer")
+        elif _is_string_column(column):
+            column = column.astype("category")
+        columns[number] = column
+    if not columns:
+        return table
+    compacted = pd.concat(columns, axis=1)
+    compacted.columns = table.columns
+    return compacted
+
+
+class Compactor:
+    """Compact tables one by one and keep a memory report.
+
+    Parameters
+    ----------
+    budget : float or None
+        Memory budget in MiB for all tables passed to the compactor. A
+        warning is raised once if it is exceeded.
+
+    Examples
+    --------
+    >>> compactor = Compactor(budget=1)
+    >>> df = pd.DataFrame({"DE": np.ones(8760)})
+    >>> df = compactor("electricity demand series", df)
+    >>> compactor.report().loc["electricity demand series"].round(2).tolist()
+    [0.07, 0.03]
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.rows = {}
+        self._warned = False
+
+    def __call__(self, name, table):
+        before = memory_usage(table)
+        table = compact_table(table, series=is_series_table(name))
+        after = memory_usage(table)
+        self.rows[name] = (before / MIB, after / MIB)
+        logging.info(
+            "Compact '{0}': {1:.1f} MiB -> {2:.1f} MiB".format(
+                name, before / MIB, after / MIB
+            )
+        )
+        self.check_budget()
+        return table
+
+    def total(self):
+        """Memory of all compacted tables in MiB."""
+        return sum(after for _, after in self.rows.values())
+
+    def check_budget(self):
+        if self.budget is None or self._warned:
+            return
+        if self.total() > self.budget:
+            self._warned = True
+            msg = (
+                "The tables of the scenario need {0:.1f} MiB in compact mode "
+                "and exceed the memory budget of {1} MiB."
+            )
+            warn(msg.format(self.total(), self.budget), UserWarning)
+
+    def report(self):
+        """Memory of all tables before and after the conversion in MiB.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        report = pd.DataFrame.from_dict(
+            self.rows,
+            orient="index",
+            columns=["before [MiB]", "after [MiB]"],
+        )
+        report.index.name = "table"
+        return report
+
+
+def compactor_from_config(conf):
+    """Return a Compactor if the compact mode is switched on, else None."""
+    if not conf.get("creator", "compact", fallback=False):
+        return None
+    budget = conf.get("creator", "memory_budget", fallback=None)
+    return Compactor(budget=budget)
+
+
+def compact_collection(table_collection, budget=None):
+    """Compact all tables of a collection.
+
+    Returns
+    -------
+    tuple : The new collection and the memory report (DataFrame).
+    """
+    compactor = Compactor(budget=budget)
+    tables = {
+        name: compactor(name, table)
+        for name, table in table_collection.items()
+    }
+    return tables, compactor.report()
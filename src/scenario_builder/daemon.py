@@ -0,0 +1,313 @@
+"""Local build service that keeps intermediate results in memory.
+
+Every ``scenario-builder build`` starts a new process that imports reegis,
+loads the region map and the power plant table and computes every stage of
+a scenario. The build service is one long-running process that builds
+scenarios on request. The region maps and power plant tables stay loaded
+(see :func:`scenario_builder.build.shared`) and the results of all stages
+are kept in a :class:`scenario_builder.checkpoint.MemoryCache`, so a repeated
+build with the same inputs only copies the stages from memory. Stages with
+changed inputs (e.g. other config options) are computed again.
+
+The service listens on localhost::
+
+    scenario-builder serve --port 8765 --cache-mib 4096
+
+and is used with :func:`request_build`. The requests are processed one after
+the other. The tables are sent pickled, so only use a service that was
+started by yourself.
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import json
+import logging
+import pickle
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+from scenario_builder import build
+from scenario_builder import checkpoint
+from scenario_builder import settings
+
+PORT = 8765
+
+# Arguments of a build request and their JSON types
+REQUEST_ARGUMENTS = {
+    "year": int,
+    "map": str,
+    "weather_year": int,
+    "overrides": dict,
+    "output": str,
+    "fmt": str,
+}
+
+
+class BuildError(Exception):
+    """A build request failed."""
+
+
+class BuildService:
+    """Build scenarios in this process with warm intermediate results.
+
+    Parameters
+    ----------
+    conf : settings.ConfigSnapshot or None
+        Config of all builds. The options of a request are added to it.
+    cache_mib : float
+        Size of the cache of the stages in MiB.
+    shared_entries : int or None
+        Number of shared results (region maps, power plant tables) that are
+        kept (see :func:`scenario_builder.build.limit_shared`).
+    """
+
+    def __init__(self, conf=None, cache_mib=2048, shared_entries=16):
+        if conf is None:
+            conf = settings.snapshot()
+        self.conf = conf
+        self.cache = checkpoint.MemoryCache(cache_mib)
+        build.limit_shared(shared_entries)
+
+    def status(self):
+        """Size and hits of the cache."""
+        return {
+            "entries": len(self.cache),
+            "mib": round(self.cache.nbytes / checkpoint.MIB, 1),
+            "max mib": round(self.cache.max_bytes / checkpoint.MIB, 1),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
+
+    def build(
+        self,
+        year,
+        map,
+        weather_year=None,
+        overrides=None,
+        output=None,
+        fmt="csv",
+    ):
+        """Build one scenario.
+
+        Parameters
+        ----------
+        year : int
+        map : str
+            See :func:`scenario_builder.build.load_regions`.
+        weather_year : int or None
+        overrides : dict or None
+            Changed config options ({section: {option: value}}).
+        output : str or None
+            Write the scenario to this directory (see
+            :func:`scenario_builder.build.build_and_write`).
+        fmt : str
+
+        Returns
+        -------
+        dict : The table collection or the path of the written scenario if
+            an output directory is given.
+        """
+        conf = self.conf
+        if overrides:
+            conf = conf.updated(overrides)
+        scenario = build.Scenario(int(year), map, weather_year)
+        # The input files of the map must exist before the stage keys are
+        # computed.
+        build.prepare_maps(
+            [map], conf=conf, years=[scenario.year], checkpoints=self.cache
+        )
+        if output is None:
+            return build.build_scenario(
+                scenario, conf=conf, checkpoints=self.cache
+            )
+        return build.build_and_write(
+            scenario, output, fmt=fmt, conf=conf, checkpoints=self.cache
+        )
+
+
+def _build_arguments(request):
+    """Check the arguments of a build request.
+
+    Raises
+    ------
+    ValueError
+        If an argument is missing, unknown or has a wrong type.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("A build request must be a JSON object.")
+    unknown = set(request) - set(REQUEST_ARGUMENTS)
+    if unknown:
+        raise ValueError("Unknown arguments {0}.".format(sorted(unknown)))
+    for name in ("year", "map"):
+        if request.get(name) is None:
+            raise ValueError("The argument '{0}' is missing.".format(name))
+    for name, types in REQUEST_ARGUMENTS.items():
+        value = request.get(name)
+        if value is not None and not isinstance(value, types):
+            raise ValueError(
+                "Wrong type of '{0}': {1!r}.".format(name, value)
+            )
+    if isinstance(request["year"], bool) or isinstance(
+        request.get("weather_year"), bool
+    ):
+        raise ValueError("The years must be integers.")
+    overrides = request.get("overrides") or {}
+    if not all(isinstance(o, dict) for o in overrides.values()):
+        raise ValueError(
+            "The overrides must be given as {section: {option: value}}."
+        )
+    fmt = request.get("fmt") or "csv"
+    if fmt not in build.FORMATS:
+        raise ValueError(
+            "Unknown format '{0}'. Use one of {1}.".format(fmt, build.FORMATS)
+        )
+    return dict(request, fmt=fmt)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send(self, status, body, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._send(404, {"error": "Unknown path {0}.".format(self.path)})
+            return
+        self._send(200, self.service.status())
+
+    def do_POST(self):
+        if self.path != "/build":
+            self._send(404, {"error": "Unknown path {0}.".format(self.path)})
+            return
+        # Only invalid requests are bad requests. A ValueError of the build
+        # itself is a failed build.
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            request = _build_arguments(request)
+        except ValueError as e:
+            self._send(400, {"error": repr(e)})
+            return
+        start = time.perf_counter()
+        try:
+            result = self.service.build(**request)
+        except Exception as e:
+            logging.exception("Build request %s failed.", request)
+            self._send(500, {"error": repr(e)})
+            return
+        logging.info(
+            "Build request %s finished in %.2f s.",
+            request,
+            time.perf_counter() - start,
+        )
+        if request.get("output") is None:
+            self._send(
+                200,
+                pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL),
+                content_type="application/octet-stream",
+            )
+        else:
+            self._send(200, {"path": result})
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+def server(service=None, host="127.0.0.1", port=PORT):
+    """Return the HTTP server of a build service (port 0: any free port).
+
+    Start it with ``serve_forever()``.
+    """
+    if service is None:
+        service = BuildService()
+    handler = type("Handler", (_Handler,), {"service": service})
+    return HTTPServer((host, port), handler)
+
+
+def serve(host="127.0.0.1", port=PORT, **kwargs):
+    """Run a build service until it is interrupted.
+
+    The keyword arguments are passed to :class:`BuildService`.
+    """
+    httpd = server(BuildService(**kwargs), host=host, port=port)
+    logging.info("Build service listening on %s:%d.", *httpd.server_address)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def _url(port, host, path):
+    return "http://{0}:{1}{2}".format(host, port, path)
+
+
+def request_build(
+    year,
+    map,
+    weather_year=None,
+    overrides=None,
+    output=None,
+    fmt="csv",
+    port=PORT,
+    host="127.0.0.1",
+    timeout=None,
+):
+    """Build a scenario with a running build service.
+
+    The parameters are those of :meth:`BuildService.build`.
+
+    Returns
+    -------
+    dict : The table collection or the path of the written scenario.
+
+    Raises
+    ------
+    BuildError
+        If the service could not build the scenario.
+    """
+    request = {
+        "year": year,
+        "map": map,
+        "weather_year": weather_year,
+        "overrides": overrides,
+        "output": output,
+        "fmt": fmt,
+    }
+    body = json.dumps(request).encode("utf-8")
+    http_request = urllib.request.Request(
+        _url(port, host, "/build"),
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as answer:
+            content = answer.read()
+    except urllib.error.HTTPError as e:
+        raise BuildError(json.loads(e.read().decode("utf-8"))["error"])
+    if output is None:
+        return pickle.loads(content)
+    return json.loads(content.decode("utf-8"))["path"]
+
+
+def request_status(port=PORT, host="127.0.0.1", timeout=None):
+    """Size and hits of the cache of a running build service."""
+    url = _url(port, host, "/status")
+    with urllib.request.urlopen(url, timeout=timeout) as answer:
+        return json.loads(answer.read().decode("utf-8"))
@@ -10,13 +10,17 @@ __copyright__ = "Uwe Krien <krien@uni-bremen.de>"
 __license__ = "MIT"
 
 
+import hashlib
 import os
 from types import SimpleNamespace
 
 import pandas as pd
 
-from reegis import config as cfg
-from reegis import tools
+from scenario_builder import lazy
+from scenario_builder import profiling
+from scenario_builder import settings
+
+tools = lazy.module("reegis.tools")
 
 TRANSLATION_FUEL = {
     "Abfall": "waste",
@@ -32,8 +36,37 @@ TRANSLATION_FUEL = {
 }
 
 
-def get_ewi_data():
+def map_fingerprint(regions):
+    """Return a fingerprint of a region map (SHA-256 as hex string).
+
+    The fingerprint depends on the ids of the regions and on their
+    geometries, so results that are stored per map become invalid if the
+    map is changed.
+
+    Examples
+    --------
+    >>> regions = pd.DataFrame(index=["DE01", "DE02"])
+    >>> map_fingerprint(regions) == map_fingerprint(regions.copy())
+    True
+    >>> map_fingerprint(regions) == map_fingerprint(regions.iloc[:1])
+    False
     """
+    sha = hashlib.sha256()
+    sha.update("\n".join(str(i) for i in regions.index).encode())
+    if "geometry" in regions:
+        for geometry in regions["geometry"]:
+            sha.update(b"\0" if geometry is None else geometry.wkb)
+    return sha.hexdigest()
+
+
+@profiling.timed()
+def get_ewi_data(conf=None):
+    """
+
+    Parameters
+    ----------
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
 
     Returns
     -------
@@ -53,8 +86,11 @@ def get_ewi_data():
         "https://www.ewi.uni-koeln.de/cms/wp-content/uploads/2019/12"
         "/EWI_Merit_Order_Tool_2019_1_4.xlsm"
     )
-    fn = os.path.join(cfg.get("paths", "general"), "ewi.xls")
-    tools.download_file(fn, url)
+    if conf is None:
+        conf = settings.snapshot()
+    fn = os.path.join(conf.paths.general, "ewi.xls")
+    with profiling.stage("download ewi file"):
+        tools.download_file(fn, url)
 
     # Create named tuple with all sub tables
     ewi_tables = {
@@ -72,15 +108,16 @@ def get_ewi_data():
     }
     ewi_data = {}
     cols = ["fuel", "value", "unit", "source"]
-    xls = pd.ExcelFile(fn)
-    for table in ewi_tables.keys():
-        tmp = xls.parse("Start", header=[0], **ewi_tables[table]).replace(
-            TRANSLATION_FUEL
-        )
-        tmp.drop_duplicates(tmp.columns[0], keep="first", inplace=True)
-        tmp.columns = cols
-        ewi_data[table] = tmp.set_index("fuel")
-        if "scale" in ewi_tables[table]:
-            ewi_data[table]["value"] *= ewi_tables[table]["scale"]
+    with profiling.stage("parse ewi file"):
+        xls = pd.ExcelFile(fn)
+        for table in ewi_tables.keys():
+            tmp = xls.parse("Start", header=[0], **ewi_tables[table]).replace(
+                TRANSLATION_FUEL
+            )
+            tmp.drop_duplicates(tmp.columns[0], keep="first", inplace=True)
+            tmp.columns = cols
+            ewi_data[table] = tmp.set_index("fuel")
+            if "scale" in ewi_tables[table]:
+                ewi_data[table]["value"] *= ewi_tables[table]["scale"]
 
     return SimpleNamespace(**ewi_data)
@@ -1,23 +1,45 @@
 """Create a basic scenario from the internal data structure.
 
+The electricity demand of many (year, weather year) combinations is created
+in one batch (see :func:`elec_demand_series`): the ENTSO-E load file is
+read once and all series are scaled in one step. The load and the regional
+demand can be passed in, so that a process reads them once for many
+scenarios.
+
 SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
 
 SPDX-License-Identifier: MIT
 """
 
 
-import calendar
+import datetime
 import logging
 import os
 
+import numpy as np
 import pandas as pd
-from reegis import config as cfg
-from reegis import demand_elec
-from reegis import demand_heat
+
+from scenario_builder import lazy
+from scenario_builder import profiling
+from scenario_builder import settings
+from scenario_builder import timeindex
+
+bmwi = lazy.module("reegis.bmwi")
+demand_heat = lazy.module("reegis.demand_heat")
+entsoe = lazy.module("reegis.entsoe")
+openego = lazy.module("reegis.openego")
+reegis_config = lazy.module("reegis.config")
 
 
+@profiling.timed()
 def get_heat_profiles_deflex(
-    deflex_geo, year, time_index=None, weather_year=None, keep_unit=False
+    deflex_geo,
+    year,
+    time_index=None,
+    weather_year=None,
+    keep_unit=False,
+    conf=None,
+    to_csv=True,
 ):
     """
 
@@ -28,13 +50,21 @@ def get_heat_profiles_deflex(
     time_index
     weather_year
     keep_unit
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+    to_csv : bool
+        Store the regional profiles of reegis in the demand directory. The
+        file is not read again, so it can be skipped if many weather years
+        are processed (see :mod:`scenario_builder.ensemble`).
 
     Returns
     -------
 
     """
+    if conf is None:
+        conf = settings.snapshot()
     # separate_regions=keep all demand connected to the region
-    separate_regions = cfg.get_list("creator", "separate_heat_regions")
+    separate_regions = conf.get_list("creator", "separate_heat_regions")
     # Add lower and upper cases to be not case sensitive
     separate_regions = [x.upper() for x in separate_regions] + [
         x.lower() for x in separate_regions
@@ -45,20 +75,24 @@ def get_heat_profiles_deflex(
     combine_fuels = {"natural gas": "gas"}
 
     # fuels to be dissolved per region
-    region_fuels = cfg.get_list("creator", "local_fuels")
-
-    fn = os.path.join(
-        cfg.get("paths", "demand"),
-        "heat_profiles_{year}_{map}".format(year=year, map=deflex_geo.name),
-    )
+    region_fuels = conf.get_list("creator", "local_fuels")
+
+    fn = None
+    if to_csv:
+        fn = os.path.join(
+            conf.paths.demand,
+            "heat_profiles_{year}_{map}".format(
+                year=year, map=deflex_geo.name
+            ),
+        )
 
-    demand_region = (
-        demand_heat.get_heat_profiles_by_region(
-            deflex_geo, year, to_csv=fn, weather_year=weather_year
+    with profiling.stage("reegis heat profiles") as st:
+        demand_region = st.frame(
+            demand_heat.get_heat_profiles_by_region(
+                deflex_geo, year, to_csv=fn, weather_year=weather_year
+            )
         )
-        .groupby(level=[0, 1], axis=1)
-        .sum()
-    )
+    demand_region = demand_region.T.groupby(level=[0, 1]).sum().T
 
     # Decentralised demand is combined to a nation-wide demand if not part
     # of region_fuels.
@@ -95,7 +129,7 @@ def get_heat_profiles_deflex(
         demand_region = demand_region.div(converter)
         logging.debug(msg.format(converter))
 
-    demand_region.sort_index(1, inplace=True)
+    demand_region.sort_index(axis=1, inplace=True)
 
     for c in demand_region.columns:
         if demand_region[c].sum() == 0:
@@ -104,7 +138,17 @@ def get_heat_profiles_deflex(
     return demand_region
 
 
-def scenario_demand(regions, year, name, opsd_version=None, weather_year=None):
+@profiling.timed()
+def scenario_demand(
+    regions,
+    year,
+    name,
+    opsd_version=None,
+    weather_year=None,
+    conf=None,
+    heat_demand=None,
+    elec_demand=None,
+):
     """
 
     Parameters
@@ -114,6 +158,13 @@ def scenario_demand(regions, year, name, opsd_version=None, weather_year=None):
     name
     opsd_version
     weather_year
+    conf : settings.ConfigSnapshot or None
+    heat_demand : pandas.DataFrame or None
+        Result of get_heat_profiles_deflex() if it has already been created
+        for this scenario.
+    elec_demand : pandas.DataFrame or None
+        Electricity demand series of this scenario if it has already been
+        created in a batch (see :func:`elec_demand_series`).
 
     Returns
     -------
@@ -129,8 +180,10 @@ def scenario_demand(regions, year, name, opsd_version=None, weather_year=None):
     10069304
 
     """
-    demand_series = {
-        "electricity demand series": scenario_elec_demand(
+    if conf is None:
+        conf = settings.snapshot()
+    if elec_demand is None:
+        elec_demand = scenario_elec_demand(
             pd.DataFrame(),
             regions,
             year,
@@ -138,15 +191,20 @@ def scenario_demand(regions, year, name, opsd_version=None, weather_year=None):
             weather_year=weather_year,
             version=opsd_version,
         )
-    }
-    if cfg.get("creator", "heat"):
-        demand_series["heat demand series"] = scenario_heat_demand(
-            regions, year, weather_year=weather_year
-        ).reset_index(drop=True)
+    demand_series = {"electricity demand series": elec_demand}
+    if conf.creator.heat:
+        if heat_demand is None:
+            heat_demand = scenario_heat_demand(
+                regions, year, weather_year=weather_year, conf=conf
+            )
+        demand_series["heat demand series"] = timeindex.get_calendar(
+            year, weather_year
+        ).conform(heat_demand.sort_index(axis=1), "heat demand series")
     return demand_series
 
 
-def scenario_heat_demand(regions, year, weather_year=None):
+@profiling.timed()
+def scenario_heat_demand(regions, year, weather_year=None, conf=None):
     """
 
     Parameters
@@ -154,16 +212,18 @@ def scenario_heat_demand(regions, year, weather_year=None):
     regions
     year
     weather_year
+    conf : settings.ConfigSnapshot or None
 
     Returns
     -------
 
     """
     return get_heat_profiles_deflex(
-        regions, year, weather_year=weather_year
-    ).sort_index(1)
+        regions, year, weather_year=weather_year, conf=conf
+    ).sort_index(axis=1)
 
 
+@profiling.timed()
 def scenario_elec_demand(
     table, regions, year, name, version=None, weather_year=None
 ):
@@ -181,19 +241,164 @@ def scenario_elec_demand(
     -------
 
     """
-    if weather_year is None:
-        demand_year = year
-    else:
-        demand_year = weather_year
+    df = elec_demand_series(
+        regions, name, [(year, weather_year)], version=version
+    )[(year, weather_year)]
+    if table.empty:
+        return df
+    return pd.concat([table, df], axis=1).sort_index(axis=1)
+
+
+def entsoe_load_file(year, version=None):
+    """Path of the load file of reegis. It is created for the year if it is
+    missing."""
+    if version is None:
+        version = reegis_config.get("entsoe", "timeseries_version")
+    filename = os.path.join(
+        reegis_config.get("paths", "entsoe"),
+        reegis_config.get("entsoe", "load_file"),
+    ).format(version=version)
+    if not os.path.isfile(filename):
+        entsoe.get_entsoe_load(year, version=version)
+    return filename
+
+
+def read_entsoe_load(year, version=None):
+    """The German load of all years of the ENTSO-E time series of reegis.
+
+    The load file is created by reegis for the year if it is missing.
+
+    Returns
+    -------
+    pandas.Series
+    """
+    filename = entsoe_load_file(year, version=version)
+    with profiling.stage("read entsoe load") as st:
+        load = st.frame(pd.DataFrame(pd.read_hdf(filename, "entsoe")))
+    return load["DE_load_"]
+
+
+def entsoe_load(years, version=None, load=None):
+    """The German load of the ENTSO-E time series of reegis for many years.
+
+    The load file is read once (it is created by reegis if it is missing).
+    A year has the same hours as in ``reegis.entsoe.get_entsoe_load()``.
+
+    Parameters
+    ----------
+    years : list
+    version : str or None
+        Version of the OPSD file. The version of the reegis config if None.
+    load : pandas.Series or None
+        Result of :func:`read_entsoe_load`. The load file is read if None.
+
+    Returns
+    -------
+    dict : {year: pandas.Series}
+    """
+    if load is None:
+        load = read_entsoe_load(min(years), version=version)
+    loads = {}
+    for year in years:
+        start = datetime.datetime(year, 1, 1, 0).astimezone()
+        end = datetime.datetime(year, 12, 31, 23).astimezone()
+        loads[year] = load.loc[start:end]
+    return loads
+
+
+def _annual_elec_demand(annual_demand, year, load, ego_demand):
+    """Annual electricity demand in MWh (as in reegis.demand_elec)."""
+    if annual_demand == "bmwi":
+        return bmwi.get_annual_electricity_demand_bmwi(year) * 10 ** 6
+    if annual_demand == "entsoe":
+        return load.sum()
+    if annual_demand == "openego":
+        return ego_demand.sum() * 10 ** 3
+    if isinstance(annual_demand, (int, float)):
+        return annual_demand
+    raise ValueError(
+        "{0} of type {1} is not a valid input for 'annual_demand'.\n"
+        "Use 'bmwi', 'entsoe', 'openego' or a float/int value.".format(
+            annual_demand, type(annual_demand)
+        )
+    )
+
+
+@profiling.timed()
+def elec_demand_series(
+    regions,
+    name,
+    scenarios,
+    version=None,
+    annual_demand="bmwi",
+    load=None,
+    ego_demand=None,
+):
+    """Electricity demand series of many (year, weather year) combinations.
 
-    df = demand_elec.get_entsoe_profile_by_region(
-        regions, demand_year, name, annual_demand="bmwi", version=version
+    The load profile of the weather year (of the year if None) is
+    distributed to the regions by the demand of openego and scaled to the
+    annual demand of that year. The load file and the regional demand are
+    read once, all series are scaled in one step (years x hours x regions)
+    and every series is conformed to the calendar of its scenario.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    name : str
+        Name of the region map.
+    scenarios : list
+        (year, weather year) tuples.
+    version : str or None
+        Version of the OPSD file (see :func:`entsoe_load`).
+    annual_demand : str or float
+        "bmwi", "entsoe", "openego" or a value in MWh.
+    load : pandas.Series or None
+        German load of :func:`read_entsoe_load`. The load file is read if
+        None.
+    ego_demand : pandas.Series or None
+        Regional demand of ``reegis.openego.get_ego_demand_by_region()``
+        (grouped). It is computed if None.
+
+    Returns
+    -------
+    dict : {(year, weather year): pandas.DataFrame} with the columns
+        (region, "all").
+    """
+    scenarios = [tuple(scenario) for scenario in scenarios]
+    demand_years = sorted(
+        {weather_year or year for year, weather_year in scenarios}
     )
-    df = pd.concat([df], axis=1, keys=["all"]).swaplevel(0, 1, 1)
-    df = df.reset_index(drop=True)
-    if not calendar.isleap(year) and len(df) > 8760:
-        df = df.iloc[:8760]
-    return pd.concat([table, df], axis=1).sort_index(1)
+    loads = entsoe_load(demand_years, version=version, load=load)
+    if ego_demand is None:
+        ego_demand = openego.get_ego_demand_by_region(
+            regions, name, grouped=True
+        )
+    shares = (ego_demand / ego_demand.sum()).sort_index()
+
+    hours = max(len(load) for load in loads.values())
+    profiles = np.full((len(demand_years), hours), np.nan)
+    annual = np.empty(len(demand_years))
+    for n, demand_year in enumerate(demand_years):
+        load = loads[demand_year].to_numpy(dtype=float)
+        profiles[n, : len(load)] = load / np.nansum(load)
+        annual[n] = _annual_elec_demand(
+            annual_demand, demand_year, loads[demand_year], ego_demand
+        )
+    # (years, hours, regions)
+    series = (profiles * annual[:, None])[:, :, None] * shares.to_numpy()
+
+    columns = pd.MultiIndex.from_product([shares.index, ["all"]])
+    tables = {}
+    for year, weather_year in scenarios:
+        n = demand_years.index(weather_year or year)
+        table = pd.DataFrame(
+            series[n, : len(loads[demand_years[n]])], columns=columns
+        )
+        tables[(year, weather_year)] = timeindex.get_calendar(
+            year, weather_year
+        ).conform(table, "electricity demand series")
+    return tables
 
 
 if __name__ == "__main__":
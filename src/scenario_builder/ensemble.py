@@ -0,0 +1,200 @@
+"""Heat demand of many weather years without keeping all years in memory.
+
+:func:`iter_heat_profiles` yields the aggregated heat demand (see
+:func:`scenario_builder.demand.get_heat_profiles_deflex`) of one weather
+year after the other. The next weather year is created by a background
+thread while the caller processes the current one. :class:`RunningStats`
+collects the annual totals and peaks of every column, so the ensemble peak
+of a region can be used to size the chp plants
+(``powerplants.scenario_chp(design=...)``).
+
+Examples
+--------
+>>> import numpy as np
+>>> import pandas as pd
+>>> def profile(weather_year):
+...     hours = np.arange(8760)
+...     return pd.DataFrame({("DE01", "district heating"):
+...         1 + np.cos(hours / 8760 * 2 * np.pi) * (weather_year - 2000)})
+>>> stats = RunningStats()
+>>> for weather_year, heat in iter_weather_years(profile, range(2001, 2011)):
+...     stats.add(heat, weather_year)
+>>> stats.count
+10
+>>> float(stats.max.iloc[0]), float(stats.quantile(0.5).iloc[0])
+(11.0, 6.5)
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+from collections import deque
+from concurrent import futures
+
+import pandas as pd
+
+from scenario_builder import demand
+from scenario_builder import profiling
+from scenario_builder import settings
+
+
+def iter_weather_years(func, weather_years, ahead=1):
+    """Yield (weather_year, func(weather_year)) for all weather years.
+
+    Up to ``ahead`` following weather years are created in a background
+    thread while the caller processes the current one. Pending results are
+    cancelled if the generator is closed early.
+
+    Parameters
+    ----------
+    func : callable
+        Called with the weather year.
+    weather_years : iterable
+    ahead : int
+        Number of weather years that are created in advance (0: none).
+    """
+    weather_years = list(weather_years)
+    if ahead < 1:
+        for weather_year in weather_years:
+            yield weather_year, func(weather_year)
+        return
+    pool = futures.ThreadPoolExecutor(max_workers=1)
+    pending = deque()
+    todo = iter(weather_years)
+    try:
+        while True:
+            # The current and the following weather years are submitted
+            # before the current result is awaited.
+            for weather_year in todo:
+                pending.append((weather_year, pool.submit(func, weather_year)))
+                if len(pending) > ahead:
+                    break
+            if not pending:
+                break
+            weather_year, job = pending.popleft()
+            yield weather_year, job.result()
+    finally:
+        for _, job in pending:
+            job.cancel()
+        pool.shutdown(wait=True)
+
+
+def iter_heat_profiles(
+    regions, year, weather_years, ahead=1, conf=None, to_csv=False
+):
+    """Yield the heat demand of a scenario year for many weather years.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    year : int
+        Year of the demand.
+    weather_years : iterable
+    ahead : int
+        Number of weather years that are created in advance.
+    conf : settings.ConfigSnapshot or None
+    to_csv : bool
+        Store the regional profiles of reegis (see
+        :func:`scenario_builder.demand.get_heat_profiles_deflex`).
+
+    Yields
+    ------
+    tuple : (weather_year, pandas.DataFrame)
+    """
+    if conf is None:
+        conf = settings.snapshot()
+
+    def heat_profiles(weather_year):
+        with profiling.stage("heat profiles {0}".format(weather_year)):
+            return demand.get_heat_profiles_deflex(
+                regions,
+                year,
+                weather_year=weather_year,
+                conf=conf,
+                to_csv=to_csv,
+            )
+
+    return iter_weather_years(heat_profiles, weather_years, ahead=ahead)
+
+
+class RunningStats:
+    """Annual totals and peaks of the columns of many weather years.
+
+    Only the total and the peak of every column and year are kept, so the
+    memory does not depend on the length of the series. Columns that are
+    missing in a year (e.g. because the demand is zero) count as zero.
+    """
+
+    def __init__(self):
+        self._totals = {}
+        self._peaks = {}
+
+    def add(self, table, weather_year=None):
+        """Add the series of one weather year."""
+        if weather_year is None:
+            weather_year = len(self._totals)
+        if weather_year in self._totals:
+            raise ValueError(
+                "Weather year {0} was already added.".format(weather_year)
+            )
+        self._totals[weather_year] = table.sum()
+        self._peaks[weather_year] = table.max()
+
+    @property
+    def count(self):
+        """Number of weather years."""
+        return len(self._totals)
+
+    def _frame(self, values):
+        if not values:
+            raise ValueError("No weather year was added.")
+        return pd.DataFrame(values).T.fillna(0)
+
+    @property
+    def totals(self):
+        """Annual total of every weather year (rows) and column."""
+        return self._frame(self._totals)
+
+    @property
+    def peaks(self):
+        """Annual peak of every weather year (rows) and column."""
+        return self._frame(self._peaks)
+
+    @property
+    def sum(self):
+        """Total of all weather years."""
+        return self.totals.sum()
+
+    @property
+    def mean(self):
+        """Mean annual total."""
+        return self.totals.mean()
+
+    @property
+    def max(self):
+        """Highest peak of all weather years."""
+        return self.peaks.max()
+
+    def quantile(self, q):
+        """Quantile of the annual peaks (linear interpolation)."""
+        return self.peaks.quantile(q)
+
+    def design(self, q=None):
+        """Peak and annual total to size plants.
+
+        Parameters
+        ----------
+        q : float or None
+            Quantile of the annual peaks. The highest peak if None.
+
+        Returns
+        -------
+        pandas.DataFrame : The rows "max" (peak) and "sum" (mean annual
+            total) with the columns of the series.
+        """
+        peak = self.max if q is None else self.quantile(q)
+        return pd.DataFrame({"max": peak, "sum": self.mean}).T
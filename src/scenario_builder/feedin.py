@@ -1,14 +1,595 @@
 """Create a basic scenario from the internal data structure.
 
+The feed-in of a weather cell is aggregated to the regions of a map with a
+sparse weight matrix (regions x cells, see :class:`CellWeights`). The
+matrix is created once per map from the overlay of the cells and the regions
+(weighted by area) or from the installed capacity per cell. The feed-in of
+all regions for any year or weather year is then a single sparse matrix
+product with the cell series. The wind zones of the regions are derived from
+the same matrix and the wind zone of every cell, so no spatial join is
+repeated for a new year or weather year. The files of weighted feed-in are
+stored under their own map name (see :func:`weighted_name`), so they never
+replace the files of reegis.
+
 SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
 
 SPDX-License-Identifier: MIT
 """
 
-from reegis import coastdat
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from scenario_builder import lazy
+from scenario_builder import powerplants
+from scenario_builder import profiling
+from scenario_builder import settings
+from scenario_builder import timeindex
+
+bmwi = lazy.module("reegis.bmwi")
+coastdat = lazy.module("reegis.coastdat")
+reegis_config = lazy.module("reegis.config")
+reegis_geometries = lazy.module("reegis.geometries")
+reegis_powerplants = lazy.module("reegis.powerplants")
+sparse = lazy.module("scipy.sparse")
+
+# Feed-in categories that are aggregated from the weather cells.
+CELL_CATEGORIES = ("wind", "solar")
+
+
+class CellWeights:
+    """Sparse weight matrix of the weather cells of every region.
+
+    Every row (region) sums up to one, so the product with normalised cell
+    series is the normalised feed-in of the region.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse matrix
+        Weights (regions x cells).
+    regions : iterable
+        Labels of the rows.
+    cells : iterable
+        Labels of the columns (cell ids).
+
+    Examples
+    --------
+    >>> weights = CellWeights.from_table(pd.DataFrame({
+    ...     "region": ["DE01", "DE01", "DE02"], "cell": [1, 2, 2],
+    ...     "weight": [3.0, 1.0, 5.0]}))
+    >>> weights.to_frame().round(2).values.tolist()
+    [[0.75, 0.25], [0.0, 1.0]]
+    >>> cell_series = pd.DataFrame({1: [0.2, 0.4], 2: [0.6, 0.8]})
+    >>> weights.aggregate(cell_series).round(2).values.tolist()
+    [[0.3, 0.6], [0.5, 0.8]]
+    """
+
+    def __init__(self, matrix, regions, cells):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.regions = pd.Index(regions)
+        self.cells = pd.Index(cells)
+
+    def __repr__(self):
+        return "CellWeights(regions={0}, cells={1}, nnz={2})".format(
+            len(self.regions), len(self.cells), self.matrix.nnz
+        )
+
+    @classmethod
+    def from_table(cls, table, region="region", cell="cell", weight="weight"):
+        """Create the matrix from a long table (region, cell, weight).
+
+        Rows of the same region and cell are summed up. Regions without
+        weight get an empty row.
+        """
+        table = table.loc[table[weight] > 0]
+        region_codes, regions = pd.factorize(table[region], sort=True)
+        cell_codes, cells = pd.factorize(table[cell], sort=True)
+        matrix = sparse.coo_matrix(
+            (
+                table[weight].to_numpy(dtype=float),
+                (region_codes, cell_codes),
+            ),
+            shape=(len(regions), len(cells)),
+        ).tocsr()
+        total = np.asarray(matrix.sum(axis=1)).ravel()
+        total[total == 0] = 1
+        matrix = sparse.diags(1 / total) @ matrix
+        return cls(matrix, regions, cells)
+
+    def to_frame(self):
+        """Dense weights as DataFrame (regions x cells)."""
+        return pd.DataFrame(
+            self.matrix.toarray(), index=self.regions, columns=self.cells
+        )
+
+    def aggregate(self, cell_series):
+        """Weighted sum of the cell series for every region.
+
+        Parameters
+        ----------
+        cell_series : pandas.DataFrame
+            Series of the cells (hours x cells). Cells without weight are
+            ignored. All cells of the matrix must be columns of the table.
+
+        Returns
+        -------
+        pandas.DataFrame : hours x regions
+        """
+        values = cell_series.reindex(columns=self.cells).to_numpy(dtype=float)
+        if np.isnan(values).all(axis=0).any():
+            missing = self.cells[np.isnan(values).all(axis=0)]
+            raise KeyError(
+                "No series for the cells {0}.".format(list(missing))
+            )
+        return pd.DataFrame(
+            (self.matrix @ values.T).T,
+            index=cell_series.index,
+            columns=self.regions,
+        )
+
+    def save(self, filename):
+        """Store the matrix and the labels in a compressed npz file."""
+        matrix = self.matrix.tocoo()
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        with open(filename + ".tmp", "wb") as f:
+            np.savez_compressed(
+                f,
+                row=matrix.row,
+                col=matrix.col,
+                data=matrix.data,
+                regions=np.asarray(self.regions.tolist()),
+                cells=np.asarray(self.cells.tolist()),
+            )
+        os.replace(filename + ".tmp", filename)
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        """Read a matrix stored with :meth:`save`."""
+        with np.load(filename, allow_pickle=False) as npz:
+            regions, cells = npz["regions"], npz["cells"]
+            matrix = sparse.coo_matrix(
+                (npz["data"], (npz["row"], npz["col"])),
+                shape=(len(regions), len(cells)),
+            )
+        return cls(matrix, regions, cells)
+
+
+def area_weights(regions, cells):
+    """Weights of the cells by the area of the overlay with the regions.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+        Region polygons with the region ids as index.
+    cells : geopandas.GeoDataFrame
+        Cell polygons with the cell ids as index.
+
+    Returns
+    -------
+    CellWeights
+    """
+    import geopandas as gpd
+
+    crs = regions.crs
+    if crs is not None and crs.is_geographic:
+        # Equal-area projection for Europe
+        crs = "EPSG:3035"
+        regions = regions.to_crs(crs)
+    if crs is not None and cells.crs is not None:
+        cells = cells.to_crs(crs)
+    regions = gpd.GeoDataFrame(
+        {"region": regions.index}, geometry=regions.geometry.values, crs=crs
+    )
+    cells = gpd.GeoDataFrame(
+        {"cell": cells.index}, geometry=cells.geometry.values, crs=crs
+    )
+    with profiling.stage("overlay cells"):
+        overlay = gpd.overlay(regions, cells, how="intersection")
+    overlay["weight"] = overlay.geometry.area
+    return CellWeights.from_table(overlay)
 
 
-def scenario_feedin(regions, year, name, weather_year=None):
+def capacity_weights(
+    pp, region_column, cell_column="coastdat2", capacity_column="capacity"
+):
+    """Weights of the cells by the installed capacity of the power plants.
+
+    Parameters
+    ----------
+    pp : pandas.DataFrame
+        Power plants with a region column and a cell column.
+    region_column : str
+    cell_column : str
+    capacity_column : str
+
+    Returns
+    -------
+    CellWeights
+    """
+    table = pp[[region_column, cell_column, capacity_column]].dropna()
+    return CellWeights.from_table(
+        table, region=region_column, cell=cell_column, weight=capacity_column
+    )
+
+
+@profiling.timed()
+def map_weights(regions, name, conf=None, cells=None):
+    """Area weights of the coastdat cells for a region map.
+
+    The matrix is stored in the feed-in directory of the map and created
+    only once.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    name : str
+        Name of the region map.
+    conf : settings.ConfigSnapshot or None
+    cells : geopandas.GeoDataFrame or None
+        Cell polygons. The coastdat grid of reegis is used by default.
+
+    Returns
+    -------
+    CellWeights
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    filename = os.path.join(
+        conf.paths.feedin, name, "coastdat_area_weights.npz"
+    )
+    if os.path.isfile(filename):
+        return CellWeights.load(filename)
+    logging.info("Create cell weights for '{0}'.".format(name))
+    if cells is None:
+        cells = reegis_geometries.load(
+            path=conf.paths.geometry,
+            filename=conf.coastdat.coastdatgrid_polygon,
+        )
+    weights = area_weights(regions, cells)
+    weights.save(filename)
+    return weights
+
+
+@profiling.timed()
+def map_capacity_weights(regions, name, pp=None, conf=None, cells=None):
+    """Capacity weights of the coastdat cells for a region map.
+
+    The wind and solar plants of the power plant table are joined to the
+    cells once. The matrices of both categories are stored in the feed-in
+    directory of the map like the area weights (see :func:`map_weights`)
+    and created only once. The installed capacity of all plants of the
+    table is used for every year.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    name : str
+        Name of the region map.
+    pp : pandas.DataFrame or None
+        Table of :func:`scenario_builder.powerplants.read_deflex_pp`. It is
+        read if None and the matrices do not exist.
+    conf : settings.ConfigSnapshot or None
+    cells : geopandas.GeoDataFrame or None
+        Cell polygons. The coastdat grid of reegis is used by default.
+
+    Returns
+    -------
+    dict : {category: CellWeights}
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    filenames = {
+        category: os.path.join(
+            conf.paths.feedin,
+            name,
+            "coastdat_capacity_weights_{0}.npz".format(category),
+        )
+        for category in CELL_CATEGORIES
+    }
+    if all(os.path.isfile(f) for f in filenames.values()):
+        return {c: CellWeights.load(f) for c, f in filenames.items()}
+    logging.info("Create capacity weights for '{0}'.".format(name))
+    if pp is None:
+        pp = powerplants.read_deflex_pp(regions, name, conf=conf)
+    if cells is None:
+        cells = reegis_geometries.load(
+            path=conf.paths.geometry,
+            filename=conf.coastdat.coastdatgrid_polygon,
+        )
+    categories = [c.capitalize() for c in CELL_CATEGORIES]
+    pp = pp.loc[pp["energy_source_level_2"].isin(categories)]
+    with profiling.stage("join plants to cells"):
+        pp = reegis_powerplants.add_regions_to_powerplants(
+            cells, "coastdat2", pp=pp, dump=False
+        )
+    weights = {}
+    for category in CELL_CATEGORIES:
+        weights[category] = capacity_weights(
+            pp.loc[pp["energy_source_level_2"] == category.capitalize()], name
+        )
+        weights[category].save(filenames[category])
+    return weights
+
+
+def cell_windzones(conf=None):
+    """Wind zone of every coastdat cell (0 outside of all zones).
+
+    The zone of the cell centroid is used like in reegis. The table is
+    stored in the feed-in directory and created only once.
+
+    Returns
+    -------
+    pandas.Series : index: cell id
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    filename = os.path.join(conf.paths.feedin, "coastdat_windzones.csv")
+    if os.path.isfile(filename):
+        return pd.read_csv(filename, index_col=0)["windzone"]
+    logging.info("Create wind zones of the coastdat cells.")
+    cells = reegis_geometries.load(
+        path=conf.paths.geometry,
+        filename=conf.coastdat.coastdatgrid_polygon,
+    )
+    zones = reegis_geometries.load(
+        path=conf.paths.geometry, filename="windzones_germany.geojson"
+    ).set_index("zone")
+    cells["geometry"] = cells.centroid
+    with profiling.stage("join wind zones"):
+        points = reegis_geometries.spatial_join_with_buffer(
+            cells, zones, "windzone"
+        )
+    windzones = points["windzone"].fillna(0).astype(float)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    windzones.rename("windzone").to_csv(filename + ".tmp")
+    os.replace(filename + ".tmp", filename)
+    return windzones
+
+
+def windzone_fractions(weights, windzones):
+    """Share of every wind zone in the regions.
+
+    Parameters
+    ----------
+    weights : CellWeights
+    windzones : pandas.Series
+        Wind zone per cell (see :func:`cell_windzones`). Missing cells are
+        outside of all zones (0).
+
+    Returns
+    -------
+    pandas.Series : index (region, zone), the layout of
+        :func:`reegis.coastdat.windzone_region_fraction`.
+
+    Examples
+    --------
+    >>> weights = CellWeights.from_table(pd.DataFrame({
+    ...     "region": ["DE01", "DE01", "DE02"], "cell": [1, 2, 2],
+    ...     "weight": [3.0, 1.0, 5.0]}))
+    >>> windzone_fractions(weights, pd.Series({1: 1.0, 2: 3.0})).tolist()
+    [0.75, 0.25, 1.0]
+    """
+    zones = windzones.reindex(weights.cells).fillna(0).to_numpy()
+    codes, labels = pd.factorize(zones, sort=True)
+    cell_zones = sparse.csr_matrix(
+        (np.ones(len(codes)), (np.arange(len(codes)), codes)),
+        shape=(len(codes), len(labels)),
+    )
+    fractions = pd.DataFrame(
+        (weights.matrix @ cell_zones).toarray(),
+        index=weights.regions,
+        columns=labels,
+    ).stack()
+    return fractions.loc[fractions > 0]
+
+
+def weighted_name(name, kind):
+    """Map name of the feed-in files that are created from cell weights.
+
+    reegis aggregates the feed-in by the installed capacity and stores it
+    under the name of the map. The files of the weights get their own name,
+    so the feed-in of a map does not depend on the mode that ran first.
+
+    Examples
+    --------
+    >>> weighted_name("de21", "area")
+    'de21_area_weights'
+    """
+    return "{0}_{1}_weights".format(name, kind)
+
+
+def _coastdat_stores(year, category):
+    path = reegis_config.get("paths_pattern", "coastdat").format(
+        year=year, type=category
+    )
+    if not os.path.isdir(path) or len(os.listdir(path)) == 0:
+        coastdat.normalised_feedin_for_each_data_set(year)
+    prefix = "coastdat_{0}_{1}_".format(year, category)
+    return {
+        file[:-3].replace(prefix, ""): os.path.join(path, file)
+        for file in sorted(os.listdir(path))
+        if file.endswith(".h5")
+    }
+
+
+@profiling.timed()
+def coastdat_feedin_by_region(weights, year, category, weather_year=None):
+    """Normalised wind or solar feed-in of all regions of a map.
+
+    Every cell series of the coastdat sets is read once and all regions
+    are aggregated with one product per set and sub-set. The table has the
+    layout of :func:`reegis.coastdat.aggregate_by_region_coastdat_feedin`.
+
+    Parameters
+    ----------
+    weights : CellWeights
+    year : int
+    category : str
+        "wind" or "solar"
+    weather_year : int or None
+
+    Returns
+    -------
+    pandas.DataFrame : columns (region, set, subset)
+    """
+    if weather_year is None:
+        weather_year = year
+    tables = {}
+    for set_name, filename in _coastdat_stores(weather_year, category).items():
+        with pd.HDFStore(filename, mode="r") as store:
+            cells = {
+                cell: store["/A{0}".format(int(cell))].iloc[:8760]
+                for cell in weights.cells
+            }
+        subsets = next(iter(cells.values())).columns
+        for subset in subsets:
+            cell_series = pd.DataFrame(
+                {cell: series[subset] for cell, series in cells.items()}
+            )
+            feedin = weights.aggregate(cell_series)
+            colname = "_".join(subset.split("_")[-3:])
+            for region in feedin.columns:
+                tables[region, set_name, colname] = feedin[region]
+    feedin = pd.DataFrame(tables)
+    feedin.columns.names = ["region", "set", "subset"]
+    return feedin
+
+
+def _region_file(year, category, name, weather_year=None):
+    path = os.path.join(reegis_config.get("paths", "feedin"), name, str(year))
+    if weather_year is None:
+        pattern = reegis_config.get("feedin", "region_file_pattern")
+    else:
+        path = os.path.join(path, "weather_variations")
+        pattern = reegis_config.get("feedin", "region_file_pattern_var")
+    return os.path.join(
+        path,
+        pattern.format(year=year, type=category, name=name, var=weather_year),
+    )
+
+
+def write_feedin_by_region(weights, year, name, weather_year=None):
+    """Write the wind and solar feed-in files of a map (reegis layout).
+
+    Parameters
+    ----------
+    weights : CellWeights or dict
+        Weights for all categories or {category: CellWeights}.
+    """
+    for category in CELL_CATEGORIES:
+        filename = _region_file(year, category, name, weather_year)
+        if os.path.isfile(filename):
+            continue
+        cat_weights = (
+            weights[category] if isinstance(weights, dict) else weights
+        )
+        feedin = coastdat_feedin_by_region(
+            cat_weights, year, category, weather_year=weather_year
+        )
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        feedin.to_csv(filename)
+
+
+def write_windzones(weights, name, conf=None):
+    """Write the wind zone shares of a map that reegis uses for the wind
+    feed-in (see :func:`windzone_fractions`)."""
+    if isinstance(weights, dict):
+        weights = weights["wind"]
+    fractions = windzone_fractions(weights, cell_windzones(conf=conf))
+    filename = os.path.join(
+        reegis_config.get("paths", "powerplants"),
+        "windzone_{0}.csv".format(name),
+    )
+    fractions.to_csv(filename + ".tmp", header=False)
+    os.replace(filename + ".tmp", filename)
+    return filename
+
+
+def _constant_feedin(region_ids, year, full_load_hours):
+    index = pd.date_range(
+        start="{0}-01-01 00:00".format(year),
+        end="{0}-12-31 23:00".format(year),
+        freq="h",
+        tz="Europe/Berlin",
+    )
+    return pd.DataFrame(
+        full_load_hours / len(index), index=index, columns=region_ids
+    )
+
+
+def write_constant_feedin(
+    regions,
+    year,
+    name,
+    weather_year=None,
+    pp=None,
+    conf=None,
+    feedin_name=None,
+):
+    """Write the hydro and geothermal feed-in files of a map (reegis
+    layout).
+
+    Both are constant series. The full load hours of hydro are the
+    generation of the year (BMWi) divided by the hydro capacity of
+    Germany without pumped storages, the full load hours of geothermal are
+    taken from the reegis config.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    year : int
+    name : str
+    weather_year : int or None
+    pp : pandas.DataFrame or None
+        Table of :func:`scenario_builder.powerplants.read_deflex_pp`. It is
+        read if None and the hydro file does not exist.
+    conf : settings.ConfigSnapshot or None
+    feedin_name : str or None
+        Map name of the files (see :func:`weighted_name`). The name of the
+        map is used if None.
+    """
+    if feedin_name is None:
+        feedin_name = name
+    region_ids = sorted(regions.index.astype(str))
+    filename = _region_file(year, "hydro", feedin_name, weather_year)
+    if not os.path.isfile(filename):
+        if pp is None:
+            pp = powerplants.read_deflex_pp(regions, name, conf=conf)
+        pp = powerplants.get_deflex_pp_by_year(
+            regions, year, name, conf=conf, pp=pp
+        )
+        hydro = (pp["energy_source_level_2"] == "Hydro") & (
+            pp["technology"] != "Pumped storage"
+        )
+        capacity = pp.loc[hydro, "capacity_{0}".format(year)].sum()
+        energy = bmwi.bmwi_re_energy_capacity()["water"].loc[year, "energy"]
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        _constant_feedin(region_ids, year, energy / capacity * 1000).to_csv(
+            filename
+        )
+    filename = _region_file(year, "geothermal", feedin_name, weather_year)
+    if not os.path.isfile(filename):
+        full_load_hours = float(
+            reegis_config.get("feedin", "geothermal_full_load_hours")
+        )
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        _constant_feedin(region_ids, year, full_load_hours).to_csv(filename)
+
+
+@profiling.timed()
+def scenario_feedin(
+    regions,
+    year,
+    name,
+    weather_year=None,
+    weights=None,
+    pp=None,
+    conf=None,
+    weights_kind="area",
+):
     """
 
     Parameters
@@ -17,6 +598,20 @@ def scenario_feedin(regions, year, name, weather_year=None):
     year
     name
     weather_year
+    weights : CellWeights, dict or None
+        Weights of the weather cells (see :func:`map_weights` and
+        :func:`map_capacity_weights`). If the feed-in of the weights does
+        not exist, all feed-in files are created from these weights, the
+        stored wind zones of the cells and the power plant table `pp`
+        without any spatial join. By default reegis aggregates the feed-in
+        by the installed capacity.
+    pp : pandas.DataFrame or None
+        Table of :func:`scenario_builder.powerplants.read_deflex_pp` for the
+        hydro feed-in (only used with weights).
+    conf : settings.ConfigSnapshot or None
+    weights_kind : str
+        Kind of the weights ("area" or "capacity"). The files of the weights
+        are stored under the map name of :func:`weighted_name`.
 
     Returns
     -------
@@ -40,9 +635,37 @@ def scenario_feedin(regions, year, name, weather_year=None):
     dtype: float64
     """
     wy = weather_year
+    feedin_name = name
+    if weights is not None:
+        feedin_name = weighted_name(name, weights_kind)
     try:
-        feedin = coastdat.scenario_feedin(year, name, weather_year=wy)
+        with profiling.stage("load feedin"):
+            feedin = coastdat.scenario_feedin(
+                year, feedin_name, weather_year=wy
+            )
     except FileNotFoundError:
-        coastdat.get_feedin_per_region(year, regions, name, weather_year=wy)
-        feedin = coastdat.scenario_feedin(year, name, weather_year=wy)
-    return feedin
+        if weights is not None:
+            with profiling.stage("feedin per region (cell weights)"):
+                write_feedin_by_region(
+                    weights, year, feedin_name, weather_year=wy
+                )
+                write_constant_feedin(
+                    regions,
+                    year,
+                    name,
+                    weather_year=wy,
+                    pp=pp,
+                    conf=conf,
+                    feedin_name=feedin_name,
+                )
+                write_windzones(weights, feedin_name, conf=conf)
+        else:
+            with profiling.stage("feedin per region"):
+                coastdat.get_feedin_per_region(
+                    year, regions, name, weather_year=wy
+                )
+        with profiling.stage("load feedin"):
+            feedin = coastdat.scenario_feedin(
+                year, feedin_name, weather_year=wy
+            )
+    return timeindex.get_calendar(year, wy).conform(feedin, "volatile series")
@@ -0,0 +1,43 @@
+"""Deferred imports of heavy dependencies.
+
+Most reegis modules import geopandas, shapely, pvlib or windpowerlib. The
+builders therefore import them with :func:`module`, so the import is only
+executed on the first attribute access, e.g. if a builder actually calls a
+reegis function.
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import importlib.util
+import sys
+
+
+def module(name):
+    """Return a module that is imported on the first attribute access.
+
+    Modules that are already imported are returned directly.
+
+    Examples
+    --------
+    >>> json = module("json")
+    >>> json.dumps([1])
+    '[1]'
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(
+            "No module named '{0}'".format(name), name=name
+        )
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    lazy_module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = lazy_module
+    loader.exec_module(lazy_module)
+    return lazy_module
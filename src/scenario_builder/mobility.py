@@ -1,24 +1,186 @@
 """Create a basic scenario from the internal data structure.
 
+The mobility demand is created for Germany ("DE"). With weights per region
+(e.g. inhabitants or registered vehicles) the series is split to the regions
+of a map in one outer product (see :func:`disaggregate`).
+
+Examples
+--------
+>>> series = pd.DataFrame(
+...     [[10.0, 20.0]],
+...     columns=pd.MultiIndex.from_product([["DE"], ["diesel", "petrol"]]))
+>>> weights = pd.Series({"DE01": 3, "DE02": 1})
+>>> disaggregate(series, weights).iloc[0].tolist()
+[7.5, 15.0, 2.5, 5.0]
+
 SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
 
 SPDX-License-Identifier: MIT
 """
-import calendar
-import configparser
+import os
 
+import numpy as np
 import pandas as pd
-from reegis import config as cfg
-from reegis import mobility
 
+from scenario_builder import lazy
+from scenario_builder import profiling
+from scenario_builder import settings
+from scenario_builder import timeindex
+
+mobility = lazy.module("reegis.mobility")
+inhabitants = lazy.module("reegis.inhabitants")
+
+
+def region_shares(weights, fuels):
+    """Shares of the regions (regions x fuels, every column sums up to 1).
+
+    Parameters
+    ----------
+    weights : pandas.Series or pandas.DataFrame
+        Weight per region or per region (index) and fuel (columns).
+    fuels : list
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if isinstance(weights, pd.Series):
+        weights = pd.DataFrame(
+            np.repeat(
+                weights.to_numpy(dtype=float)[:, None], len(fuels), axis=1
+            ),
+            index=weights.index,
+            columns=fuels,
+        )
+    missing = [fuel for fuel in fuels if fuel not in weights.columns]
+    if missing:
+        raise ValueError("No mobility weights for {0}.".format(missing))
+    weights = weights[list(fuels)].astype(float).fillna(0)
+    total = weights.sum()
+    if (total <= 0).any():
+        raise ValueError(
+            "The mobility weights of {0} sum up to zero.".format(
+                list(total.index[total <= 0])
+            )
+        )
+    return weights / total
+
+
+def disaggregate(series, weights):
+    """Split the national mobility demand series to regions.
+
+    The regional series are the outer product of the national series and
+    the shares of the regions, so no table per region is created.
+
+    Parameters
+    ----------
+    series : pandas.DataFrame
+        Columns: fuel or (region, fuel) with one region.
+    weights : pandas.Series or pandas.DataFrame
+        See :func:`region_shares`.
+
+    Returns
+    -------
+    pandas.DataFrame : Columns: (region, fuel).
+    """
+    fuels = series.columns.get_level_values(-1)
+    shares = region_shares(weights, fuels)
+    values = series.to_numpy(dtype=float)
+    # (hours, regions, fuels)
+    regional = values[:, None, :] * shares.to_numpy()[None, :, :]
+    return pd.DataFrame(
+        regional.reshape(len(series), -1),
+        index=series.index,
+        columns=pd.MultiIndex.from_product([list(shares.index), fuels]),
+    )
+
+
+def weights_file(name, conf=None):
+    """The csv file of the mobility weights of a map or None if the weights
+    are not read from a file (see :func:`map_weights`)."""
+    if conf is None:
+        conf = settings.snapshot()
+    source = conf.get("creator", "mobility_weights", fallback=None)
+    if not source or source == "inhabitants":
+        return None
+    return source.format(map=name)
+
+
+def map_weights(regions, year, name, conf=None):
+    """Weights to split the mobility demand to the regions of a map.
+
+    Set ``mobility_weights`` in the section "creator" of the config to
+    "inhabitants" (inhabitants of the regions from reegis) or to a csv file
+    with the regions as index and one column or one column per fuel
+    (``{map}`` is replaced by the name of the map). Returns None if the
+    option is not set.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    year : int
+    name : str
+        Name of the region map.
+    conf : settings.ConfigSnapshot or None
 
-def scenario_mobility(year, table):
+    Returns
+    -------
+    pandas.Series or pandas.DataFrame or None
     """
+    if conf is None:
+        conf = settings.snapshot()
+    source = conf.get("creator", "mobility_weights", fallback=None)
+    if not source:
+        return None
+    if source == "inhabitants":
+        weights = inhabitants.get_inhabitants_by_region(year, regions, name)
+    else:
+        filename = weights_file(name, conf=conf)
+        if not os.path.isfile(filename):
+            raise ValueError(
+                "Mobility weights must be 'inhabitants' or a csv file, "
+                "'{0}' not found.".format(filename)
+            )
+        weights = pd.read_csv(filename, index_col=0)
+        if weights.shape[1] == 1:
+            weights = weights.iloc[:, 0]
+    return weights.reindex(regions.index).fillna(0)
+
+
+@profiling.timed()
+def scenario_mobility(
+    year,
+    table,
+    conf=None,
+    weather_year=None,
+    weights=None,
+    regions=None,
+    name=None,
+):
+    """Mobility demand series and vehicle table of Germany or the regions.
+
+    The series are in MW. The demand of "DE" is rounded to whole MW
+    (integers). The regional series are floats and not rounded, so they add
+    up to the series of "DE".
 
     Parameters
     ----------
     year
     table
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+    weather_year : int or None
+        The series has the hours of the calendar of the year and the
+        weather year (see :mod:`scenario_builder.timeindex`).
+    weights : pandas.Series or pandas.DataFrame or None
+        Split the demand to the regions by these weights (see
+        :func:`disaggregate`). The table "mobility" is repeated for every
+        region. The demand of "DE" is returned if None.
+    regions : geopandas.GeoDataFrame or None
+        If no weights are given, the weights of this map are used (see
+        :func:`map_weights`).
+    name : str or None
+        Name of the region map.
 
     Returns
     -------
@@ -40,22 +202,24 @@ def scenario_mobility(year, table):
     energy_per_liter [MJ/l]    34.7
     Name: diesel, dtype: float64
     """
-    if calendar.isleap(year):
-        hours_of_the_year = 8784
-    else:
-        hours_of_the_year = 8760
+    cal = timeindex.get_calendar(year, weather_year)
+    hours_of_the_year = cal.hours
+
+    if conf is None:
+        conf = settings.snapshot()
 
-    try:
-        other = cfg.get("creator", "mobility_other")
-    except configparser.NoSectionError:
-        other = cfg.get("general", "mobility_other")
+    if conf.has_option("creator", "mobility_other"):
+        other = conf.creator.mobility_other
+    else:
+        other = conf.general.mobility_other
 
-    mobility_mileage = mobility.get_mileage_by_type_and_fuel(year)
+    with profiling.stage("mileage by type and fuel"):
+        mobility_mileage = mobility.get_mileage_by_type_and_fuel(year)
 
     # fetch table of specific demand by fuel and vehicle type (from 2011)
     mobility_spec_demand = (
         pd.DataFrame(
-            cfg.get_dict_list("fuel consumption"),
+            conf.get_dict_list("fuel consumption"),
             index=["diesel", "petrol", "other"],
         )
         .astype(float)
@@ -67,19 +231,19 @@ def scenario_mobility(year, table):
 
     # fetch the energy content of the different fuel types
     mobility_energy_content = pd.DataFrame(
-        cfg.get_dict("energy_per_liter"), index=["energy_per_liter [MJ/l]"]
+        conf.get_dict("energy_per_liter"), index=["energy_per_liter [MJ/l]"]
     )[["diesel", "petrol", "other"]]
 
     mobility_energy_content["other"] = mobility_energy_content[other]
 
     # Convert to MW????? BITTE GENAU!!!
-    energy_usage = fuel_usage.mul(mobility_energy_content).div(3600)
+    energy_usage = mobility_energy_content.mul(fuel_usage).div(3600)
 
     s = energy_usage.div(hours_of_the_year).transpose()[
         "energy_per_liter [MJ/l]"
     ]
     table["mobility demand series"] = pd.DataFrame(
-        index=range(hours_of_the_year), columns=energy_usage.columns
+        index=cal.index, columns=energy_usage.columns
     ).fillna(1)
 
     table["mobility demand series"] = table["mobility demand series"].mul(
@@ -95,16 +259,17 @@ def scenario_mobility(year, table):
         table["mobility demand series"].astype(float).round().astype(int)
     )
 
-    table["mobility"] = pd.DataFrame(
-        index=["diesel", "petrol", "electricity"],
-        columns=["efficiency", "source", "source region"],
+    columns = ["efficiency", "source", "source region"]
+    table["mobility"] = pd.DataFrame.from_dict(
+        {
+            idx: [conf["mobility: " + idx][col] for col in columns]
+            for idx in ["diesel", "petrol", "electricity"]
+        },
+        orient="index",
+        columns=columns,
+        dtype=object,
     )
 
-    for col in table["mobility"].columns:
-        for idx in table["mobility"].index:
-            section = "mobility: " + idx
-            table["mobility"].loc[idx, col] = cfg.get(section, col)
-
     # Add "DE" as region level to be consistent to other tables
     table["mobility"].index = pd.MultiIndex.from_product(
         [["DE"], table["mobility"].index]
@@ -112,4 +277,16 @@ def scenario_mobility(year, table):
     table["mobility demand series"].columns = pd.MultiIndex.from_product(
         [["DE"], table["mobility demand series"].columns]
     )
+    if weights is None and regions is not None:
+        weights = map_weights(regions, year, name, conf=conf)
+    if weights is not None:
+        series = disaggregate(table["mobility demand series"], weights)
+        table["mobility demand series"] = series
+        vehicles = table["mobility"].droplevel(0)
+        region_names = series.columns.get_level_values(0).unique()
+        table["mobility"] = pd.DataFrame(
+            np.tile(vehicles.to_numpy(), (len(region_names), 1)),
+            index=pd.MultiIndex.from_product([region_names, vehicles.index]),
+            columns=vehicles.columns,
+        )
     return table
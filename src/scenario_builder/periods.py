@@ -0,0 +1,228 @@
+"""Reduce the hourly series of a scenario to representative periods.
+
+All series tables of a scenario (electricity, heat and mobility demand and
+the feed-in) are clustered jointly: the year is split into days or weeks,
+every column is normalised to its maximum and every table gets the same
+total weight, so a table with many regions does not dominate the others.
+The periods are clustered with k-medoids. Each medoid is a real period of
+the year, so the reduced series contain only values that occurred.
+
+The result contains the reduced series tables (same columns, hours of the
+representative periods in chronological order), the table
+"representative periods" with the weight of every period and the table
+"period mapping" that maps every hour of the year to an hour of the reduced
+series.
+
+Examples
+--------
+>>> import numpy as np
+>>> import pandas as pd
+>>> hours = np.arange(8760)
+>>> demand = pd.DataFrame({"DE01": 1 + np.sin(hours / 8760 * 2 * np.pi)})
+>>> tables = {"electricity demand series": demand}
+>>> reduced = reduce_series(tables, 4, period="day")
+>>> reduced["electricity demand series"].shape
+(96, 1)
+>>> float(reduced["representative periods"]["weight"].sum())
+365.0
+>>> reduced["period mapping"].shape
+(8760, 3)
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import numpy as np
+import pandas as pd
+
+from scenario_builder import profiling
+
+PERIOD_LENGTH = {"day": 24, "week": 168}
+
+
+def series_names(table_collection):
+    """Names of all hourly series tables of a collection."""
+    return [name for name in table_collection if name.endswith("series")]
+
+
+def _features(tables, length):
+    """Normalised values of all tables as (periods x features) matrix.
+
+    The last period is padded with NaN if the year is not a multiple of the
+    period length.
+    """
+    blocks = []
+    for table in tables:
+        values = np.asarray(table, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        scale = np.nanmax(np.abs(values), axis=0)
+        scale[~(scale > 0)] = 1
+        # Every table gets the same weight in the distance.
+        blocks.append(values / scale / np.sqrt(values.shape[1]))
+    values = np.hstack(blocks)
+    n_hours = values.shape[0]
+    n_periods = -(-n_hours // length)
+    padded = np.full((n_periods * length, values.shape[1]), np.nan)
+    padded[:n_hours] = values
+    return padded.reshape(n_periods, -1).astype(np.float32)
+
+
+def _distances(features):
+    """Squared euclidean distances between all periods.
+
+    NaN values (padded hours of the last period) are ignored and the
+    distance is scaled to the full period length.
+    """
+    valid = ~np.isnan(features)
+    x = np.where(valid, features, 0).astype(np.float64)
+    v = valid.astype(np.float64)
+    sq = x ** 2
+    dist = sq @ v.T + v @ sq.T - 2 * x @ x.T
+    counts = v @ v.T
+    dist *= features.shape[1] / np.maximum(counts, 1)
+    return np.maximum(dist, 0)
+
+
+def _init_medoids(dist, n, rng):
+    """k-medoids++ initialisation."""
+    medoids = [int(np.argmin(dist.sum(axis=1)))]
+    for _ in range(1, n):
+        closest = dist[:, medoids].min(axis=1)
+        if closest.sum() == 0:
+            candidates = np.setdiff1d(np.arange(len(dist)), medoids)
+            medoids.append(int(candidates[0]))
+            continue
+        medoids.append(int(rng.choice(len(dist), p=closest / closest.sum())))
+    return np.array(medoids)
+
+
+def k_medoids(dist, n, seed=42, max_iter=100):
+    """Cluster with k-medoids (alternating assignment and medoid update).
+
+    Parameters
+    ----------
+    dist : numpy.ndarray
+        Square distance matrix.
+    n : int
+        Number of clusters.
+    seed : int
+        Seed of the random initialisation.
+    max_iter : int
+        Maximum number of iterations.
+
+    Returns
+    -------
+    tuple : medoids (n,) and the cluster of every element (index of medoid)
+
+    Examples
+    --------
+    >>> points = np.array([0.0, 0.1, 0.2, 5.0, 5.1])
+    >>> dist = (points[:, None] - points[None, :]) ** 2
+    >>> medoids, labels = k_medoids(dist, 2)
+    >>> sorted(points[medoids].tolist()), labels.tolist()
+    ([0.1, 5.0], [0, 0, 0, 1, 1])
+    """
+    n = min(n, len(dist))
+    rng = np.random.RandomState(seed)
+    medoids = np.sort(_init_medoids(dist, n, rng))
+    for _ in range(max_iter):
+        labels = np.argmin(dist[:, medoids], axis=1)
+        new = medoids.copy()
+        for cluster in range(n):
+            members = np.flatnonzero(labels == cluster)
+            if len(members) == 0:
+                continue
+            cost = dist[np.ix_(members, members)].sum(axis=0)
+            new[cluster] = members[np.argmin(cost)]
+        new = np.sort(new)
+        if np.array_equal(new, medoids):
+            break
+        medoids = new
+    return medoids, np.argmin(dist[:, medoids], axis=1)
+
+
+@profiling.timed()
+def reduce_series(table_collection, n_periods, period="day", seed=42):
+    """Replace all series tables by representative periods.
+
+    Parameters
+    ----------
+    table_collection : dict
+    n_periods : int
+        Number of representative periods.
+    period : str
+        "day" or "week".
+    seed : int
+        Seed of the k-medoids initialisation.
+
+    Returns
+    -------
+    dict : A new collection with the reduced series and the tables
+        "representative periods" and "period mapping". All other tables
+        are passed on unchanged.
+    """
+    length = PERIOD_LENGTH[period]
+    names = series_names(table_collection)
+    if not names:
+        raise ValueError("The table collection has no series tables.")
+    n_hours = {len(table_collection[name]) for name in names}
+    if len(n_hours) > 1:
+        raise ValueError(
+            "All series must have the same length. Found: {0}".format(
+                {name: len(table_collection[name]) for name in names}
+            )
+        )
+    n_hours = n_hours.pop()
+
+    features = _features([table_collection[name] for name in names], length)
+    dist = _distances(features)
+
+    # The last period may be shorter than the others (e.g. the 53rd week).
+    # Only full periods can be representative periods. A shorter period is
+    # assigned to the closest one.
+    hours_per_period = np.full(len(features), length)
+    hours_per_period[-1] = n_hours - length * (len(features) - 1)
+    full = np.flatnonzero(hours_per_period == length)
+    medoids = full[k_medoids(dist[np.ix_(full, full)], n_periods, seed)[0]]
+    labels = np.argmin(dist[:, medoids], axis=1)
+    weights = np.bincount(
+        labels, weights=hours_per_period / length, minlength=len(medoids)
+    )
+
+    start = medoids * length
+    reduced_hours = (start[:, None] + np.arange(length)).ravel()
+
+    reduced = {
+        name: table
+        for name, table in table_collection.items()
+        if name not in names
+    }
+    for name in names:
+        table = table_collection[name]
+        reduced[name] = table.iloc[reduced_hours].reset_index(drop=True)
+
+    reduced["representative periods"] = pd.DataFrame(
+        {
+            "period": medoids,
+            "first hour": start,
+            "weight": weights,
+        },
+        index=pd.RangeIndex(len(medoids), name="representative period"),
+    )
+    hour = np.arange(n_hours)
+    original_period = hour // length
+    cluster = labels[original_period]
+    reduced["period mapping"] = pd.DataFrame(
+        {
+            "period": original_period,
+            "representative period": cluster,
+            "reduced hour": cluster * length + hour % length,
+        },
+        index=pd.RangeIndex(n_hours, name="hour"),
+    )
+    return reduced
@@ -9,20 +9,52 @@ import logging
 import os
 from warnings import warn
 
+import numpy as np
 import pandas as pd
-from reegis import bmwi
-from reegis import config as cfg
-from reegis import energy_balance
-from reegis import geometries as reegis_geometries
-from reegis import powerplants
 
 from scenario_builder import data
 from scenario_builder import demand
+from scenario_builder import lazy
+from scenario_builder import profiling
+from scenario_builder import settings
+from scenario_builder import timeindex
+from scenario_builder import units
+
+bmwi = lazy.module("reegis.bmwi")
+energy_balance = lazy.module("reegis.energy_balance")
+reegis_geometries = lazy.module("reegis.geometries")
+powerplants = lazy.module("reegis.powerplants")
+
+# Rows per chunk of the chunked mode
+PP_CHUNKSIZE = 250000
+# Columns of the power plant table that are read in the chunked mode
+PP_COLUMNS = [
+    "energy_source_level_2",
+    "technology",
+    "capacity",
+    "capacity_in",
+    "efficiency",
+    "com_year",
+    "com_month",
+    "decom_year",
+]
+# Rows of the transformation balance with the chp and heat plants
+CHP_ROWS = {
+    "chp": "Heizkraftwerke der allgemeinen Versorgung (nur KWK)",
+    "hp": "Heizwerke",
+}
+# Columns of the chp parameters that are not fuel shares
+CHP_PARAMETERS = ["out_share_factor", "eta_heat", "eta_elec"]
+# CHP parameters by (fingerprint of the region map, year)
+_CHP_PARAMETERS = {}
 
 # Todo: Revise and test.
 
 
-def pp_reegis2deflex(regions, name, filename_in=None, filename_out=None):
+@profiling.timed()
+def pp_reegis2deflex(
+    regions, name, filename_in=None, filename_out=None, conf=None
+):
     """
     Add federal states and deflex regions to powerplant table from reegis. As
     the process takes a while the result is stored for further usage.
@@ -32,91 +64,305 @@ def pp_reegis2deflex(regions, name, filename_in=None, filename_out=None):
     str : The full path where the result file is stored.
 
     """
+    if conf is None:
+        conf = settings.snapshot()
     if filename_out is None:
         filename_out = os.path.join(
-            cfg.get("paths", "powerplants"),
-            cfg.get("powerplants", "deflex_pp"),
+            conf.paths.powerplants, conf.powerplants.deflex_pp
         ).format(map=name)
 
     # Add deflex regions to powerplants
-    pp = powerplants.add_regions_to_powerplants(
-        regions, name, dump=False, filename=filename_in
-    )
+    with profiling.stage("spatial join regions"):
+        pp = powerplants.add_regions_to_powerplants(
+            regions, name, dump=False, filename=filename_in
+        )
 
     # Add federal states to powerplants
-    federal_states = reegis_geometries.get_federal_states_polygon()
-    pp = powerplants.add_regions_to_powerplants(
-        federal_states, "federal_states", pp=pp, dump=False
-    )
+    with profiling.stage("spatial join federal states"):
+        federal_states = reegis_geometries.get_federal_states_polygon()
+        pp = powerplants.add_regions_to_powerplants(
+            federal_states, "federal_states", pp=pp, dump=False
+        )
 
     # store the results for further usage of deflex
-    pp.to_hdf(filename_out, "pp")
+    with profiling.stage("write pp table"):
+        pp.to_hdf(filename_out, key="pp")
     return filename_out
 
 
-# def remove_onshore_technology_from_offshore_regions(df):
-#     """ This filter should be improved. It is slow and has to be adapted
-#     manually. Anyhow it seems to work this way."""
-#
-#     logging.info("Removing onshore technology from offshore regions.")
-#     logging.info("The code is not efficient. So it may take a while.")
-#
-#     offshore_regions=(
-#         cfg.get_dict_list('offshore_regions_set')[cfg.get('init', 'map')])
-#
-#     coast_regions={'de02': {'MV': 'DE01',
-#                               'SH': 'DE01',
-#                               'NI': 'DE01 '},
-#                      'de17': {'MV': 'DE13',
-#                               'SH': 'DE01',
-#                               'NI': 'DE03'},
-#                      'de21': {'MV': 'DE01',
-#                               'SH': 'DE13',
-#                               'NI': 'DE14'},
-#                      'de22': {'MV': 'DE01',
-#                               'SH': 'DE13',
-#                               'NI': 'DE14'}}
-#     try:
-#         dc=coast_regions[cfg.get('init', 'map')]
-#     except KeyError:
-#         raise ValueError('Coast regions not defined for {0} model.'.format(
-#             cfg.get('init', 'map')))
-#
-#     region_column='{0}_region'.format(cfg.get('init', 'map'))
-#
-#     for ttype in ['Solar', 'Bioenergy', 'Wind']:
-#         for region in offshore_regions:
-#             logging.debug("Clean {1} from {0}.".format(region, ttype))
-#
-#             c1=df['energy_source_level_2'] == ttype
-#             c2=df[region_column] == region
-#
-#             condition=c1 & c2
-#
-#             if ttype == 'Wind':
-#                 condition=c1 & c2 & (df['technology'] == 'Onshore')
-#
-#             for i, v in df.loc[condition].iterrows():
-#                 df.loc[i, region_column]=(
-#                     dc[df.loc[i, 'federal_states']])
-#     return df
-
-
-def process_pp_table(pp):
+# Power plants of these types in an offshore region are moved to the coast.
+OFFSHORE_CLEAN_TYPES = ("Solar", "Bioenergy", "Wind")
+
+
+@profiling.timed()
+def remove_onshore_technology_from_offshore_regions(pp, name, conf=None):
+    """Move onshore power plants from offshore regions to the coast.
+
+    Solar and bioenergy plants and onshore wind turbines that are located in
+    an offshore region of the map (e.g. because of the coarse polygons) are
+    moved to the coast region of their federal state. The regions are
+    defined in the config::
+
+        [offshore_regions_set]
+        de21 = DE19, DE20, DE21
+
+        [coast_regions: de21]
+        MV = DE01
+        SH = DE13
+        NI = DE14
+
+    Maps without offshore regions are not changed.
+
+    Parameters
+    ----------
+    pp : pandas.DataFrame
+        Power plant table with a region column (name of the map) and the
+        column "federal_states". The table is not changed.
+    name : str
+        Name of the map.
+    conf : settings.ConfigSnapshot or None
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    Examples
+    --------
+    >>> pp = pd.DataFrame({
+    ...     "energy_source_level_2": ["Wind", "Wind", "Solar", "Lignite"],
+    ...     "technology": ["Onshore", "Offshore", "PV", "Steam turbine"],
+    ...     "federal_states": ["SH", "SH", "NI", "NI"],
+    ...     "de21": ["DE19", "DE19", "DE21", "DE21"]})
+    >>> conf = settings.ConfigSnapshot({
+    ...     "offshore_regions_set": {"de21": "DE19, DE20, DE21"},
+    ...     "coast_regions: de21": {"SH": "DE13", "NI": "DE14"}})
+    >>> remove_onshore_technology_from_offshore_regions(
+    ...     pp, "de21", conf=conf)["de21"].tolist()
+    ['DE13', 'DE19', 'DE14', 'DE21']
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    if name not in conf.get("offshore_regions_set", fallback={}):
+        return pp
+    offshore_regions = conf.get_list("offshore_regions_set", name)
+    section = "coast_regions: {0}".format(name)
+    if section not in conf:
+        raise ValueError(
+            "Coast regions not defined for {0} model. Add the section "
+            "[{1}] to the config.".format(name, section)
+        )
+    coast_regions = conf.get_dict(section)
+
+    logging.info("Removing onshore technology from offshore regions.")
+    fuel = pp["energy_source_level_2"]
+    mask = fuel.isin(OFFSHORE_CLEAN_TYPES) & pp[name].isin(offshore_regions)
+    mask &= (fuel != "Wind") | (pp["technology"] == "Onshore")
+    mask = mask.to_numpy()
+    if not mask.any():
+        return pp
+    states = pp["federal_states"].to_numpy()[mask]
+    new_regions = pd.Series(states).map(coast_regions)
+    missing = new_regions.isnull().to_numpy()
+    if missing.any():
+        raise ValueError(
+            "No coast region for the federal states {0} in [{1}].".format(
+                sorted(set(states[missing].astype(str))), section
+            )
+        )
+    regions = pp[name].to_numpy(dtype=object, copy=True)
+    regions[mask] = new_regions.to_numpy(dtype=object)
+    return pp.assign(
+        **{name: pd.Series(regions, index=pp.index, dtype=pp[name].dtype)}
+    )
+
+
+@profiling.timed()
+def process_pp_table(pp, conf=None, name=None):
+    """Remove unwanted power plants and fix the regions.
+
+    Parameters
+    ----------
+    pp : pandas.DataFrame
+    conf : settings.ConfigSnapshot or None
+    name : str or None
+        Name of the map (region column). If ``clean_offshore`` is set in the
+        section "powerplants", onshore plants are moved out of offshore
+        regions (see :func:`remove_onshore_technology_from_offshore_regions`).
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
     # # Remove powerplants outside Germany
     # for state in cfg.get_list('powerplants', 'remove_states'):
     #     pp=pp.loc[pp.state != state]
     #
-    # if clean_offshore:
-    #     pp=remove_onshore_technology_from_offshore_regions(pp)
+    if conf is None:
+        conf = settings.snapshot()
+    if name is not None and conf.get(
+        "powerplants", "clean_offshore", fallback=False
+    ):
+        pp = remove_onshore_technology_from_offshore_regions(
+            pp, name, conf=conf
+        )
     # Remove PHES (storages)
-    if cfg.get("powerplants", "remove_phes"):
+    if conf.powerplants.remove_phes:
         pp = pp.loc[pp.technology != "Pumped storage"]
     return pp
 
 
+@profiling.timed()
+def read_deflex_pp(regions, name, filename=None, conf=None):
+    """Read the processed power plant table of a region map.
+
+    The table is created from the reegis table if the file does not exist.
+    It is independent of the year and can be shared between all scenarios of
+    the same map (see :func:`get_deflex_pp_by_year`).
+
+    Parameters
+    ----------
+    regions : GeoDataFrame
+    name : str
+    filename : str
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    if filename is None:
+        filename = os.path.join(
+            conf.paths.powerplants, conf.powerplants.deflex_pp
+        ).format(map=name)
+    if not os.path.isfile(filename):
+        msg = "File '{0}' does not exist. Will create it from reegis file."
+        logging.debug(msg.format(filename))
+        filename = pp_reegis2deflex(
+            regions, name, filename_out=filename, conf=conf
+        )
+    with profiling.stage("read pp table") as st:
+        pp = st.frame(pd.DataFrame(pd.read_hdf(filename, "pp")))
+
+    # Remove unwanted data sets
+    return process_pp_table(pp, conf=conf, name=name)
+
+
+def write_pp_store(pp, filename, row_group_size=PP_CHUNKSIZE):
+    """Write a power plant table as Parquet store for the chunked mode."""
+    pp.to_parquet(filename, index=False, row_group_size=row_group_size)
+    return filename
+
+
+def pp_store(regions, name, conf=None):
+    """Return the power plant store of a map for the chunked mode.
+
+    The store can be set with ``pp_store`` in the section "powerplants"
+    ({map} is replaced by the name of the map). It must be a Parquet file or
+    an HDF file in table format (key "pp"). By default a Parquet copy of the
+    table of :func:`read_deflex_pp` is created once.
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    store = conf.get("powerplants", "pp_store", fallback=None)
+    if store is not None:
+        return store.format(map=name)
+    filename = os.path.join(
+        conf.paths.powerplants, conf.powerplants.deflex_pp
+    ).format(map=name)
+    store = os.path.splitext(filename)[0] + ".parquet"
+    if not os.path.isfile(store):
+        write_pp_store(read_deflex_pp(regions, name, conf=conf), store)
+    return store
+
+
+def iter_pp_chunks(filename, columns=None, chunksize=PP_CHUNKSIZE):
+    """Read a power plant store chunk by chunk.
+
+    Parquet stores are read by row groups in batches of at most `chunksize`
+    rows. HDF stores must be written in table format.
+    """
+    if filename.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        store = pq.ParquetFile(filename)
+        try:
+            for batch in store.iter_batches(
+                batch_size=chunksize, columns=columns
+            ):
+                yield batch.to_pandas()
+        finally:
+            store.close()
+    else:
+        chunks = pd.read_hdf(
+            filename, "pp", columns=columns, chunksize=chunksize
+        )
+        try:
+            yield from chunks
+        finally:
+            chunks.close()
+
+
+@profiling.timed()
+def group_pp_chunks(
+    chunks, year, region_column, conf=None, with_capacity_series=False
+):
+    """Group a power plant table that is read chunk by chunk.
+
+    The plants of every chunk are filtered for the year and grouped (see
+    :func:`group_powerplants`). The partial groups are merged regularly, so
+    the memory depends on the size of a chunk and the number of groups but
+    not on the size of the table.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Parts of the power plant table (see :func:`iter_pp_chunks`).
+    year : int
+    region_column : str
+    conf : settings.ConfigSnapshot or None
+    with_capacity_series : bool
+        Sum up the :func:`capacity_series` of the chunks as well.
+
+    Returns
+    -------
+    tuple : The merged groups and the capacity series (or None).
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    groups, series = [], None
+    for chunk in chunks:
+        chunk = process_pp_table(
+            chunk, conf=conf, name=region_column
+        ).copy()
+        if with_capacity_series:
+            part = capacity_series(
+                chunk, year, region_column=region_column, conf=conf
+            )
+            series = part if series is None else series.add(part, fill_value=0)
+        _filter_year(chunk, year, overwrite_capacity=True)
+        groups.append(group_powerplants(chunk, region_column, conf=conf))
+        del chunk
+        if len(groups) >= 8:
+            groups = [merge_pp_groups(groups)]
+    if not groups:
+        raise ValueError("The power plant table is empty.")
+    if series is not None:
+        series = series.sort_index(axis=1)
+    return merge_pp_groups(groups), series
+
+
+@profiling.timed()
 def get_deflex_pp_by_year(
-    regions, year, name, overwrite_capacity=False, filename=None
+    regions,
+    year,
+    name,
+    overwrite_capacity=False,
+    filename=None,
+    conf=None,
+    pp=None,
 ):
     """
 
@@ -129,26 +375,31 @@ def get_deflex_pp_by_year(
     overwrite_capacity : bool
         By default (False) a new column "capacity_<year>" is created. If set to
         True the old capacity column will be overwritten.
+    conf : settings.ConfigSnapshot or None
+        Config snapshot of the build. A new snapshot is read if None.
+    pp : pandas.DataFrame or None
+        Table of :func:`read_deflex_pp`. The table is not changed. It is read
+        from the file if None.
 
     Returns
     -------
 
     """
-    if filename is None:
-        filename = os.path.join(
-            cfg.get("paths", "powerplants"),
-            cfg.get("powerplants", "deflex_pp"),
-        ).format(map=name)
     logging.info("Get deflex power plants for {0}.".format(year))
-    if not os.path.isfile(filename):
-        msg = "File '{0}' does not exist. Will create it from reegis file."
-        logging.debug(msg.format(filename))
-        filename = pp_reegis2deflex(regions, name, filename_out=filename)
-    pp = pd.DataFrame(pd.read_hdf(filename, "pp"))
+    if pp is None:
+        pp = read_deflex_pp(regions, name, filename=filename, conf=conf)
+    else:
+        pp = pp.copy()
 
-    # Remove unwanted data sets
-    pp = process_pp_table(pp)
+    return _filter_year(pp, year, overwrite_capacity=overwrite_capacity)
+
+
+def _filter_year(pp, year, overwrite_capacity=False):
+    """Add (or overwrite) the capacity of the given year (in place).
 
+    Plants without `com_year` or `decom_year` get no capacity (NaN). The
+    hourly series of :func:`capacity_series` use the same rule.
+    """
     filter_columns = ["capacity_{0}", "capacity_in_{0}"]
 
     # Get all powerplants for the given year.
@@ -179,9 +430,126 @@ def get_deflex_pp_by_year(
     return pp
 
 
-def scenario_powerplants(table_collection, regions, year, name):
+@profiling.timed()
+def capacity_series(pp, year, region_column="deflex_region", conf=None):
+    """Hourly available capacity of the power plants per region and fuel.
+
+    A power plant is available from the first hour of the month after
+    `com_month` in `com_year` until the last hour of `com_month` in
+    `decom_year`. This is the timing that :func:`get_deflex_pp_by_year`
+    uses for the annual capacity. Without `com_month` a plant is available
+    from the beginning of `com_year` until the end of `decom_year`. Plants
+    without `com_year` or `decom_year` are never available, as in
+    :func:`get_deflex_pp_by_year`.
+
+    Every plant adds two events (commissioning, decommissioning) to the
+    series of its region and fuel. The events of all plants are summed up
+    per hour with one bincount and the series is their cumulative sum, so
+    the time does not depend on the number of plants per hour.
+
+    Parameters
+    ----------
+    pp : pandas.DataFrame
+        Table of :func:`read_deflex_pp`. The table is not changed.
+    year : int
+    region_column : str
+    conf : settings.ConfigSnapshot or None
+
+    Returns
+    -------
+    pandas.DataFrame : Capacity [MW], columns (region, fuel), one row per
+        hour of the year.
+
+    Examples
+    --------
+    >>> pp = pd.DataFrame({
+    ...     "deflex_region": ["DE01", "DE01", "DE02"],
+    ...     "energy_source_level_2": ["lignite", "lignite", "natural gas"],
+    ...     "capacity": [100.0, 50.0, 20.0],
+    ...     "com_year": [1990, 2014, 2000],
+    ...     "com_month": [1, 6, 3],
+    ...     "decom_year": [2050, 2060, 2014]})
+    >>> conf = settings.ConfigSnapshot({"source_names": {},
+    ...     "source_groups": {}, "model_classes": {
+    ...         "lignite": "power plants", "natural gas": "power plants"}})
+    >>> series = capacity_series(pp, 2014, conf=conf)
+    >>> series.iloc[[0, 8759]].values.tolist()
+    [[100.0, 20.0], [150.0, 0.0]]
+    >>> round(float(series[("DE01", "lignite")].mean()), 1)
+    125.2
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    replace_names = conf.get_dict("source_names")
+    replace_names.update(conf.source_groups)
+    fuel = pp["energy_source_level_2"].replace(replace_names)
+    model_class = fuel.replace(dict(conf.model_classes))
+    selected = model_class.isin(["power plants", "volatile plants"])
+    selected &= pp["com_year"].notnull() & pp["decom_year"].notnull()
+    selected &= pp["capacity"].notnull()
+    pp = pp.loc[selected]
+    fuel = fuel.loc[selected]
+
+    cal = timeindex.get_calendar(year)
+    month_hours = cal.month_start_hours
+    n_hours = cal.hours
+    if "com_month" in pp:
+        month = pp["com_month"].to_numpy(dtype=float)
+    else:
+        month = np.full(len(pp), np.nan)
+    com_year = pp["com_year"].to_numpy(dtype=float)
+    start_month = np.where(
+        np.isnan(month), com_year * 12, com_year * 12 + month
+    )
+    decom_year = pp["decom_year"].to_numpy(dtype=float)
+    end_month = np.where(
+        np.isnan(month), (decom_year + 1) * 12, decom_year * 12 + month
+    )
+
+    def hour(months):
+        months = np.clip(months - year * 12, 0, 12)
+        return month_hours[months.astype(int)]
+
+    start, end = hour(start_month), hour(end_month)
+    capacity = pp["capacity"].to_numpy(dtype=float)
+    active = start < end
+    capacity, start, end = capacity[active], start[active], end[active]
+
+    columns = pd.MultiIndex.from_arrays(
+        [pp[region_column].to_numpy()[active], fuel.to_numpy()[active]]
+    )
+    codes, columns = pd.factorize(columns, sort=True)
+    n_columns = len(columns)
+    events = np.bincount(
+        np.concatenate([start, end]) * n_columns + np.tile(codes, 2),
+        weights=np.concatenate([capacity, -capacity]),
+        minlength=(n_hours + 1) * n_columns,
+    ).reshape(n_hours + 1, n_columns)
+    values = np.cumsum(events[:-1], axis=0)
+    # The sum of positive and negative events is not exactly zero.
+    values[np.abs(values) < 1e-9] = 0
+    return pd.DataFrame(
+        values,
+        index=cal.index,
+        columns=pd.MultiIndex.from_tuples(columns, names=["region", "fuel"]),
+    )
+
+
+@profiling.timed()
+def scenario_powerplants(
+    table_collection, regions, year, name, conf=None, pp=None
+):
     """Get power plants for the scenario year
 
+    A shared table of :func:`read_deflex_pp` can be passed as `pp`. If
+    ``capacity_series`` is set in the section "creator" of the config, the
+    hourly available capacity is added as "capacity series" (see
+    :func:`capacity_series`).
+
+    If ``pp_chunksize`` is set in the section "creator" and no table is
+    passed, the power plant store (see :func:`pp_store`) is read and grouped
+    chunk by chunk (see :func:`group_pp_chunks`).
+
     Examples
     --------
     >>> from reegis import geometries
@@ -195,63 +563,224 @@ def scenario_powerplants(table_collection, regions, year, name):
     ...     ] # doctest: +SKIP
     1135.6
     """
-    pp = get_deflex_pp_by_year(regions, year, name, overwrite_capacity=True)
-    tables = create_powerplants(pp, table_collection, year, name)
+    if conf is None:
+        conf = settings.snapshot()
+    chunksize = conf.get("creator", "pp_chunksize", fallback=None)
+    if chunksize and pp is None:
+        return _scenario_powerplants_chunked(
+            table_collection, regions, year, name, chunksize, conf
+        )
+    if pp is None:
+        pp = read_deflex_pp(regions, name, conf=conf)
+    pp_year = get_deflex_pp_by_year(
+        regions, year, name, overwrite_capacity=True, conf=conf, pp=pp
+    )
+    tables = create_powerplants(
+        pp_year, table_collection, year, name, conf=conf
+    )
     tables["power plants"]["source region"] = "DE"
+    if conf.get("creator", "capacity_series", fallback=False):
+        tables["capacity series"] = capacity_series(
+            pp, year, region_column=name, conf=conf
+        )
     return tables
 
 
-def create_powerplants(
-    pp, table_collection, year, region_column="deflex_region"
-):
-    """This function works for all power plant tables with an equivalent
-    structure e.g. power plants by state or other regions."""
-    logging.info("Adding power plants to your scenario.")
+def _group_keys(region_column, conf):
+    keys = ["model_classes", region_column, "energy_source_level_2"]
+    if not conf.creator.group_transformer:
+        keys.append("efficiency")
+    return keys
 
-    replace_names = cfg.get_dict("source_names")
+
+def group_powerplants(pp, region_column="deflex_region", conf=None):
+    """Sum up the capacity and the number of power plants per group.
+
+    The plants are grouped by model class, region, fuel and, if the
+    transformers are not grouped, by the rounded efficiency. The names of
+    the fuels are replaced in place. The result of parts of a table can be
+    merged with :func:`merge_pp_groups`.
+
+    Returns
+    -------
+    pandas.DataFrame : capacity, capacity_in and count per group
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    replace_names = conf.get_dict("source_names")
 
     # TODO Waste is not "other"
-    replace_names.update(cfg.get_dict("source_groups"))
+    replace_names.update(conf.source_groups)
     pp["count"] = 1
-    pp["energy_source_level_2"].replace(replace_names, inplace=True)
+    pp["energy_source_level_2"] = pp["energy_source_level_2"].replace(
+        replace_names
+    )
 
     pp["model_classes"] = pp["energy_source_level_2"].replace(
-        cfg.get_dict("model_classes")
+        dict(conf.model_classes)
+    )
+    keys = _group_keys(region_column, conf)
+    if "efficiency" in keys:
+        pp["efficiency"] = pp["efficiency"].round(2)
+    # Plants without efficiency are kept for the volatile plants.
+    return (
+        pp.dropna(subset=keys[:3])
+        .groupby(keys, dropna=False)[["capacity", "capacity_in", "count"]]
+        .sum()
     )
 
-    power_plants = {
-        "volatile plants": pp.groupby(
-            ["model_classes", region_column, "energy_source_level_2"]
-        )
-        .sum()[["capacity", "count"]]
-        .loc["volatile plants"]
-    }
 
-    if cfg.get("creator", "group_transformer"):
-        power_plants["power plants"] = (
-            pp.groupby(
-                ["model_classes", region_column, "energy_source_level_2"]
+def merge_pp_groups(groups):
+    """Merge the results of :func:`group_powerplants` for parts of a table."""
+    groups = list(groups)
+    if len(groups) == 1:
+        return groups[0]
+    merged = pd.concat(groups)
+    return merged.groupby(
+        level=list(range(merged.index.nlevels)), dropna=False
+    ).sum()
+
+
+def _iter_store_chunks(regions, name, chunksize, conf):
+    columns = PP_COLUMNS + [name]
+    if conf.get("powerplants", "clean_offshore", fallback=False):
+        columns.append("federal_states")
+    return iter_pp_chunks(
+        pp_store(regions, name, conf=conf),
+        columns=columns,
+        chunksize=int(chunksize),
+    )
+
+
+def _scenario_powerplants_chunked(
+    table_collection, regions, year, name, chunksize, conf
+):
+    chunks = _iter_store_chunks(regions, name, chunksize, conf)
+    groups, series = group_pp_chunks(
+        chunks,
+        year,
+        name,
+        conf=conf,
+        with_capacity_series=conf.get(
+            "creator", "capacity_series", fallback=False
+        ),
+    )
+    tables = create_powerplants_from_groups(
+        groups, table_collection, year, conf=conf
+    )
+    tables["power plants"]["source region"] = "DE"
+    if series is not None:
+        tables["capacity series"] = series
+    return tables
+
+
+def unit_table(pp, year, region_column="deflex_region", conf=None):
+    """The single power plants of a table that are in operation in a year.
+
+    The capacity is the capacity of the year (see
+    :func:`get_deflex_pp_by_year`) and the fuels have the names of the power
+    plant tables. The table is not changed.
+
+    Returns
+    -------
+    units.UnitTable
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    replace_names = conf.get_dict("source_names")
+    replace_names.update(conf.source_groups)
+    columns = ["capacity", "capacity_in", "com_year", "com_month"]
+    capacity = _filter_year(
+        pp[columns + ["decom_year"]].copy(), year, overwrite_capacity=True
+    )["capacity"]
+    fuel = pp["energy_source_level_2"].replace(replace_names)
+    region = pp[region_column]
+    in_operation = (capacity > 0) & fuel.notnull() & region.notnull()
+    return units.UnitTable.from_arrays(
+        capacity[in_operation],
+        pp["efficiency"][in_operation],
+        region[in_operation],
+        fuel[in_operation],
+    )
+
+
+@profiling.timed()
+def scenario_units(regions, year, name, conf=None, pp=None):
+    """Get the single power plants of the scenario year.
+
+    This is the plant-level counterpart of :func:`scenario_powerplants` for
+    unit-commitment models. A shared table of :func:`read_deflex_pp` can be
+    passed as `pp`. In the chunked mode (``pp_chunksize``) the power plant
+    store is read chunk by chunk.
+
+    Returns
+    -------
+    units.UnitTable
+    """
+    if conf is None:
+        conf = settings.snapshot()
+    chunksize = conf.get("creator", "pp_chunksize", fallback=None)
+    if chunksize and pp is None:
+        return units.UnitTable.concat(
+            unit_table(
+                process_pp_table(chunk, conf=conf, name=name),
+                year,
+                name,
+                conf=conf,
             )
-            .sum()[["capacity", "capacity_in", "count"]]
-            .loc["power plants"]
+            for chunk in _iter_store_chunks(regions, name, chunksize, conf)
         )
+    if pp is None:
+        pp = read_deflex_pp(regions, name, conf=conf)
+    return unit_table(pp, year, name, conf=conf)
+
+
+@profiling.timed()
+def create_powerplants(
+    pp, table_collection, year, region_column="deflex_region", conf=None
+):
+    """This function works for all power plant tables with an equivalent
+    structure e.g. power plants by state or other regions."""
+    if conf is None:
+        conf = settings.snapshot()
+    groups = group_powerplants(pp, region_column, conf=conf)
+    return create_powerplants_from_groups(
+        groups, table_collection, year, conf=conf
+    )
+
+
+@profiling.timed()
+def create_powerplants_from_groups(groups, table_collection, year, conf=None):
+    """Create the power plant tables from the result of
+    :func:`group_powerplants` or :func:`merge_pp_groups`."""
+    logging.info("Adding power plants to your scenario.")
+    if conf is None:
+        conf = settings.snapshot()
+
+    volatile = groups
+    if groups.index.nlevels > 3:
+        volatile = groups.groupby(level=[0, 1, 2]).sum()
+    power_plants = {
+        "volatile plants": volatile[["capacity", "count"]].loc[
+            "volatile plants"
+        ]
+    }
+
+    if conf.creator.group_transformer:
+        power_plants["power plants"] = groups[
+            ["capacity", "capacity_in", "count"]
+        ].loc["power plants"]
         power_plants["power plants"]["fuel"] = power_plants[
             "power plants"
         ].index.get_level_values(1)
     else:
-        pp["efficiency"] = pp["efficiency"].round(2)
-        power_plants["power plants"] = (
-            pp.groupby(
-                [
-                    "model_classes",
-                    region_column,
-                    "energy_source_level_2",
-                    "efficiency",
-                ]
-            )
-            .sum()[["capacity", "capacity_in", "count"]]
-            .loc["power plants"]
-        )
+        pp_groups = groups.loc["power plants"]
+        pp_groups = pp_groups.loc[
+            pp_groups.index.get_level_values(2).notnull()
+        ]
+        power_plants["power plants"] = pp_groups[
+            ["capacity", "capacity_in", "count"]
+        ].copy()
         power_plants["power plants"]["fuel"] = power_plants[
             "power plants"
         ].index.get_level_values(1)
@@ -266,38 +795,46 @@ def create_powerplants(
                 pp_class["capacity"] / pp_class["capacity_in"] * 100
             )
             del pp_class["capacity_in"]
-        if cfg.get("creator", "round") is not None:
-            pp_class = pp_class.round(cfg.get("creator", "round"))
+        if conf.creator.round is not None:
+            pp_class = pp_class.round(conf.creator.round)
         if "efficiency" in pp_class:
             pp_class["efficiency"] = pp_class["efficiency"].div(100)
         pp_class = pp_class.transpose()
         pp_class.index.name = "parameter"
         table_collection[class_name] = pp_class.transpose()
 
-    table_collection = add_pp_limit(table_collection, year)
-    table_collection = add_additional_values(table_collection)
+    table_collection = add_pp_limit(table_collection, year, conf=conf)
+    table_collection = add_additional_values(table_collection, conf=conf)
     return table_collection
 
 
-def add_additional_values(table_collection):
+@profiling.timed()
+def add_additional_values(table_collection, conf=None):
     """
 
     Parameters
     ----------
     table_collection
+    conf : settings.ConfigSnapshot or None
 
     Returns
     -------
 
     """
+    if conf is None:
+        conf = settings.snapshot()
     transf = table_collection["power plants"]
+    ewi_data = None
     for values in ["variable_costs", "downtime_factor"]:
-        if cfg.get("creator", "use_{0}".format(values)) is True:
-            add_values = getattr(data.get_ewi_data(), values)
-            if cfg.has_option("creator", "downtime_bioenergy"):
-                add_values.loc["bioenergy", "value"] = cfg.get(
-                    "creator", "downtime_bioenergy"
-                )
+        if conf.creator["use_{0}".format(values)] is True:
+            # The EWI workbook is parsed only once for both value types.
+            if ewi_data is None:
+                ewi_data = data.get_ewi_data(conf=conf)
+            add_values = getattr(ewi_data, values)
+            if "downtime_bioenergy" in conf.creator:
+                add_values.loc[
+                    "bioenergy", "value"
+                ] = conf.creator.downtime_bioenergy
             transf = transf.merge(
                 add_values,
                 right_index=True,
@@ -312,23 +849,29 @@ def add_additional_values(table_collection):
     return table_collection
 
 
-def add_pp_limit(table_collection, year):
+@profiling.timed()
+def add_pp_limit(table_collection, year, conf=None):
     """
 
     Parameters
     ----------
     table_collection
     year
+    conf : settings.ConfigSnapshot or None
 
     Returns
     -------
 
     """
-    if len(cfg.get_list("creator", "limited_transformer")) > 0:
+    if conf is None:
+        conf = settings.snapshot()
+    limited_transformer = conf.get_list("creator", "limited_transformer")
+    if len(limited_transformer) > 0:
         # Multiply with 1000 to get MWh (bmwi: GWh)
-        repp = bmwi.bmwi_re_energy_capacity() * 1000
+        with profiling.stage("bmwi re capacity"):
+            repp = bmwi.bmwi_re_energy_capacity() * 1000
         trsf = table_collection["power plants"]
-        for limit_trsf in cfg.get_list("creator", "limited_transformer"):
+        for limit_trsf in limited_transformer:
             trsf = table_collection["power plants"]
             try:
                 limit = repp.loc[year, (limit_trsf, "energy")]
@@ -349,7 +892,18 @@ def add_pp_limit(table_collection, year):
     return table_collection
 
 
-def scenario_chp(table_collection, regions, year, name, weather_year=None):
+@profiling.timed()
+def scenario_chp(
+    table_collection,
+    regions,
+    year,
+    name,
+    weather_year=None,
+    conf=None,
+    heat_demand=None,
+    chp=None,
+    design=None,
+):
     """
 
     Parameters
@@ -359,6 +913,18 @@ def scenario_chp(table_collection, regions, year, name, weather_year=None):
     year
     name
     weather_year
+    conf : settings.ConfigSnapshot or None
+    heat_demand : pandas.DataFrame or None
+        Result of demand.get_heat_profiles_deflex() if it has already been
+        created for this scenario.
+    chp : pandas.DataFrame or None
+        Result of chp_parameters() for several years including this year.
+        By default the (cached) parameters of this year are used.
+    design : pandas.DataFrame or None
+        Peak ("max") and annual total ("sum") of the heat demand to size
+        the plants, e.g. of many weather years (see
+        :meth:`scenario_builder.ensemble.RunningStats.design`). By default
+        the heat demand of the scenario is used.
 
     Returns
     -------
@@ -382,132 +948,271 @@ def scenario_chp(table_collection, regions, year, name, weather_year=None):
     667
     """
     # values from heat balance
+    if chp is None:
+        chp = chp_parameters(regions, [year], name, conf=conf)
+    parameters = chp.xs(year, level="year")
 
-    cb = energy_balance.get_transformation_balance_by_region(
-        regions, year, name
-    )
-    cb.rename(columns={"re": "bioenergy"}, inplace=True)
-    heat_b = powerplants.calculate_chp_share_and_efficiency(cb)
-
-    heat_demand = demand.get_heat_profiles_deflex(
-        regions, year, weather_year=weather_year
+    if heat_demand is None and design is None:
+        heat_demand = demand.get_heat_profiles_deflex(
+            regions, year, weather_year=weather_year, conf=conf
+        )
+    tables = chp_table_from_parameters(
+        parameters, heat_demand, table_collection, design=design
     )
-    tables = chp_table(heat_b, heat_demand, table_collection)
     tables["heat-chp plants"]["source region"] = "DE"
     return tables
 
 
-def chp_table(heat_b, heat_demand, table_collection, regions=None):
+def _chp_parameter_file(name, fingerprint, year, conf):
+    return os.path.join(
+        conf.paths.powerplants,
+        "chp_parameters_{0}_{1}_{2}.csv".format(name, fingerprint[:16], year),
+    )
+
+
+def _load_chp_parameters(regions, year, name, fingerprint, conf):
+    """Read the CHP parameters of one year or create and store them."""
+    filename = _chp_parameter_file(name, fingerprint, year, conf)
+    if os.path.isfile(filename):
+        return pd.read_csv(
+            filename, index_col=[0, 1], float_precision="round_trip"
+        )
+    with profiling.stage("transformation balance") as st:
+        cb = st.frame(
+            energy_balance.get_transformation_balance_by_region(
+                regions, year, name
+            )
+        )
+    cb.rename(columns={"re": "bioenergy"}, inplace=True)
+    with profiling.stage("chp share and efficiency"):
+        heat_b = powerplants.calculate_chp_share_and_efficiency(cb)
+    parameters = chp_parameters_from_heat_balance(heat_b)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    parameters.to_csv(filename)
+    return parameters
+
+
+@profiling.timed()
+def chp_parameters(regions, years, name, conf=None):
+    """Fuel shares and efficiencies of chp and heat plants for many years.
+
+    The transformation balance is evaluated once per region map and year.
+    The result is stored in the power plant directory and kept in memory
+    for all following scenarios of this process. The cache is keyed by
+    the fingerprint of the map, so a changed map is evaluated again.
+
+    Parameters
+    ----------
+    regions : geopandas.GeoDataFrame
+    years : iterable
+    name : str
+        Name of the region map.
+    conf : settings.ConfigSnapshot or None
+
+    Returns
+    -------
+    pandas.DataFrame : Long format with the index (year, region, plant),
+        see chp_parameters_from_heat_balance().
     """
+    if conf is None:
+        conf = settings.snapshot()
+    fingerprint = data.map_fingerprint(regions)
+    frames = {}
+    for year in sorted(set(years)):
+        key = (fingerprint, year)
+        if key not in _CHP_PARAMETERS:
+            _CHP_PARAMETERS[key] = _load_chp_parameters(
+                regions, year, name, fingerprint, conf
+            )
+        frames[year] = _CHP_PARAMETERS[key]
+    return pd.concat(frames, names=["year"])
+
+
+def chp_parameters_from_heat_balance(heat_b):
+    """Convert the chp share and efficiency of reegis to the long format.
+
+    The shares of "district heating" and "electricity" are spread to the
+    remaining fuels.
 
     Parameters
     ----------
-    heat_b
-    heat_demand
-    table_collection
-    regions
+    heat_b : dict
+        Result of reegis.powerplants.calculate_chp_share_and_efficiency().
 
     Returns
     -------
+    pandas.DataFrame : Index (region, plant) with the plants "chp" and
+        "hp". One column with the share of every fuel and the columns
+        "out_share_factor", "eta_heat" and "eta_elec" (NaN for "hp").
+    """
+    plants = {row: plant for plant, row in CHP_ROWS.items()}
+    regions = sorted(heat_b.keys())
+    shares = pd.concat([heat_b[region]["fuel_share"] for region in regions])
+    row = shares.index.get_level_values(-1)
+    shares = shares.loc[row.isin(list(plants))]
+    shares.index = pd.MultiIndex.from_arrays(
+        [
+            shares.index.get_level_values(0),
+            shares.index.get_level_values(-1).map(plants),
+        ],
+        names=["region", "plant"],
+    )
+    shares = shares.loc[~shares.index.duplicated()]
+    d = shares["district heating"] + shares["electricity"]
+    shares = shares + shares.div(shares["total"] - d, axis=0).mul(d, axis=0)
+    shares = shares.drop(["district heating", "electricity", "total"], axis=1)
+    shares = shares.rename({"gas": "natural gas"}, axis=1)
+
+    # Due to the different efficiency between heat from chp-plants and
+    # heat from heat-plants the share of the output is different to the
+    # share of the input. As heat-plants will produce more heat per fuel
+    # factor will be greater than 1 and for chp-plants smaller than 1.
+    values = {}
+    for region in regions:
+        hb = heat_b[region]
+        values[region, "chp"] = (
+            hb["out_share_factor_chp"],
+            round(hb["sys_heat"] * hb["heat_chp"], 2),
+            round(hb["elec_chp"], 2),
+        )
+        values[region, "hp"] = (
+            hb["out_share_factor_hp"],
+            round(hb["sys_heat"] * hb["hp"], 2),
+            float("nan"),
+        )
+    values = pd.DataFrame.from_dict(
+        values, orient="index", columns=CHP_PARAMETERS
+    )
+    values.index = pd.MultiIndex.from_tuples(
+        values.index, names=["region", "plant"]
+    )
+    return shares.join(values).sort_index()
+
 
+def _fill_unset(values, is_set, step, last_step):
+    """Emulate the fillna() of the former loop over all regions and fuels.
+
+    The loop filled the rows that already existed with 0 after the chp
+    values of every fuel. A row exists from the first set value on.
     """
+    if not is_set.any():
+        return None
+    created = step[is_set].min()
+    return np.where(is_set, values, np.where(last_step > created, 0, np.nan))
 
-    chp_hp = pd.DataFrame(
-        columns=pd.MultiIndex(levels=[[], []], codes=[[], []])
-    )
 
-    rows = ["Heizkraftwerke der allgemeinen Versorgung (nur KWK)", "Heizwerke"]
-    if regions is None:
-        regions = sorted(heat_b.keys())
+@profiling.timed()
+def chp_table_from_parameters(
+    parameters, heat_demand, table_collection, regions=None, design=None
+):
+    """Create the table "heat-chp plants" for all regions at once.
 
-    eta_heat_chp = None
-    eta_elec_chp = None
+    Parameters
+    ----------
+    parameters : pandas.DataFrame
+        Parameters of one year (index: region, plant), see
+        chp_parameters_from_heat_balance().
+    heat_demand : pandas.DataFrame or None
+    table_collection : dict
+    regions : list or None
+    design : pandas.DataFrame or None
+        Peak ("max") and annual total ("sum") of the district heating to
+        use instead of the heat demand (see scenario_chp()).
 
-    for region in regions:
-        eta_hp = round(heat_b[region]["sys_heat"] * heat_b[region]["hp"], 2)
-        eta_heat_chp = round(
-            heat_b[region]["sys_heat"] * heat_b[region]["heat_chp"], 2
+    Returns
+    -------
+    dict : The tables "heat-chp plants" and "power plants".
+    """
+    if regions is None:
+        regions = sorted(parameters.index.get_level_values(0).unique())
+    fuels = [c for c in parameters.columns if c not in CHP_PARAMETERS]
+    chp = parameters.xs("chp", level="plant").reindex(regions)
+    hp = parameters.xs("hp", level="plant").reindex(regions)
+
+    if design is None:
+        design = pd.DataFrame(
+            {
+                r: heat_demand[r]["district heating"].agg(["max", "sum"])
+                for r in regions
+            }
+        )
+    else:
+        design = design.xs("district heating", axis=1, level=1)
+    max_val = design.loc["max", regions].to_numpy(dtype=float)[:, None]
+    sum_val = design.loc["sum", regions].to_numpy(dtype=float)[:, None]
+
+    share_chp = chp[fuels].to_numpy(dtype=float)
+    share_hp = hp[fuels].to_numpy(dtype=float)
+    factor_chp = chp["out_share_factor"].to_numpy(dtype=float)[:, None]
+    factor_hp = hp["out_share_factor"].to_numpy(dtype=float)[:, None]
+    eta_heat_chp = chp["eta_heat"].to_numpy(dtype=float)[:, None]
+    eta_elec_chp = chp["eta_elec"].to_numpy(dtype=float)[:, None]
+    eta_hp = hp["eta_heat"].to_numpy(dtype=float)[:, None]
+
+    # Position of every (region, fuel) in the former loop.
+    step = np.arange(share_chp.size).reshape(share_chp.shape)
+    last_step = step[:, -1:]
+
+    cap_heat_chp = np.round(max_val * share_chp * factor_chp + 0.005, 2)
+    cap_elec = cap_heat_chp / eta_heat_chp * eta_elec_chp
+    cap_hp = np.round(max_val * share_hp * factor_hp + 0.005, 2)
+    rows = {
+        "limit_heat_chp": np.round(sum_val * share_chp * factor_chp + 0.5),
+        "capacity_heat_chp": cap_heat_chp,
+        "capacity_elec_chp": np.round(cap_elec, 2),
+    }
+    rows = {key: np.nan_to_num(value, nan=0) for key, value in rows.items()}
+    rows["limit_hp"] = np.round(sum_val * share_hp * factor_hp + 0.5)
+    rows["capacity_hp"] = cap_hp
+    for key in ("limit_hp", "capacity_hp"):
+        rows[key] = np.where(
+            np.isnan(rows[key]) & (step < last_step), 0, rows[key]
         )
-        eta_elec_chp = round(heat_b[region]["elec_chp"], 2)
-
-        # Due to the different efficiency between heat from chp-plants and
-        # heat from heat-plants the share of the output is different to the
-        # share of the input. As heat-plants will produce more heat per fuel
-        # factor will be greater than 1 and for chp-plants smaller than 1.
-        out_share_factor_chp = heat_b[region]["out_share_factor_chp"]
-        out_share_factor_hp = heat_b[region]["out_share_factor_hp"]
-
-        # Remove "district heating" and "electricity" and spread the share
-        # to the remaining columns.
-        share = pd.DataFrame(columns=heat_b[region]["fuel_share"].columns)
-        for row in rows:
-            tmp = heat_b[region]["fuel_share"].loc[region, :, row]
-            tot = float(tmp["total"])
-
-            d = float(tmp["district heating"] + tmp["electricity"])
-            tmp = tmp + tmp / (tot - d) * d
-            tmp = tmp.reset_index(drop=True)
-            share.loc[row] = tmp.loc[0]
-        del share["district heating"]
-        del share["electricity"]
-
-        # Remove the total share
-        del share["total"]
-
-        max_val = float(heat_demand[region]["district heating"].max())
-        sum_val = float(heat_demand[region]["district heating"].sum())
-
-        share = share.rename({"gas": "natural gas"}, axis=1)
-
-        for fuel in share.columns:
-            # CHP
-            chp_hp.loc["limit_heat_chp", (region, fuel)] = round(
-                sum_val * share.loc[rows[0], fuel] * out_share_factor_chp + 0.5
-            )
-            cap_heat_chp = round(
-                max_val * share.loc[rows[0], fuel] * out_share_factor_chp
-                + 0.005,
-                2,
-            )
-            chp_hp.loc["capacity_heat_chp", (region, fuel)] = cap_heat_chp
-            cap_elec = cap_heat_chp / eta_heat_chp * eta_elec_chp
-            chp_hp.loc["capacity_elec_chp", (region, fuel)] = round(
-                cap_elec, 2
-            )
-            chp_hp[region] = chp_hp[region].fillna(0)
 
-            # HP
-            chp_hp.loc["limit_hp", (region, fuel)] = round(
-                sum_val * share.loc[rows[1], fuel] * out_share_factor_hp + 0.5
+    # The efficiency rows appear in the order of their first value.
+    efficiency = []
+    hp_set = cap_hp > 0
+    if hp_set.any():
+        efficiency.append((step[hp_set].min(), 0, "efficiency_hp", hp_set))
+    chp_set = cap_heat_chp * cap_elec > 0
+    if chp_set.any():
+        efficiency.append((step[chp_set].min(), 1, "efficiency_chp", chp_set))
+    for _, _, key, is_set in sorted(efficiency):
+        if key == "efficiency_hp":
+            rows[key] = _fill_unset(
+                np.broadcast_to(eta_hp, step.shape), is_set, step, last_step
+            )
+        else:
+            rows["efficiency_heat_chp"] = _fill_unset(
+                np.broadcast_to(eta_heat_chp, step.shape),
+                is_set,
+                step,
+                last_step,
             )
-            chp_hp.loc["capacity_hp", (region, fuel)] = round(
-                max_val * share.loc[rows[1], fuel] * out_share_factor_hp
-                + 0.005,
-                2,
+            rows["efficiency_elec_chp"] = _fill_unset(
+                np.broadcast_to(eta_elec_chp, step.shape),
+                is_set,
+                step,
+                last_step,
             )
-            if chp_hp.loc["capacity_hp", (region, fuel)] > 0:
-                chp_hp.loc["efficiency_hp", (region, fuel)] = eta_hp
-            if cap_heat_chp * cap_elec > 0:
-                chp_hp.loc[
-                    "efficiency_heat_chp", (region, fuel)
-                ] = eta_heat_chp
-                chp_hp.loc[
-                    "efficiency_elec_chp", (region, fuel)
-                ] = eta_elec_chp
-            chp_hp.loc["fuel", (region, fuel)] = fuel
-
-    logging.info("Done")
 
+    columns = pd.MultiIndex.from_product([regions, fuels])
+    chp_hp = pd.DataFrame(
+        np.vstack([value.ravel() for value in rows.values()]),
+        index=list(rows),
+        columns=columns,
+    )
+    # Add the fuel row at once to keep the numerical rows float.
+    chp_hp.loc["fuel"] = chp_hp.columns.get_level_values(1)
     chp_hp.sort_index(axis=1, inplace=True)
 
-    # for col in trsf.sum().loc[trsf.sum() == 0].index:
-    #     del trsf[col]
-    # trsf[trsf < 0] = 0
-
     table_collection["heat-chp plants"] = chp_hp.transpose()
 
+    # The efficiencies of the last region are used for all regions.
     table_collection = substract_chp_capacity_and_limit_from_pp(
-        table_collection, eta_heat_chp, eta_elec_chp
+        table_collection,
+        chp["eta_heat"].iloc[-1] if len(regions) else None,
+        chp["eta_elec"].iloc[-1] if len(regions) else None,
     )
 
     return {
@@ -516,6 +1221,36 @@ def chp_table(heat_b, heat_demand, table_collection, regions=None):
     }
 
 
+@profiling.timed()
+def chp_table(
+    heat_b, heat_demand, table_collection, regions=None, design=None
+):
+    """
+
+    Parameters
+    ----------
+    heat_b : dict
+        Result of reegis.powerplants.calculate_chp_share_and_efficiency().
+    heat_demand
+    table_collection
+    regions
+    design : pandas.DataFrame or None
+        See scenario_chp().
+
+    Returns
+    -------
+
+    """
+    return chp_table_from_parameters(
+        chp_parameters_from_heat_balance(heat_b),
+        heat_demand,
+        table_collection,
+        regions=regions,
+        design=design,
+    )
+
+
+@profiling.timed()
 def substract_chp_capacity_and_limit_from_pp(tc, eta_heat_chp, eta_elec_chp):
     """
 
@@ -537,11 +1272,12 @@ def substract_chp_capacity_and_limit_from_pp(tc, eta_heat_chp, eta_elec_chp):
             # If the power plant limit is not "inf" the limited electricity
             # output of the chp plant has to be subtracted from the power plant
             # limit because this is related to the overall electricity output.
+            # Regions without power plants of this fuel have no limit (0).
             limit_elec_pp = pp.loc[
                 (pp.index.get_level_values(0) == region) & (pp.fuel == fuel),
                 "limit_elec_pp",
             ].sum()
-            if not limit_elec_pp == float("inf"):
+            if limit_elec_pp not in (0, float("inf")):
                 limit_elec_chp = (
                     chp_hp.loc[(region, fuel), "limit_heat_chp"]
                     / eta_heat_chp
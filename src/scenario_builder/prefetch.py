@@ -0,0 +1,238 @@
+"""Copy all raw input files of a build from a local mirror before the build.
+
+A manifest (JSON) lists every input file of a build with its place in the
+mirror, its target path and optionally its SHA-256 checksum::
+
+    {
+        "files": [
+            {
+                "source": "ewi/EWI_Merit_Order_Tool_2019_1_4.xlsm",
+                "target": "{general}/ewi.xls",
+                "sha256": "9f86d081..."
+            },
+            {
+                "source": "coastdat/coastDat2_de_{year}.h5",
+                "target": "{coastdat}/coastDat2_de_{year}.h5"
+            }
+        ]
+    }
+
+The target is formatted with the options of the section "paths" of the
+config. Entries with ``{year}`` are expanded for every year and weather
+year of the planned build. Missing files are reported before anything is
+copied and all files are copied concurrently (asyncio). Every copy is
+verified and moved to its target atomically.
+
+Examples
+--------
+>>> import tempfile
+>>> mirror, local = tempfile.mkdtemp(), tempfile.mkdtemp()
+>>> for year in (2013, 2014):
+...     name = os.path.join(mirror, "load_{0}.csv".format(year))
+...     with open(name, "w") as f:
+...         _ = f.write("hour,load")
+>>> manifest = {"files": [
+...     {"source": "load_{year}.csv", "target": "{demand}/load_{year}.csv"}]}
+>>> files = plan(manifest, [2013, 2014], paths={"demand": local})
+>>> sorted(prefetch(files, mirror)["copied"]) == [f.target for f in files]
+True
+>>> prefetch(files, mirror)["present"] == [f.target for f in files]
+True
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+from collections import namedtuple
+from concurrent import futures
+
+from scenario_builder import profiling
+from scenario_builder import settings
+
+InputFile = namedtuple("InputFile", ["source", "target", "sha256"])
+
+
+class MissingInputs(FileNotFoundError):
+    """Raised if input files are neither local nor in the mirror."""
+
+    def __init__(self, files):
+        self.files = list(files)
+        super().__init__(
+            "{0} input files are missing in the mirror:\n{1}".format(
+                len(self.files),
+                "\n".join("  {0}".format(f.source) for f in self.files),
+            )
+        )
+
+
+class ChecksumError(ValueError):
+    """Raised if the checksum of a copied file does not match."""
+
+
+def file_checksum(filename, blocksize=2 ** 20):
+    """SHA-256 checksum of a file as hex string."""
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def read_manifest(filename):
+    """Read a manifest file (see module documentation)."""
+    with open(filename) as f:
+        return json.load(f)
+
+
+def plan(manifest, years, paths=None, conf=None):
+    """Return all input files of a planned build.
+
+    Parameters
+    ----------
+    manifest : dict or str
+        The manifest or the name of the manifest file.
+    years : iterable
+        All years and weather years of the build.
+    paths : dict or None
+        Values to format the targets. By default the section "paths" of
+        the config.
+    conf : settings.ConfigSnapshot or None
+
+    Returns
+    -------
+    list : InputFile for every file (sorted by target, without duplicates).
+    """
+    if isinstance(manifest, str):
+        manifest = read_manifest(manifest)
+    if paths is None:
+        if conf is None:
+            conf = settings.snapshot()
+        paths = dict(conf.paths)
+    files = {}
+    for entry in manifest["files"]:
+        per_year = "{year}" in entry["source"] + entry["target"]
+        for year in sorted(set(years)) if per_year else [None]:
+            target = entry["target"].format(year=year, **paths)
+            files[target] = InputFile(
+                source=entry["source"].format(year=year),
+                target=os.path.abspath(target),
+                sha256=entry.get("sha256"),
+            )
+    return sorted(files.values(), key=lambda f: f.target)
+
+
+def missing_files(files, mirror):
+    """Input files that are neither local nor in the mirror."""
+    return [
+        f
+        for f in files
+        if not os.path.isfile(f.target)
+        and not os.path.isfile(os.path.join(mirror, f.source))
+    ]
+
+
+def _copy(source, item):
+    """Copy a file to a temporary file, verify it and move it."""
+    os.makedirs(os.path.dirname(item.target), exist_ok=True)
+    tmp = "{0}.{1}.part".format(item.target, os.getpid())
+    try:
+        shutil.copyfile(source, tmp)
+        if item.sha256 is not None:
+            checksum = file_checksum(tmp)
+            if checksum != item.sha256.lower():
+                raise ChecksumError(
+                    "Checksum of '{0}' is {1}, expected {2}.".format(
+                        source, checksum, item.sha256
+                    )
+                )
+        os.replace(tmp, item.target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return item.target
+
+
+async def _copy_all(items, mirror, workers):
+    loop = asyncio.get_running_loop()
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = [
+            loop.run_in_executor(
+                pool, _copy, os.path.join(mirror, item.source), item
+            )
+            for item in items
+        ]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+
+@profiling.timed()
+def prefetch(files, mirror, workers=8, verify_present=False):
+    """Copy all input files that are not local from the mirror.
+
+    Parameters
+    ----------
+    files : list
+        InputFile objects (see :func:`plan`).
+    mirror : str
+        Directory of the local mirror.
+    workers : int
+        Number of concurrent copies.
+    verify_present : bool
+        Verify the checksum of files that are already local as well.
+
+    Returns
+    -------
+    dict : Targets of the "copied" and the "present" files.
+
+    Raises
+    ------
+    MissingInputs
+        Before anything is copied, if files are missing in the mirror.
+    ChecksumError
+        If a copied (or present) file has a wrong checksum. All other
+        files are copied anyway.
+    """
+    missing = missing_files(files, mirror)
+    if missing:
+        raise MissingInputs(missing)
+    present = [f for f in files if os.path.isfile(f.target)]
+    todo = [f for f in files if not os.path.isfile(f.target)]
+    errors = []
+    if verify_present:
+        for item in present:
+            if item.sha256 is not None:
+                if file_checksum(item.target) != item.sha256.lower():
+                    errors.append(
+                        ChecksumError(
+                            "Checksum of '{0}' does not match.".format(
+                                item.target
+                            )
+                        )
+                    )
+    logging.info(
+        "Prefetch %d files from '%s' (%d present).",
+        len(todo),
+        mirror,
+        len(present),
+    )
+    results = asyncio.run(_copy_all(todo, mirror, workers)) if todo else []
+    copied = []
+    for result in results:
+        if isinstance(result, Exception):
+            errors.append(result)
+        else:
+            copied.append(result)
+    if errors:
+        for error in errors[1:]:
+            logging.error(str(error))
+        raise errors[0]
+    return {"copied": copied, "present": [f.target for f in present]}
@@ -0,0 +1,307 @@
+"""Opt-in timing and memory instrumentation of the scenario builders.
+
+The builders and their major sub-steps are wrapped with :func:`timed` or
+:func:`stage`. As long as the instrumentation is disabled (default) the
+wrappers only check one global flag. If it is enabled, the wall time, CPU
+time, the increase of the peak resident set size and the size of the
+produced tables are recorded for every stage.
+
+Examples
+--------
+>>> import pandas as pd
+>>> with recording():
+...     with stage("outer"):
+...         with stage("inner") as st:
+...             _ = st.frame(pd.DataFrame(index=range(8760), columns=["a"]))
+>>> [(r.name, r.depth, r.rows, r.columns) for r in records()]
+[('inner', 1, 8760, 1), ('outer', 0, None, None)]
+>>> sorted(summary().index)
+['inner', 'outer']
+>>> trace = to_chrome_trace()
+>>> trace["traceEvents"][0]["ph"]
+'X'
+>>> reset()
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_ENABLED = False
+_RECORDS = []
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_START = time.perf_counter()
+
+
+class StageRecord:
+    """Measured values of one finished stage."""
+
+    __slots__ = (
+        "name",
+        "parent",
+        "depth",
+        "start",
+        "wall",
+        "cpu",
+        "rss_delta",
+        "rows",
+        "columns",
+        "tables",
+        "pid",
+        "tid",
+    )
+
+    def __init__(self, name, parent, depth):
+        self.name = name
+        self.parent = parent
+        self.depth = depth
+        self.start = None
+        self.wall = None
+        self.cpu = None
+        self.rss_delta = None
+        self.rows = None
+        self.columns = None
+        self.tables = None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+    def frame(self, result):
+        """Record the number of rows/columns of a table or table collection.
+
+        The result is returned unchanged.
+        """
+        if isinstance(result, (pd.DataFrame, pd.Series)):
+            self.rows = result.shape[0]
+            self.columns = result.shape[1] if result.ndim > 1 else 1
+        elif isinstance(result, dict):
+            shapes = {
+                str(k): list(v.shape)
+                for k, v in result.items()
+                if isinstance(v, (pd.DataFrame, pd.Series))
+            }
+            if shapes:
+                self.tables = shapes
+                self.rows = sum(s[0] for s in shapes.values())
+                self.columns = sum(
+                    s[1] if len(s) > 1 else 1 for s in shapes.values()
+                )
+        return result
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class _NoStage:
+    """Stand-in for a StageRecord if the instrumentation is disabled."""
+
+    @staticmethod
+    def frame(result):
+        return result
+
+
+_NO_STAGE = _NoStage()
+
+
+class _NoOpContext:
+    def __enter__(self):
+        return _NO_STAGE
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_OP = _NoOpContext()
+
+
+def _max_rss():
+    """Peak resident set size of the process in bytes (None if unknown)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kilobytes elsewhere
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _stack():
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+@contextmanager
+def _stage(name):
+    stack = _stack()
+    record = StageRecord(name, stack[-1].name if stack else None, len(stack))
+    stack.append(record)
+    rss = _max_rss()
+    cpu = time.process_time()
+    record.start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.wall = time.perf_counter() - record.start
+        record.cpu = time.process_time() - cpu
+        if rss is not None:
+            record.rss_delta = _max_rss() - rss
+        stack.pop()
+        with _LOCK:
+            _RECORDS.append(record)
+
+
+def stage(name):
+    """Context manager to measure a (sub-)stage of a builder.
+
+    The returned object has a ``frame()`` method to record the size of the
+    table produced by the stage.
+    """
+    if not _ENABLED:
+        return _NO_OP
+    return _stage(name)
+
+
+def timed(name=None):
+    """Decorator to measure a builder function as stage.
+
+    The size of the returned table (or dictionary of tables) is recorded.
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _stage(stage_name) as record:
+                return record.frame(func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def enable():
+    """Start recording stages."""
+    global _ENABLED
+    _ENABLED = True
+
+
+def disable():
+    """Stop recording stages. Existing records are kept."""
+    global _ENABLED
+    _ENABLED = False
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def reset():
+    """Remove all records."""
+    with _LOCK:
+        del _RECORDS[:]
+
+
+@contextmanager
+def recording():
+    """Enable the instrumentation within a with-block."""
+    was_enabled = _ENABLED
+    enable()
+    try:
+        yield
+    finally:
+        if not was_enabled:
+            disable()
+
+
+def records():
+    """Return a copy of the list of all finished stages."""
+    with _LOCK:
+        return list(_RECORDS)
+
+
+def summary():
+    """Return a table with the sum of all measured values per stage.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    columns = ["calls", "wall [s]", "cpu [s]", "rss delta [MiB]", "rows"]
+    columns += ["columns"]
+    recs = records()
+    if not recs:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame([r.to_dict() for r in recs])
+    df["rss_delta"] = df["rss_delta"].astype(float) / 2 ** 20
+    table = df.groupby("name", sort=False).agg(
+        calls=("name", "size"),
+        wall=("wall", "sum"),
+        cpu=("cpu", "sum"),
+        rss_delta=("rss_delta", "max"),
+        rows=("rows", "max"),
+        columns=("columns", "max"),
+    )
+    table.columns = columns
+    return table.sort_values("wall [s]", ascending=False)
+
+
+def to_chrome_trace(filename=None):
+    """Export all records in the Chrome trace-event format.
+
+    The file can be opened with chrome://tracing or https://ui.perfetto.dev.
+
+    Parameters
+    ----------
+    filename : str or None
+        The trace is written to this file if given.
+
+    Returns
+    -------
+    dict
+    """
+    events = []
+    for r in records():
+        args = {"cpu [s]": r.cpu, "rss delta [bytes]": r.rss_delta}
+        if r.rows is not None:
+            args["rows"] = r.rows
+            args["columns"] = r.columns
+        if r.tables is not None:
+            args["tables"] = r.tables
+        events.append(
+            {
+                "name": r.name,
+                "cat": "scenario_builder",
+                "ph": "X",
+                "ts": (r.start - _START) * 1e6,
+                "dur": r.wall * 1e6,
+                "pid": r.pid,
+                "tid": r.tid,
+                "args": args,
+            }
+        )
+    trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+    if filename is not None:
+        with open(filename, "w") as f:
+            json.dump(trace, f)
+    return trace
@@ -0,0 +1,222 @@
+"""Project a base scenario to future years with growth factors.
+
+The growth factors are given per region, fuel and target year for three
+quantities:
+
+capacity
+    Column "capacity" of the tables "power plants" and "volatile plants"
+    and the table "capacity series".
+demand
+    The tables "electricity demand series", "heat demand series" and
+    "mobility demand series" (the fuel is the second column level, e.g.
+    "all" for electricity).
+costs
+    Column "costs" of the table "commodity sources".
+
+A factor table has the index (region, fuel) and one column per year or the
+columns "region", "fuel", "year" and "factor" (long format). The region or
+the fuel "*" applies to all regions or fuels without an own factor, all
+other rows keep their values (factor 1). Years between two given years are
+interpolated linearly.
+
+All target years are computed at once: the factors of a table form a matrix
+(rows x years) that is broadcast against the values of the table. Tables
+without factors are shared with the base collection.
+
+Examples
+--------
+>>> import pandas as pd
+>>> base = {
+...     "general": pd.Series({"year": 2020, "name": "de_2020",
+...                           "weather year": 2020, "map": "de"}),
+...     "volatile plants": pd.DataFrame(
+...         {"capacity": [100.0, 50.0]},
+...         index=pd.MultiIndex.from_tuples([("DE01", "wind"),
+...                                          ("DE01", "solar")])),
+... }
+>>> capacity = pd.DataFrame({"region": "*", "fuel": "wind",
+...     "year": [2030, 2050], "factor": [2.0, 4.0]})
+>>> futures = project(base, [2030, 2040, 2050], capacity=capacity)
+>>> [futures[y]["volatile plants"]["capacity"].tolist() for y in futures]
+[[200.0, 50.0], [300.0, 50.0], [400.0, 50.0]]
+>>> futures[2040]["general"]["name"]
+'de_2040_weather2020'
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import numpy as np
+import pandas as pd
+
+from scenario_builder import profiling
+
+# {quantity: [(table, column or None for all columns of a series table)]}
+TABLES = {
+    "capacity": [
+        ("power plants", "capacity"),
+        ("volatile plants", "capacity"),
+        ("capacity series", None),
+    ],
+    "demand": [
+        ("electricity demand series", None),
+        ("heat demand series", None),
+        ("mobility demand series", None),
+    ],
+    "costs": [("commodity sources", "costs")],
+}
+
+ALL = "*"
+
+
+def growth_factors(factors, years):
+    """Return the factors as table (region, fuel) x target years.
+
+    Parameters
+    ----------
+    factors : pandas.DataFrame
+        Wide (index: region, fuel; columns: years) or long format (columns:
+        region, fuel, year, factor).
+    years : list
+        Target years.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    Raises
+    ------
+    ValueError
+        If a target year is outside of the given years.
+    """
+    if {"region", "fuel", "year", "factor"}.issubset(factors.columns):
+        factors = factors.pivot_table(
+            index=["region", "fuel"],
+            columns="year",
+            values="factor",
+            aggfunc="last",
+        )
+    factors = factors.astype(float)
+    factors.columns = factors.columns.astype(int)
+    given = factors.columns
+    outside = [y for y in years if not given.min() <= y <= given.max()]
+    if outside:
+        raise ValueError(
+            "No growth factors for the years {0} (given: {1}).".format(
+                outside, list(given)
+            )
+        )
+    by_year = factors.T.sort_index()
+    by_year = by_year.reindex(by_year.index.union(years))
+    by_year = by_year.interpolate(method="index", limit_area="inside")
+    return by_year.loc[list(years)].T
+
+
+def factor_matrix(factors, regions, fuels):
+    """Factors (rows x years) for the given regions and fuels.
+
+    The exact (region, fuel) is used first, then (region, "*"), ("*",
+    fuel) and ("*", "*"). Missing factors are 1.
+    """
+    regions = np.asarray(regions, dtype=object)
+    fuels = np.asarray(fuels, dtype=object)
+    everywhere = np.full(len(regions), ALL, dtype=object)
+    matrix = None
+    for keys in (
+        (regions, fuels),
+        (regions, everywhere),
+        (everywhere, fuels),
+        (everywhere, everywhere),
+    ):
+        values = factors.reindex(pd.MultiIndex.from_arrays(keys)).to_numpy()
+        if matrix is None:
+            matrix = values
+        else:
+            matrix = np.where(np.isnan(matrix), values, matrix)
+    return np.nan_to_num(matrix, nan=1.0)
+
+
+def _row_keys(table):
+    regions = table.index.get_level_values(0)
+    if "fuel" in table.columns:
+        return regions, table["fuel"].to_numpy()
+    return regions, table.index.get_level_values(-1)
+
+
+def _project_column(table, column, factors):
+    """The table for every target year with a scaled column."""
+    matrix = factor_matrix(factors, *_row_keys(table))
+    values = table[column].to_numpy(dtype=float)[:, None] * matrix
+    return [
+        table.assign(**{column: values[:, n]})
+        for n in range(len(factors.columns))
+    ]
+
+
+def _project_series(table, factors):
+    """The series table for every target year (columns: region, fuel)."""
+    if table.columns.nlevels > 1:
+        keys = (
+            table.columns.get_level_values(0),
+            table.columns.get_level_values(1),
+        )
+    else:
+        keys = (np.full(table.shape[1], ALL, dtype=object), table.columns)
+    matrix = factor_matrix(factors, *keys)
+    # (years, hours, columns) in one step
+    values = table.to_numpy(dtype=float)[None, :, :] * matrix.T[:, None, :]
+    return [
+        pd.DataFrame(values[n], index=table.index, columns=table.columns)
+        for n in range(len(factors.columns))
+    ]
+
+
+@profiling.timed()
+def project(base, years, capacity=None, demand=None, costs=None):
+    """Project a base collection to the target years.
+
+    Parameters
+    ----------
+    base : dict
+        Table collection of the base scenario. It is not changed.
+    years : list
+        Target years.
+    capacity, demand, costs : pandas.DataFrame or None
+        Growth factors (see module documentation).
+
+    Returns
+    -------
+    dict : {year: table collection}
+    """
+    years = list(years)
+    given = {"capacity": capacity, "demand": demand, "costs": costs}
+    projected = {year: dict(base) for year in years}
+    for quantity, factors in given.items():
+        if factors is None:
+            continue
+        factors = growth_factors(factors, years)
+        for name, column in TABLES[quantity]:
+            if name not in base:
+                continue
+            if column is None:
+                tables = _project_series(base[name], factors)
+            else:
+                tables = _project_column(base[name], column, factors)
+            for year, table in zip(years, tables):
+                projected[year][name] = table
+
+    general = base.get("general")
+    if general is not None:
+        for year in years:
+            new = general.copy()
+            new["base year"] = general["year"]
+            new["year"] = year
+            new["name"] = "{0}_{1}".format(general["map"], year)
+            if general["weather year"] != year:
+                new["name"] += "_weather{0}".format(general["weather year"])
+            projected[year]["general"] = new
+    return projected
@@ -0,0 +1,283 @@
+"""Frozen snapshot of the configuration used by the scenario builders.
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import configparser
+import hashlib
+import json
+from collections.abc import Mapping
+
+from reegis import config as cfg
+
+# All sections read by the scenario builders. Sections starting with one of
+# the SECTION_PREFIXES are added as well (e.g. "mobility: diesel").
+SECTIONS = (
+    "paths",
+    "powerplants",
+    "creator",
+    "general",
+    "source_names",
+    "source_groups",
+    "model_classes",
+    "fuel consumption",
+    "energy_per_liter",
+    "coastdat",
+    "offshore_regions_set",
+)
+SECTION_PREFIXES = ("mobility: ", "coast_regions: ")
+
+_UNSET = object()
+
+
+class MissingSection(configparser.NoSectionError, KeyError):
+    """Raised if a section is not part of the snapshot."""
+
+
+class MissingOption(configparser.NoOptionError, KeyError):
+    """Raised if an option is not part of a section of the snapshot."""
+
+
+class ConfigSection(Mapping):
+    """Read-only view of one config section with typed values.
+
+    Options can be accessed as items or as attributes.
+
+    Examples
+    --------
+    >>> creator = ConfigSection("creator", {"round": 1, "heat": True})
+    >>> creator.round
+    1
+    >>> creator["heat"]
+    True
+    >>> "use_CO2_costs" in creator
+    False
+    """
+
+    __slots__ = ("name", "_values")
+
+    def __init__(self, name, values):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "_values", dict(values))
+
+    def __getitem__(self, option):
+        try:
+            return self._values[option]
+        except KeyError:
+            raise MissingOption(option, self.name) from None
+
+    def __getattr__(self, option):
+        if option.startswith("_"):
+            raise AttributeError(option)
+        try:
+            return self._values[option]
+        except KeyError:
+            raise AttributeError(
+                "No option '{0}' in section: '{1}'".format(option, self.name)
+            ) from None
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSection objects are read-only.")
+
+    def __contains__(self, option):
+        return option in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return self.__class__, (self.name, self._values)
+
+    def __repr__(self):
+        return "ConfigSection({0!r}, {1!r})".format(self.name, self._values)
+
+
+class ConfigSnapshot(Mapping):
+    """Frozen, typed copy of the config sections used by the builders.
+
+    The snapshot is created once per build (see :func:`snapshot`) and passed
+    through the builders. All values are converted once, so a lookup is a
+    plain dictionary access instead of parsing the config file again. The
+    :attr:`fingerprint` is deterministic and can be used as a cache key.
+
+    Examples
+    --------
+    >>> conf = ConfigSnapshot(
+    ...     {"creator": {"round": 1, "limited_transformer": "bioenergy"},
+    ...      "mobility: diesel": {"efficiency": 0.7}})
+    >>> conf.creator.round
+    1
+    >>> conf["mobility: diesel"]["efficiency"]
+    0.7
+    >>> conf.get_list("creator", "limited_transformer")
+    ['bioenergy']
+    >>> conf.get("creator", "heat", fallback=False)
+    False
+    >>> conf.fingerprint == ConfigSnapshot(
+    ...     {"mobility: diesel": {"efficiency": 0.7},
+    ...      "creator": {"limited_transformer": "bioenergy", "round": 1}}
+    ...     ).fingerprint
+    True
+    """
+
+    __slots__ = ("_sections", "fingerprint")
+
+    def __init__(self, sections):
+        sections = {
+            name: ConfigSection(name, values)
+            for name, values in sections.items()
+        }
+        object.__setattr__(self, "_sections", sections)
+        object.__setattr__(self, "fingerprint", _fingerprint(sections))
+
+    def __getitem__(self, section):
+        try:
+            return self._sections[section]
+        except KeyError:
+            raise MissingSection(section) from None
+
+    def __getattr__(self, section):
+        if section.startswith("_"):
+            raise AttributeError(section)
+        try:
+            return self._sections[section]
+        except KeyError:
+            raise AttributeError(
+                "No section: '{0}'".format(section)
+            ) from None
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot objects are read-only.")
+
+    def __contains__(self, section):
+        return section in self._sections
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __eq__(self, other):
+        if not isinstance(other, ConfigSnapshot):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self):
+        return hash(self.fingerprint)
+
+    def __reduce__(self):
+        return self.__class__, (self.to_dict(),)
+
+    def __repr__(self):
+        return "ConfigSnapshot(<{0} sections>, fingerprint={1!r})".format(
+            len(self), self.fingerprint[:12]
+        )
+
+    def get(self, section, option=_UNSET, fallback=_UNSET):
+        """Return the value of an option in a section.
+
+        Without an option the whole section is returned. If a fallback is
+        given it is returned for missing sections or options instead of
+        raising an error.
+        """
+        try:
+            if option is _UNSET:
+                return self[section]
+            return self[section][option]
+        except KeyError:
+            if fallback is _UNSET:
+                raise
+            return fallback
+
+    def has_option(self, section, option):
+        """Returns True if the given option exists in the given section."""
+        return section in self._sections and option in self[section]
+
+    def get_list(self, section, option, sep=",", string=False):
+        """Return the value of an option as list (see reegis.config)."""
+        value = self[section][option]
+        if isinstance(value, str):
+            return [x.strip() for x in value.split(sep) if len(x) > 0]
+        if string is True:
+            return [str(value)]
+        return [value]
+
+    def get_dict(self, section):
+        """Return a section as (mutable) dictionary."""
+        return dict(self[section])
+
+    def get_dict_list(self, section, string=False):
+        """Return a section as dictionary with all values as lists."""
+        return {
+            option: self.get_list(section, option, string=string)
+            for option in self[section]
+        }
+
+    def updated(self, changes):
+        """Return a new snapshot with changed or added options.
+
+        Parameters
+        ----------
+        changes : dict
+            {section: {option: value}}
+
+        Examples
+        --------
+        >>> conf = ConfigSnapshot({"creator": {"round": 1}})
+        >>> new = conf.updated({"creator": {"compact": True}})
+        >>> new.creator.compact, "compact" in conf.creator
+        (True, False)
+        """
+        sections = self.to_dict()
+        for section, options in changes.items():
+            sections.setdefault(section, {}).update(options)
+        return ConfigSnapshot(sections)
+
+    def to_dict(self):
+        """Return the snapshot as nested dictionary."""
+        return {name: dict(sec) for name, sec in self._sections.items()}
+
+
+def _fingerprint(sections):
+    content = json.dumps(
+        {name: dict(sec) for name, sec in sections.items()},
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def snapshot(sections=SECTIONS, prefixes=SECTION_PREFIXES):
+    """Read the given sections of the reegis config into a ConfigSnapshot.
+
+    Sections that do not exist in the loaded config files are skipped.
+
+    Parameters
+    ----------
+    sections : iterable
+        Names of the sections to read.
+    prefixes : iterable
+        All sections starting with one of these prefixes are read as well.
+
+    Returns
+    -------
+    ConfigSnapshot
+    """
+    if not cfg.has_section("paths"):
+        cfg.init()
+    names = [s for s in sections if cfg.has_section(s)]
+    names += [
+        s
+        for s in cfg.cfg.sections()
+        if s not in names and s.startswith(tuple(prefixes))
+    ]
+    return ConfigSnapshot({name: cfg.get_dict(name) for name in names})
@@ -6,8 +6,11 @@ SPDX-License-Identifier: MIT
 """
 
 import pandas as pd
-from reegis import storages
 
+from scenario_builder import lazy
+from scenario_builder import profiling
+
+storages = lazy.module("reegis.storages")
 
 PARAMETER_RENAME = {
     "energy": "energy content",
@@ -19,6 +22,7 @@ PARAMETER_RENAME = {
 }
 
 
+@profiling.timed()
 def scenario_storages(regions, year, name):
     """
     Fetch storage, pump and turbine capacity and their efficiency of
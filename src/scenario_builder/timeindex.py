@@ -0,0 +1,113 @@
+"""One time index for all hourly series of a scenario.
+
+All series tables of a scenario (demand, feed-in, mobility and capacity
+series) have the hours of the year as index. The series of the weather year
+may have a different length than the scenario year (leap years). A
+:class:`Calendar` defines the number of hours of a (year, weather year)
+combination and all series builders conform their tables to it. The
+calendars are cached, so all tables of a scenario share the same index
+object and can be combined without alignment.
+
+The number of hours is the smaller number of hours of the two years. A
+series with an additional day (leap year) is truncated at the end as
+before, all other lengths are rejected.
+
+Examples
+--------
+>>> import pandas as pd
+>>> cal = get_calendar(2015, weather_year=2012)
+>>> cal.hours
+8760
+>>> series = pd.DataFrame({"DE01": range(8784)})
+>>> conformed = cal.conform(series, "volatile series")
+>>> len(conformed), conformed.index is cal.index
+(8760, True)
+>>> cal is get_calendar(2015, 2012)
+True
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import calendar
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+def hours_of_year(year):
+    """Number of hours of a year (8760 or 8784)."""
+    return 8784 if calendar.isleap(year) else 8760
+
+
+class Calendar:
+    """Hours of a scenario year and its weather year.
+
+    Use :func:`get_calendar` to get the shared instance.
+    """
+
+    def __init__(self, year, weather_year=None):
+        self.year = year
+        self.weather_year = year if weather_year is None else weather_year
+        self.hours = min(hours_of_year(year), hours_of_year(self.weather_year))
+        self.index = pd.RangeIndex(self.hours)
+
+    def __repr__(self):
+        return "Calendar(year={0}, weather_year={1}, hours={2})".format(
+            self.year, self.weather_year, self.hours
+        )
+
+    @property
+    def month_start_hours(self):
+        """First hour of every month and the end of the year (13 values).
+
+        The values refer to the scenario year and are limited to the hours
+        of the calendar.
+        """
+        hours = [0]
+        for month in range(1, 13):
+            hours.append(hours[-1] + calendar.monthrange(self.year, month)[1])
+        return np.minimum(np.array(hours) * 24, self.hours)
+
+    def conform(self, table, name="series"):
+        """Return the table with the index of the calendar.
+
+        The values are not copied. A table with one additional day is
+        truncated.
+
+        Parameters
+        ----------
+        table : pandas.DataFrame or pandas.Series
+        name : str
+            Name of the table in error messages.
+
+        Raises
+        ------
+        ValueError
+            If the table has another number of hours.
+        """
+        if len(table) not in (self.hours, self.hours + 24):
+            raise ValueError(
+                "The {0} has {1} hours but the scenario year {2} with the "
+                "weather year {3} has {4} hours.".format(
+                    name, len(table), self.year, self.weather_year, self.hours
+                )
+            )
+        table = table.iloc[: self.hours]
+        table.index = self.index
+        return table
+
+
+@functools.lru_cache(maxsize=None)
+def _calendar(year, weather_year):
+    return Calendar(year, weather_year)
+
+
+def get_calendar(year, weather_year=None):
+    """Return the shared calendar of a year and a weather year."""
+    return _calendar(year, year if weather_year is None else weather_year)
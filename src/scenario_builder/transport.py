@@ -0,0 +1,181 @@
+"""Hand large tables from worker processes to the parent without pickling.
+
+A worker calls :func:`share` on its table collection before returning it.
+The values of every large frame with a single numeric dtype (the demand,
+feed-in and mobility series) are copied into a block of
+:mod:`multiprocessing.shared_memory` and only the index, the columns and the
+name of the block are pickled. The parent calls :func:`receive` and gets
+DataFrames that use the shared block directly (zero-copy). The block is
+unlinked at once and the memory is freed with the last frame that uses it.
+The blocks of a collection that is not received (e.g. because another
+scenario failed) must be freed with :func:`release`.
+
+Examples
+--------
+>>> import numpy as np
+>>> import pandas as pd
+>>> tables = {"volatile series": pd.DataFrame(np.ones((8760, 20)))}
+>>> shared = share(tables)
+>>> type(shared["volatile series"]).__name__
+'SharedTable'
+>>> float(receive(shared)["volatile series"].sum().sum())
+175200.0
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Smaller tables are pickled as usual.
+MIN_BYTES = 2 ** 20
+
+
+class _Segment(shared_memory.SharedMemory):
+    """Shared memory block that stays mapped while arrays use it.
+
+    The mapping is released by the garbage collector together with the last
+    array that uses the buffer instead of an explicit close().
+    """
+
+    def __del__(self):
+        pass
+
+
+def _create(size):
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        if os.name == "posix":
+            # The block is unlinked by the receiving process. The resource
+            # tracker of the worker must not remove it when the worker ends.
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedTable:
+    """Picklable reference to the values of a DataFrame in shared memory.
+
+    The values are stored column by column, which is the layout of a
+    pandas block, so the DataFrame can be restored without a copy.
+    """
+
+    __slots__ = ("segment", "shape", "dtype", "index", "columns")
+
+    def __init__(self, table):
+        values = np.asarray(table.to_numpy()).T
+        shm = _create(max(values.nbytes, 1))
+        view = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+        view[:] = values
+        del view
+        self.segment = shm.name
+        self.shape = values.shape
+        self.dtype = values.dtype.str
+        self.index = table.index
+        self.columns = table.columns
+        shm.close()
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def restore(self):
+        """Return the DataFrame. The shared block is unlinked."""
+        segment = _Segment(name=self.segment)
+        values = np.ndarray(
+            self.shape, dtype=np.dtype(self.dtype), buffer=segment.buf
+        )
+        if os.name == "posix":
+            # The mapping stays valid without the file descriptor and after
+            # the block is unlinked.
+            os.close(segment._fd)
+            segment._fd = -1
+        segment.unlink()
+        return pd.DataFrame(
+            values.T, index=self.index, columns=self.columns, copy=False
+        )
+
+    def release(self):
+        """Unlink the shared block without restoring the DataFrame."""
+        try:
+            segment = shared_memory.SharedMemory(name=self.segment)
+        except FileNotFoundError:  # already received or released
+            return
+        segment.close()
+        segment.unlink()
+
+
+def is_shareable(table, min_bytes=MIN_BYTES):
+    """A DataFrame with one numeric dtype and at least min_bytes."""
+    if not isinstance(table, pd.DataFrame) or table.shape[1] == 0:
+        return False
+    dtypes = set(table.dtypes)
+    if len(dtypes) != 1:
+        return False
+    dtype = dtypes.pop()
+    return (
+        isinstance(dtype, np.dtype)
+        and dtype.kind in "biuf"
+        and table.memory_usage(index=False).sum() >= min_bytes
+    )
+
+
+def share(table_collection, min_bytes=MIN_BYTES):
+    """Move the values of large tables to shared memory (worker side).
+
+    Parameters
+    ----------
+    table_collection : dict
+    min_bytes : int
+        Tables with fewer bytes are returned unchanged.
+
+    Returns
+    -------
+    dict : The collection with SharedTable objects for large tables.
+    """
+    shared = {}
+    try:
+        for name, table in table_collection.items():
+            if is_shareable(table, min_bytes):
+                shared[name] = SharedTable(table)
+            else:
+                shared[name] = table
+    except BaseException:
+        release(shared)
+        raise
+    return shared
+
+
+def receive(shared_collection):
+    """Restore all shared tables of a collection (parent side).
+
+    Every shared block can only be received once.
+    """
+    return {
+        name: table.restore() if isinstance(table, SharedTable) else table
+        for name, table in shared_collection.items()
+    }
+
+
+def release(shared_collection):
+    """Unlink the shared blocks of a collection that will not be received.
+
+    Blocks that were already received or released are skipped.
+    """
+    for table in shared_collection.values():
+        if isinstance(table, SharedTable):
+            table.release()
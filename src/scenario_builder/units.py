@@ -0,0 +1,211 @@
+"""Power plant units as struct of arrays for unit-commitment models.
+
+The power plant tables of a scenario are aggregated by region and fuel. A
+:class:`UnitTable` keeps every unit instead: the capacity and efficiency are
+float32 arrays, the region and fuel are small integer codes of a lookup
+index. One million units need about 12 MB. The units are sorted by region
+and fuel, so the units of a region are a slice of the arrays (no copy).
+
+Examples
+--------
+>>> units = UnitTable.from_arrays(
+...     capacity=[100, 20, 50, 400],
+...     efficiency=[0.4, 0.35, 0.55, 0.38],
+...     region=["DE02", "DE01", "DE01", "DE02"],
+...     fuel=["lignite", "natural gas", "natural gas", "lignite"])
+>>> len(units), list(units.regions), list(units.fuels)
+(4, ['DE01', 'DE02'], ['lignite', 'natural gas'])
+>>> units.select(regions="DE02").capacity.tolist()
+[100.0, 400.0]
+>>> float(units.capacity_by().loc[("DE01", "natural gas")])
+70.0
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import numpy as np
+import pandas as pd
+
+ARRAYS = ("capacity", "efficiency", "region", "fuel")
+
+
+def _code_dtype(n):
+    return np.int16 if n < 2 ** 15 else np.int32
+
+
+class UnitTable:
+    """Capacity, efficiency, region and fuel of single units.
+
+    Use :meth:`from_arrays` or :meth:`from_frame` to create a table. The
+    arrays must not be changed, because slices share their memory.
+
+    Attributes
+    ----------
+    capacity, efficiency : numpy.ndarray
+        float32 per unit (efficiency NaN if unknown).
+    region, fuel : numpy.ndarray
+        Integer codes per unit.
+    regions, fuels : pandas.Index
+        Names of the codes.
+    """
+
+    def __init__(self, capacity, efficiency, region, fuel, regions, fuels):
+        self.capacity = capacity
+        self.efficiency = efficiency
+        self.region = region
+        self.fuel = fuel
+        self.regions = regions
+        self.fuels = fuels
+        self._offsets = np.searchsorted(region, np.arange(len(regions) + 1))
+
+    def __len__(self):
+        return len(self.capacity)
+
+    def __repr__(self):
+        return "UnitTable({0} units, {1} regions, {2} fuels)".format(
+            len(self), len(self.regions), len(self.fuels)
+        )
+
+    @classmethod
+    def from_arrays(cls, capacity, efficiency, region, fuel):
+        """Create a table from arrays with the region and fuel names."""
+        region_codes, regions = pd.factorize(np.asarray(region), sort=True)
+        fuel_codes, fuels = pd.factorize(np.asarray(fuel), sort=True)
+        order = np.lexsort((fuel_codes, region_codes))
+        return cls(
+            np.asarray(capacity, dtype=np.float32)[order],
+            np.asarray(efficiency, dtype=np.float32)[order],
+            region_codes.astype(_code_dtype(len(regions)))[order],
+            fuel_codes.astype(_code_dtype(len(fuels)))[order],
+            pd.Index(regions),
+            pd.Index(fuels),
+        )
+
+    @classmethod
+    def from_frame(cls, table):
+        """Create a table from a frame with the columns of :data:`ARRAYS`
+        (e.g. written by :meth:`to_frame`)."""
+        return cls.from_arrays(*[table[column] for column in ARRAYS])
+
+    @classmethod
+    def concat(cls, tables):
+        """Join tables with different lookup indexes."""
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.from_arrays([], [], [], [])
+        regions = tables[0].regions
+        fuels = tables[0].fuels
+        for table in tables[1:]:
+            regions = regions.union(table.regions)
+            fuels = fuels.union(table.fuels)
+        region = np.concatenate(
+            [regions.get_indexer(t.regions)[t.region] for t in tables]
+        )
+        fuel = np.concatenate(
+            [fuels.get_indexer(t.fuels)[t.fuel] for t in tables]
+        )
+        order = np.lexsort((fuel, region))
+        return cls(
+            np.concatenate([t.capacity for t in tables])[order],
+            np.concatenate([t.efficiency for t in tables])[order],
+            region.astype(_code_dtype(len(regions)))[order],
+            fuel.astype(_code_dtype(len(fuels)))[order],
+            regions,
+            fuels,
+        )
+
+    @property
+    def nbytes(self):
+        """Memory of the arrays in bytes."""
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def _subset(self, rows):
+        return UnitTable(
+            self.capacity[rows],
+            self.efficiency[rows],
+            self.region[rows],
+            self.fuel[rows],
+            self.regions,
+            self.fuels,
+        )
+
+    def select(self, regions=None, fuels=None):
+        """Units of some regions and/or fuels.
+
+        A single region is a slice of the arrays (no copy), all other
+        selections are copies.
+
+        Parameters
+        ----------
+        regions, fuels : str or list or None
+            Names of the regions or fuels. All if None.
+        """
+        table = self
+        if regions is not None:
+            if isinstance(regions, str):
+                code = self.regions.get_loc(regions)
+                table = self._subset(
+                    slice(self._offsets[code], self._offsets[code + 1])
+                )
+            else:
+                codes = self.regions.get_indexer(regions)
+                table = self._subset(np.isin(self.region, codes[codes >= 0]))
+        if fuels is not None:
+            codes = self.fuels.get_indexer(np.atleast_1d(fuels))
+            table = table._subset(np.isin(table.fuel, codes[codes >= 0]))
+        return table
+
+    def capacity_by(self):
+        """Total capacity per (region, fuel)."""
+        n_fuels = len(self.fuels)
+        total = np.bincount(
+            self.region.astype(np.int64) * n_fuels + self.fuel,
+            weights=self.capacity,
+            minlength=len(self.regions) * n_fuels,
+        )
+        return pd.Series(
+            total,
+            index=pd.MultiIndex.from_product([self.regions, self.fuels]),
+        ).loc[lambda s: s > 0]
+
+    def to_frame(self):
+        """The units as table with categorical region and fuel columns.
+
+        Parquet and Feather store the categorical columns as dictionaries,
+        so the written table keeps the compact layout.
+        """
+        return pd.DataFrame(
+            {
+                "capacity": self.capacity,
+                "efficiency": self.efficiency,
+                "region": pd.Categorical.from_codes(self.region, self.regions),
+                "fuel": pd.Categorical.from_codes(self.fuel, self.fuels),
+            }
+        )
+
+    def save(self, filename):
+        """Store the arrays and lookup indexes in a npz file."""
+        np.savez(
+            filename,
+            regions=self.regions.to_numpy(dtype=str),
+            fuels=self.fuels.to_numpy(dtype=str),
+            **{name: getattr(self, name) for name in ARRAYS}
+        )
+
+    @classmethod
+    def load(cls, filename):
+        """Load a table of :meth:`save`."""
+        with np.load(filename) as arrays:
+            return cls(
+                arrays["capacity"],
+                arrays["efficiency"],
+                arrays["region"],
+                arrays["fuel"],
+                pd.Index(arrays["regions"].tolist()),
+                pd.Index(arrays["fuels"].tolist()),
+            )
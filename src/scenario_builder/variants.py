@@ -0,0 +1,199 @@
+"""Derive scenario variants from a base table collection.
+
+A variant is declared by overrides of a few values. All tables that are not
+touched by an override are shared with the base collection. A touched table
+is copied shallowly and only the changed column is replaced, so the base
+collection is never changed and a sweep over hundreds of variants needs
+little more time and memory than the base scenario.
+
+Available overrides:
+
+co2_price : float or dict
+    CO2 price of all commodity sources or {fuel: price}.
+commodity_costs : dict
+    {fuel: costs} of the commodity sources.
+capacity_scaling : dict
+    {fuel: factor} for the capacity of power plants and volatile plants.
+limit_elec_pp : dict
+    {fuel: limit} for the electricity output of all power plants of a fuel.
+    The limit is distributed by the capacity of the plants.
+
+Examples
+--------
+>>> import pandas as pd
+>>> base = {
+...     "commodity sources": pd.DataFrame(
+...         {"costs": [10.0, 20.0], "emission": [300.0, 200.0]},
+...         index=pd.MultiIndex.from_product([["DE"], ["lignite", "oil"]])),
+...     "volatile series": pd.DataFrame({"DE01": [0.1, 0.2]}),
+... }
+>>> variants = sweep(base, co2_price=[10, 20, 30])
+>>> [float(v["commodity sources"].loc[("DE", "oil"), "co2_price"])
+...  for _, v in variants]
+[10.0, 20.0, 30.0]
+>>> variants[0][1]["volatile series"] is base["volatile series"]
+True
+>>> "co2_price" in base["commodity sources"]
+False
+
+SPDX-FileCopyrightText: 2016-2021 Uwe Krien <krien@uni-bremen.de>
+
+SPDX-License-Identifier: MIT
+"""
+__copyright__ = "Uwe Krien <krien@uni-bremen.de>"
+__license__ = "MIT"
+
+
+import itertools
+
+import pandas as pd
+
+
+def _copy_on_write():
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return bool(getattr(pd.options.mode, "copy_on_write", False))
+
+
+def _copy(table):
+    """Copy a table that is going to be changed.
+
+    With copy-on-write (pandas >= 3) the copy shares all columns with the
+    original until one is replaced. Otherwise the (small) table is copied.
+    """
+    return table.copy(deep=not _copy_on_write())
+
+
+def _fuel_mask(table, fuels):
+    """Rows of a table that belong to the given fuels."""
+    if "fuel" in table.columns:
+        return table["fuel"].isin(list(fuels))
+    return table.index.get_level_values(-1).isin(list(fuels))
+
+
+def _set_by_fuel(table, column, values, default=None):
+    """Return a copy of the table with values per fuel in one column."""
+    table = _copy(table)
+    if column in table.columns:
+        new = table[column].copy()
+    else:
+        new = pd.Series(default, index=table.index, dtype=float)
+    fuels = (
+        table["fuel"]
+        if "fuel" in table.columns
+        else pd.Series(table.index.get_level_values(-1), index=table.index)
+    )
+    mapped = fuels.map(values)
+    new = new.where(mapped.isnull(), mapped).astype(float)
+    table[column] = new
+    return table
+
+
+def _co2_price(tables, value):
+    if not isinstance(value, dict):
+        table = _copy(tables["commodity sources"])
+        table["co2_price"] = float(value)
+        tables["commodity sources"] = table
+    else:
+        tables["commodity sources"] = _set_by_fuel(
+            tables["commodity sources"], "co2_price", value, default=0.0
+        )
+
+
+def _commodity_costs(tables, value):
+    tables["commodity sources"] = _set_by_fuel(
+        tables["commodity sources"], "costs", value
+    )
+
+
+def _capacity_scaling(tables, value):
+    for name in ("power plants", "volatile plants"):
+        if name not in tables:
+            continue
+        table = _copy(tables[name])
+        factor = pd.Series(1.0, index=table.index)
+        for fuel, fuel_factor in value.items():
+            factor[_fuel_mask(table, [fuel])] = fuel_factor
+        table["capacity"] = table["capacity"] * factor
+        tables[name] = table
+
+
+def _limit_elec_pp(tables, value):
+    table = tables["power plants"]
+    limit = pd.Series(float("inf"), index=table.index)
+    if "limit_elec_pp" in table.columns:
+        limit = table["limit_elec_pp"].astype(float)
+    for fuel, fuel_limit in value.items():
+        mask = _fuel_mask(table, [fuel])
+        capacity = table.loc[mask, "capacity"].astype(float)
+        limit = limit.copy()
+        limit[mask] = capacity.div(capacity.sum()).multiply(fuel_limit)
+    table = _copy(table)
+    table["limit_elec_pp"] = limit
+    tables["power plants"] = table
+
+
+OVERRIDES = {
+    "co2_price": _co2_price,
+    "commodity_costs": _commodity_costs,
+    "capacity_scaling": _capacity_scaling,
+    "limit_elec_pp": _limit_elec_pp,
+}
+
+
+def derive(base, name=None, **overrides):
+    """Return a variant of a table collection.
+
+    Parameters
+    ----------
+    base : dict
+        Table collection of the base scenario. It is not changed.
+    name : str or None
+        Name of the variant in the table "general".
+    overrides
+        See module documentation.
+
+    Returns
+    -------
+    dict
+    """
+    unknown = set(overrides) - set(OVERRIDES)
+    if unknown:
+        raise ValueError(
+            "Unknown overrides: {0}. Use {1}.".format(
+                sorted(unknown), sorted(OVERRIDES)
+            )
+        )
+    tables = dict(base)
+    for key, value in overrides.items():
+        OVERRIDES[key](tables, value)
+    if "general" in tables:
+        general = _copy(tables["general"])
+        for key, value in overrides.items():
+            general["variant " + key] = str(value)
+        if name is not None:
+            general["name"] = name
+        tables["general"] = general
+    return tables
+
+
+def sweep(base, **grid):
+    """Return the variants of all combinations of the given override values.
+
+    Parameters
+    ----------
+    base : dict
+        Table collection of the base scenario.
+    grid
+        {override: list of values}, e.g. co2_price=[10, 20, 30]
+
+    Returns
+    -------
+    list : [(overrides, table collection), ...]
+    """
+    keys = list(grid)
+    result = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        overrides = dict(zip(keys, values))
+        result.append((overrides, derive(base, **overrides)))
+    return result
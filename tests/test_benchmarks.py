@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks")
+
+
+def test_offline_benchmarks_federal_states(tmpdir):
+    # The fake reegis package must not be mixed with the real one, so the
+    # benchmarks are run in a separate process.
+    fn = os.path.join(str(tmpdir), "results.csv")
+    trace_fn = os.path.join(str(tmpdir), "trace.json")
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS, "run_benchmarks.py"),
+            "--sizes",
+            "federal_states",
+            "--repeat",
+            "1",
+            "--no-memory",
+            "--output",
+            fn,
+            "--trace",
+            trace_fn,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    with open(fn) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 9
+    assert lines[1].startswith("federal_states,get_deflex_pp_by_year")
+    with open(trace_fn) as f:
+        events = json.load(f)["traceEvents"]
+    assert "chp_table" in {e["name"] for e in events}
+
+
+def test_builders_defer_heavy_imports():
+    sys.path.insert(0, BENCHMARKS)
+    try:
+        import import_time
+    finally:
+        sys.path.remove(BENCHMARKS)
+    for module in ("scenario_builder.powerplants", "scenario_builder.demand"):
+        loaded = import_time.import_time(module, repeat=1)[1]
+        assert loaded in ([], ["reegis.config"])
@@ -0,0 +1,324 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from scenario_builder import collection
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks")
+
+# The fake reegis package must not be mixed with the real one, so the build
+# is run in a separate process.
+SCRIPT = """
+import sys
+sys.path.insert(0, {benchmarks!r})
+import fake_reegis
+fake_reegis.install({path!r})
+from scenario_builder import cli
+sys.exit(cli.main({argv!r}))
+"""
+
+
+def run_cli(path, *argv):
+    script = SCRIPT.format(
+        benchmarks=BENCHMARKS,
+        path=os.path.join(path, "data"),
+        argv=list(argv),
+    )
+    return subprocess.run(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+
+
+def test_build_scenario_matrix(tmpdir):
+    out = os.path.join(str(tmpdir), "out")
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "2015",
+        "--maps",
+        "federal_states",
+        "--weather-years",
+        "2012",
+        "--workers",
+        "2",
+        "--output",
+        out,
+    )
+    assert result.returncode == 0
+    assert sorted(os.listdir(out)) == [
+        "federal_states_2014_weather2012",
+        "federal_states_2015_weather2012",
+    ]
+    scenario = os.path.join(out, "federal_states_2015_weather2012")
+    assert "heat-chp plants.csv" in os.listdir(scenario)
+    general = pd.read_csv(os.path.join(scenario, "general.csv"), index_col=0)
+    assert general.loc["weather year", "value"] == "2012"
+
+
+def test_build_unknown_map_fails(tmpdir):
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "--maps",
+        "no_such_map",
+        "--output",
+        str(tmpdir),
+    )
+    assert result.returncode != 0
+
+
+def test_build_streams_parquet_tables(tmpdir):
+    pytest.importorskip("pyarrow")
+    out = os.path.join(str(tmpdir), "out")
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "--maps",
+        "federal_states",
+        "--format",
+        "parquet",
+        "--output",
+        out,
+    )
+    assert result.returncode == 0
+    stored = collection.read_collection(
+        os.path.join(out, "federal_states_2014")
+    )
+    assert stored.manifest["complete"] is True
+    assert len(stored) == 11
+    assert stored.shape("volatile series")[0] == 8760
+
+
+def test_build_compact_mode(tmpdir):
+    pytest.importorskip("pyarrow")
+    out = os.path.join(str(tmpdir), "out")
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "--maps",
+        "federal_states",
+        "--format",
+        "feather",
+        "--compact",
+        "--output",
+        out,
+    )
+    assert result.returncode == 0
+    stored = collection.read_collection(
+        os.path.join(out, "federal_states_2014")
+    )
+    assert set(stored["volatile series"].dtypes.astype(str)) == {"float32"}
+    assert stored["power plants"]["fuel"].dtype == "category"
+    assert stored["mobility demand series"].dtypes.iloc[0].itemsize < 8
+
+
+def test_build_representative_weeks(tmpdir):
+    out = os.path.join(str(tmpdir), "out")
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "--maps",
+        "federal_states",
+        "--representative-periods",
+        "4",
+        "--period",
+        "week",
+        "--output",
+        out,
+    )
+    assert result.returncode == 0
+    scenario = os.path.join(out, "federal_states_2014")
+    feedin = pd.read_csv(os.path.join(scenario, "volatile series.csv"))
+    assert len(feedin) == 4 * 168 + 1  # second header row
+    weights = pd.read_csv(
+        os.path.join(scenario, "representative periods.csv")
+    )["weight"]
+    assert round(weights.sum(), 6) == round(8760 / 168, 6)
+
+
+def test_build_capacity_series(tmpdir):
+    pytest.importorskip("pyarrow")
+    out = os.path.join(str(tmpdir), "out")
+    result = run_cli(
+        str(tmpdir),
+        "build",
+        "--years",
+        "2014",
+        "--maps",
+        "federal_states",
+        "--format",
+        "parquet",
+        "--capacity-series",
+        "--output",
+        out,
+    )
+    assert result.returncode == 0
+    stored = collection.read_collection(
+        os.path.join(out, "federal_states_2014")
+    )
+    series = stored["capacity series"]
+    assert series.shape[0] == 8760
+    # The mean of the hourly series is close to the annual capacity, which
+    # counts months instead of hours.
+    volatile = stored["volatile plants"]["capacity"].groupby(level=1).sum()
+    mean = series.mean().groupby(level="fuel").sum()
+    for fuel, capacity in volatile.items():
+        assert mean[fuel] == pytest.approx(capacity, rel=0.01)
+
+
+def test_build_resume_loads_checkpoints(tmpdir):
+    out = os.path.join(str(tmpdir), "out")
+    argv = ["build", "--years", "2014", "--maps", "federal_states"]
+    argv += ["--output", out, "--resume"]
+    assert run_cli(str(tmpdir), *argv).returncode == 0
+    run = os.path.join(out, ".run", "federal_states_2014")
+    assert "chp.json" in os.listdir(run)
+
+    # A stage with the same fingerprint is loaded, not computed.
+    marker = pd.DataFrame({"marker": [1.0]})
+    marker.to_pickle(os.path.join(run, "storages.pkl"))
+    assert run_cli(str(tmpdir), *argv).returncode == 0
+    storages = pd.read_csv(
+        os.path.join(out, "federal_states_2014", "storages.csv")
+    )
+    assert storages.columns.tolist() == ["Unnamed: 0", "marker"]
+
+
+# Count the reads of the load file in all processes of the build.
+COUNT_SCRIPT = """
+import sys
+sys.path.insert(0, {benchmarks!r})
+import fake_reegis
+fake_reegis.install({path!r})
+import pandas as pd
+from scenario_builder import build, checkpoint
+
+# The load file is created (and read) by reegis before the build.
+build.demand.entsoe_load_file(2013)
+read_hdf = pd.read_hdf
+
+
+def counted_read_hdf(path, key=None, *args, **kwargs):
+    if key == "entsoe":
+        with open({count!r}, "a") as f:
+            f.write("read\\n")
+    return read_hdf(path, key, *args, **kwargs)
+
+
+pd.read_hdf = counted_read_hdf
+scenarios = build.scenario_grid([2012, 2013, 2014, 2015], ["federal_states"])
+for n in range(2):
+    run = checkpoint.RunDirectory({run!r}, resume=True)
+    results = build.build_matrix(
+        scenarios, {out!r}, workers=2, checkpoints=run
+    )
+    if any(isinstance(r, Exception) for r in results.values()):
+        sys.exit(1)
+    with open({count!r}, "a") as f:
+        f.write("built\\n")
+"""
+
+
+def test_build_matrix_reads_the_load_file_once_per_worker(tmpdir):
+    count = os.path.join(str(tmpdir), "count.txt")
+    script = COUNT_SCRIPT.format(
+        benchmarks=BENCHMARKS,
+        path=os.path.join(str(tmpdir), "data"),
+        count=count,
+        run=os.path.join(str(tmpdir), "run"),
+        out=os.path.join(str(tmpdir), "out"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], stderr=subprocess.DEVNULL
+    )
+    assert result.returncode == 0
+    with open(count) as f:
+        lines = f.read().split()
+    # The resumed build loads the demand stages and does not read the file.
+    assert lines[-2:] == ["built", "built"]
+    assert 1 <= lines.count("read") <= 2
+
+
+RESUME_SCRIPT = """
+import sys
+sys.path.insert(0, {benchmarks!r})
+import fake_reegis
+fake_reegis.install({path!r}, n_plants=2000)
+import pandas as pd
+from scenario_builder import build, checkpoint, mobility, settings
+
+regions = build.load_regions("federal_states")
+weights = pd.Series(1.0, index=regions.index, name="vehicles")
+weights.to_csv({csv!r})
+conf = settings.snapshot().updated(
+    {{"creator": {{"mobility_weights": {csv!r}}}}}
+)
+scenario = build.Scenario(2014, "federal_states", None)
+build.prepare_maps(["federal_states"], conf=conf)
+run = checkpoint.RunDirectory({run!r}, resume=True)
+first = build.build_scenario(scenario, conf=conf, checkpoints=run)
+
+
+def no_lookup(*args, **kwargs):
+    raise AssertionError("The weights of a loaded stage are looked up.")
+
+
+map_weights = mobility.map_weights
+mobility.map_weights = no_lookup
+build.build_scenario(scenario, conf=conf, checkpoints=run)
+mobility.map_weights = map_weights
+
+# A changed weights file is a new input of the stage.
+weights.iloc[0] = 100.0
+weights.to_csv({csv!r})
+second = build.build_scenario(scenario, conf=conf, checkpoints=run)
+region = regions.index[0]
+name = "mobility demand series"
+assert (second[name][region] > first[name][region]).all().all()
+"""
+
+
+def test_mobility_weights_are_part_of_the_stage(tmpdir):
+    script = RESUME_SCRIPT.format(
+        benchmarks=BENCHMARKS,
+        path=os.path.join(str(tmpdir), "data"),
+        csv=os.path.join(str(tmpdir), "vehicles.csv"),
+        run=os.path.join(str(tmpdir), "run"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+
+def test_parallel_build_with_run_directory(tmpdir):
+    out = os.path.join(str(tmpdir), "out")
+    argv = ["build", "--years", "2014", "2015", "--maps", "federal_states"]
+    argv += ["--workers", "2", "--output", out, "--resume"]
+    for _ in range(2):
+        assert run_cli(str(tmpdir), *argv).returncode == 0
+        assert sorted(os.listdir(out)) == [
+            ".run",
+            "federal_states_2014",
+            "federal_states_2015",
+        ]
+    maps = os.path.join(out, ".run", "maps", "federal_states")
+    assert "power_plant_table.json" in os.listdir(maps)
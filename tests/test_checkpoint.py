@@ -0,0 +1,88 @@
+import os
+from concurrent import futures
+
+import pandas as pd
+
+from scenario_builder import checkpoint
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        return pd.DataFrame({"value": [value]})
+
+
+def test_stage_is_loaded_only_with_matching_fingerprint(tmpdir):
+    run = checkpoint.RunDirectory(str(tmpdir), resume=True).scope("a/b")
+    func = Counter()
+    first = run.stage("heat demand", "key1", func, 1)
+    pd.testing.assert_frame_equal(
+        run.stage("heat demand", "key1", func, 1), first
+    )
+    assert func.calls == 1
+    assert run.fingerprint("heat demand") == "key1"
+
+    # Changed inputs
+    assert run.stage("heat demand", "key2", func, 2)["value"][0] == 2
+    assert func.calls == 2
+    assert run.fingerprint("heat demand") == "key2"
+
+    # Without resume every stage is computed again.
+    fresh = checkpoint.RunDirectory(str(tmpdir)).scope("a/b")
+    fresh.stage("heat demand", "key2", func, 2)
+    assert func.calls == 3
+
+
+def test_interrupted_checkpoint_is_ignored(tmpdir):
+    run = checkpoint.RunDirectory(str(tmpdir), resume=True)
+    func = Counter()
+    run.stage("feedin", "key", func, 1)
+    os.remove(os.path.join(str(tmpdir), "feedin.json"))
+    assert run.load("feedin", "key") == (False, None)
+    run.stage("feedin", "key", func, 1)
+    assert func.calls == 2
+    assert checkpoint.run_stage(None, "feedin", "key", func, 1) is not None
+    assert func.calls == 3
+
+
+def test_fingerprint():
+    assert checkpoint.fingerprint(1, "a") == checkpoint.fingerprint(1, "a")
+    assert checkpoint.fingerprint(1, "a") != checkpoint.fingerprint(1, "b")
+    assert checkpoint.file_fingerprint("no such file") is None
+
+
+def test_memory_cache_returns_copies_and_drops_old_entries():
+    cache = checkpoint.MemoryCache(max_mib=0.05)
+    func = Counter()
+    run = cache.scope("de21_2014")
+    table = run.stage("demand", "key", func, 1)
+    table.loc[0, "value"] = 100
+    assert run.stage("demand", "key", func, 1)["value"][0] == 1
+    assert func.calls == 1
+    assert cache.scope("de21_2015").stage("demand", "key", func, 1) is not None
+    assert func.calls == 2
+
+    for n in range(20):
+        cache.scope("big").stage(str(n), "key", lambda: bytes(10000))
+    assert cache.nbytes <= cache.max_bytes
+    run.stage("demand", "key", func, 1)
+    assert func.calls == 3
+
+
+def save_stage(path):
+    run = checkpoint.RunDirectory(path, resume=True)
+    for _ in range(20):
+        run.save("power plant table", "key", pd.DataFrame({"value": [1.0]}))
+
+
+def test_concurrent_saves_of_one_stage(tmpdir):
+    with futures.ProcessPoolExecutor(max_workers=4) as pool:
+        for job in [pool.submit(save_stage, str(tmpdir)) for _ in range(4)]:
+            job.result()
+    run = checkpoint.RunDirectory(str(tmpdir), resume=True)
+    found, table = run.load("power plant table", "key")
+    assert found and table["value"].tolist() == [1.0]
+    assert not [f for f in os.listdir(str(tmpdir)) if f.endswith(".tmp")]
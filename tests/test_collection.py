@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import collection
+
+pytest.importorskip("pyarrow")
+
+
+def table_collection():
+    index = pd.MultiIndex.from_product(
+        [["DE01", "DE02"], ["hard coal", "lignite"]]
+    )
+    power_plants = pd.DataFrame(
+        {
+            "capacity": [1.5, 2.0, 3.0, 4.0],
+            "count": np.arange(4),
+            "fuel": ["hard coal", "lignite", "hard coal", "lignite"],
+            "limit_elec_pp": [1.0, float("inf"), "inf", 2],
+            "category": pd.Categorical(["a", "b", "a", "b"]),
+        },
+        index=index,
+    )
+    series = pd.DataFrame(
+        np.random.RandomState(1).uniform(size=(48, 4)),
+        columns=pd.MultiIndex.from_product(
+            [["DE01", "DE02"], ["wind", "solar"]], names=["region", "type"]
+        ),
+    )
+    demand = pd.DataFrame(
+        {2014: np.arange(48, dtype=np.int64)},
+        index=pd.date_range(
+            "2014-01-01", periods=48, freq="h", tz="Europe/Berlin"
+        ),
+    )
+    general = pd.Series({"year": 2014, "name": "de02"}, name="value")
+    return {
+        "power plants": power_plants,
+        "volatile series": series,
+        "demand": demand,
+        "general": general,
+    }
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_round_trip(tmpdir, fmt):
+    tables = table_collection()
+    manifest = collection.write_collection(tables, str(tmpdir), fmt=fmt)
+    assert manifest["format"] == fmt
+    stored = collection.read_collection(str(tmpdir))
+    assert sorted(stored) == sorted(tables)
+    assert stored.shape("volatile series") == (48, 4)
+    for name, table in tables.items():
+        if isinstance(table, pd.Series):
+            pd.testing.assert_series_equal(stored[name], table)
+        else:
+            pd.testing.assert_frame_equal(stored[name], table)
+
+
+def test_unknown_table_and_format(tmpdir):
+    collection.write_collection(table_collection(), str(tmpdir))
+    with pytest.raises(KeyError):
+        collection.read_table(str(tmpdir), "storages")
+    with pytest.raises(ValueError):
+        collection.write_collection({}, str(tmpdir), fmt="hdf")
+
+
+def test_sink_writes_each_table_once(tmpdir):
+    tables = table_collection()
+    with collection.CollectionSink(str(tmpdir), fmt="feather") as sink:
+        sink.add("general", tables.pop("general"))
+        with pytest.raises(ValueError):
+            sink.add("general", pd.Series(dtype=float))
+        assert list(collection.read_collection(str(tmpdir))) == ["general"]
+    stored = collection.read_collection(str(tmpdir))
+    assert stored.manifest["complete"] is True
+    assert stored["general"]["name"] == "de02"
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks")
+
+# The fake reegis package must not be mixed with the real one, so the
+# service is run in a separate process.
+SCRIPT = """
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+sys.path.insert(0, {benchmarks!r})
+import fake_reegis
+fake_reegis.install({path!r}, n_plants=2000)
+import pandas as pd
+from scenario_builder import daemon
+
+httpd = daemon.server(daemon.BuildService(cache_mib=512), port=0)
+port = httpd.server_address[1]
+threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+first = daemon.request_build(2014, "federal_states", port=port)
+misses = daemon.request_status(port=port)["misses"]
+second = daemon.request_build(2014, "federal_states", port=port)
+status = daemon.request_status(port=port)
+assert status["misses"] == misses, status
+assert status["hits"] > 0, status
+assert sorted(first) == sorted(second)
+for name in first:
+    if isinstance(first[name], pd.Series):
+        pd.testing.assert_series_equal(first[name], second[name])
+    else:
+        pd.testing.assert_frame_equal(first[name], second[name])
+
+changed = daemon.request_build(
+    2014,
+    "federal_states",
+    overrides={{"creator": {{"capacity_series": True}}}},
+    output={out!r},
+    port=port,
+)
+assert "capacity series.csv" in __import__("os").listdir(changed), changed
+assert daemon.request_status(port=port)["misses"] > misses
+
+try:
+    daemon.request_build(2014, "no_map", port=port)
+except daemon.BuildError as e:
+    assert "no_map" in str(e)
+else:
+    raise AssertionError("no error")
+
+
+def status_code(request):
+    http_request = urllib.request.Request(
+        "http://127.0.0.1:{{0}}/build".format(port),
+        data=json.dumps(request).encode("utf-8"),
+    )
+    try:
+        urllib.request.urlopen(http_request)
+    except urllib.error.HTTPError as e:
+        return e.code
+    return 200
+
+
+# Invalid arguments are bad requests, a failing build is a server error.
+assert status_code({{"year": "2014", "map": "federal_states"}}) == 400
+assert status_code({{"year": 2014, "map": "de", "colour": 1}}) == 400
+assert status_code({{"year": 2014, "map": "de", "fmt": "pdf"}}) == 400
+assert status_code({{"year": 2014, "map": "no_map"}}) == 500
+httpd.shutdown()
+"""
+
+
+def test_repeated_builds_use_the_cache(tmpdir):
+    script = SCRIPT.format(
+        benchmarks=BENCHMARKS,
+        path=os.path.join(str(tmpdir), "data"),
+        out=os.path.join(str(tmpdir), "out"),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    # The failed builds are logged with the traceback.
+    assert "Build request" in result.stderr
+    assert "Traceback" in result.stderr
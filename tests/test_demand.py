@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import demand
+
+REGIONS = ["DE03", "DE01", "DE02"]
+
+
+@pytest.fixture
+def reegis_elec(tmpdir, monkeypatch):
+    """Load file, regional demand and annual demand of fake years."""
+    config = pytest.importorskip("reegis.config")
+    bmwi = pytest.importorskip("reegis.bmwi")
+    openego = pytest.importorskip("reegis.openego")
+    index = pd.date_range(
+        "2011-01-01", "2014-01-01", freq="h", tz="UTC"
+    ).tz_convert("Europe/Berlin")
+    hours = np.arange(len(index))
+    load = pd.DataFrame(
+        {"DE_load_": 60000 + 10000 * np.sin(hours / 24 * 2 * np.pi)},
+        index=index,
+    )
+    load.to_hdf(str(tmpdir.join("load.h5")), key="entsoe")
+
+    get = config.get
+    options = {
+        ("paths", "entsoe"): str(tmpdir),
+        ("entsoe", "load_file"): "load.h5",
+        ("entsoe", "timeseries_version"): "test",
+    }
+    monkeypatch.setattr(
+        config, "get", lambda s, o: options.get((s, o)) or get(s, o)
+    )
+    monkeypatch.setattr(
+        openego,
+        "get_ego_demand_by_region",
+        lambda regions, name, grouped=False: pd.Series(
+            [300.0, 100.0, 600.0], index=REGIONS
+        ),
+    )
+    monkeypatch.setattr(
+        bmwi, "get_annual_electricity_demand_bmwi", lambda year: year - 1500
+    )
+
+
+def test_batch_equals_the_profiles_of_reegis(reegis_elec):
+    demand_elec = pytest.importorskip("reegis.demand_elec")
+    scenarios = [(2011, None), (2012, None), (2013, 2012), (2012, 2011)]
+    batch = demand.elec_demand_series(None, "de", scenarios)
+    assert len(batch[(2012, None)]) == 8784
+    assert len(batch[(2013, 2012)]) == 8760
+    for year, weather_year in scenarios:
+        expected = demand_elec.get_entsoe_profile_by_region(
+            None, weather_year or year, "de", annual_demand="bmwi"
+        )
+        expected = pd.concat([expected], axis=1, keys=["all"])
+        expected = expected.swaplevel(0, 1, axis=1).sort_index(axis=1)
+        expected = expected.iloc[: len(batch[(year, weather_year)])]
+        np.testing.assert_allclose(
+            batch[(year, weather_year)].to_numpy(), expected.to_numpy()
+        )
+        assert list(batch[(year, weather_year)].columns) == list(
+            expected.columns
+        )
+    single = demand.scenario_elec_demand(
+        pd.DataFrame(), None, 2013, "de", weather_year=2012
+    )
+    pd.testing.assert_frame_equal(single, batch[(2013, 2012)])
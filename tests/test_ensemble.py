@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import ensemble
+
+
+def test_next_weather_year_is_created_in_advance():
+    started = []
+    second_started = threading.Event()
+
+    def func(weather_year):
+        started.append(weather_year)
+        if weather_year == 2002:
+            second_started.set()
+        return weather_year * 2
+
+    results = []
+    for weather_year, result in ensemble.iter_weather_years(
+        func, [2001, 2002, 2003]
+    ):
+        if weather_year == 2001:
+            # The caller still works on 2001.
+            assert second_started.wait(5)
+        results.append((weather_year, result))
+    assert results == [(2001, 4002), (2002, 4004), (2003, 4006)]
+    assert started == [2001, 2002, 2003]
+
+
+@pytest.mark.parametrize("ahead", [0, 1, 3])
+def test_early_close_stops_the_generator(ahead):
+    started = []
+
+    def func(weather_year):
+        started.append(weather_year)
+        return weather_year
+
+    generator = ensemble.iter_weather_years(func, range(20), ahead=ahead)
+    assert [next(generator) for _ in range(2)] == [(0, 0), (1, 1)]
+    generator.close()
+    assert len(started) <= 2 + ahead
+
+
+def test_running_stats():
+    rng = np.random.RandomState(1)
+    tables = {
+        year: pd.DataFrame(
+            rng.uniform(0, 10, (100, 2)),
+            columns=pd.MultiIndex.from_tuples(
+                [("DE01", "district heating"), ("DE02", "district heating")]
+            ),
+        )
+        for year in range(2001, 2006)
+    }
+    # Columns without demand are dropped by get_heat_profiles_deflex.
+    del tables[2003]["DE02", "district heating"]
+    stats = ensemble.RunningStats()
+    for year, table in tables.items():
+        stats.add(table, year)
+    with pytest.raises(ValueError, match="2001"):
+        stats.add(tables[2001], 2001)
+
+    everything = pd.concat(tables).fillna(0)
+    assert stats.count == 5
+    pd.testing.assert_series_equal(stats.sum, everything.sum())
+    pd.testing.assert_series_equal(stats.max, everything.max())
+    assert stats.totals.loc[2003, ("DE02", "district heating")] == 0
+    peaks = pd.DataFrame({y: t.max() for y, t in tables.items()}).T
+    pd.testing.assert_series_equal(
+        stats.quantile(0.9), peaks.fillna(0).quantile(0.9)
+    )
+    design = stats.design(0.9)
+    assert list(design.index) == ["max", "sum"]
+    pd.testing.assert_series_equal(
+        design.loc["sum"], everything.sum().div(5), check_names=False
+    )
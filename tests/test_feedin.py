@@ -0,0 +1,198 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import feedin
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("scipy")
+box = pytest.importorskip("shapely.geometry").box
+
+
+def grid():
+    cells = gpd.GeoDataFrame(
+        geometry=[box(x, y, x + 1, y + 1) for y in range(2) for x in range(4)],
+        index=pd.Index([1101, 1102, 1103, 1104, 1201, 1202, 1203, 1204]),
+    )
+    regions = gpd.GeoDataFrame(
+        geometry=[box(0, 0, 1.5, 2), box(1.5, 0, 4, 2)],
+        index=pd.Index(["DE01", "DE02"]),
+    )
+    return regions, cells
+
+
+def test_area_weights():
+    regions, cells = grid()
+    weights = feedin.area_weights(regions, cells).to_frame()
+    assert weights.sum(axis=1).tolist() == pytest.approx([1.0, 1.0])
+    # DE01 covers cell 1101 and half of 1102.
+    assert weights.loc["DE01", 1101] == pytest.approx(1 / 3)
+    assert weights.loc["DE01", 1102] == pytest.approx(1 / 6)
+    assert weights.loc["DE02", 1102] == pytest.approx(0.1)
+    assert weights.loc["DE01", 1104] == 0
+
+
+def test_aggregate_equals_weighted_sum(tmpdir):
+    regions, cells = grid()
+    weights = feedin.area_weights(regions, cells)
+    rng = np.random.RandomState(1)
+    cell_series = pd.DataFrame(rng.rand(8760, 8), columns=cells.index)
+    expected = pd.DataFrame(
+        {
+            region: (cell_series * row).sum(axis=1)
+            for region, row in weights.to_frame().iterrows()
+        }
+    )
+    pd.testing.assert_frame_equal(
+        weights.aggregate(cell_series), expected, check_names=False
+    )
+
+    filename = weights.save(str(tmpdir.join("weights.npz")))
+    loaded = feedin.CellWeights.load(filename)
+    pd.testing.assert_frame_equal(loaded.to_frame(), weights.to_frame())
+
+
+def test_capacity_weights():
+    pp = pd.DataFrame(
+        {
+            "deflex_region": ["DE01", "DE01", "DE01", "DE02"],
+            "coastdat2": [1101, 1101, 1102, 1102],
+            "capacity": [1.0, 2.0, 1.0, 4.0],
+        }
+    )
+    weights = feedin.capacity_weights(pp, "deflex_region").to_frame()
+    assert weights.values.tolist() == [[0.75, 0.25], [0.0, 1.0]]
+
+
+def test_map_capacity_weights_are_stored(tmpdir, monkeypatch):
+    regions, cells = grid()
+    pp = pd.DataFrame(
+        {
+            "energy_source_level_2": ["Wind", "Wind", "Solar", "Hydro"],
+            "de": ["DE01", "DE02", "DE02", "DE01"],
+            "capacity": [1.0, 2.0, 3.0, 4.0],
+            "cell": [1101, 1103, 1104, 1102],
+        }
+    )
+    joins = []
+
+    def add_regions_to_powerplants(region, column, pp=None, dump=True):
+        joins.append(column)
+        return pp.assign(**{column: pp["cell"]})
+
+    monkeypatch.setattr(
+        feedin,
+        "reegis_powerplants",
+        SimpleNamespace(add_regions_to_powerplants=add_regions_to_powerplants),
+    )
+    conf = SimpleNamespace(paths=SimpleNamespace(feedin=str(tmpdir)))
+    weights = feedin.map_capacity_weights(
+        regions, "de", pp=pp, conf=conf, cells=cells
+    )
+    assert weights["wind"].to_frame().values.tolist() == [
+        [1.0, 0.0],
+        [0.0, 1.0],
+    ]
+    assert weights["solar"].regions.tolist() == ["DE02"]
+    # The stored matrices are used without a new join.
+    loaded = feedin.map_capacity_weights(regions, "de", conf=conf)
+    assert joins == ["coastdat2"]
+    pd.testing.assert_frame_equal(
+        loaded["wind"].to_frame(), weights["wind"].to_frame()
+    )
+
+
+def test_missing_cell_series():
+    regions, cells = grid()
+    weights = feedin.area_weights(regions, cells)
+    cell_series = pd.DataFrame(np.ones((24, 7)), columns=cells.index[:-1])
+    with pytest.raises(KeyError, match="1204"):
+        weights.aggregate(cell_series)
+
+
+def test_feedin_from_weights_without_spatial_join(tmpdir, monkeypatch):
+    regions, cells = grid()
+    weights = feedin.area_weights(regions, cells)
+    options = {
+        ("paths", "feedin"): str(tmpdir.join("feedin")),
+        ("paths", "powerplants"): str(tmpdir),
+        ("feedin", "region_file_pattern"): "{year}_{type}_{name}.csv",
+        ("feedin", "geothermal_full_load_hours"): "4380",
+    }
+    monkeypatch.setattr(
+        feedin,
+        "reegis_config",
+        SimpleNamespace(get=lambda section, key: options[section, key]),
+    )
+    monkeypatch.setattr(
+        feedin,
+        "bmwi",
+        SimpleNamespace(
+            bmwi_re_energy_capacity=lambda: pd.DataFrame(
+                {("water", "energy"): [300.0]}, index=[2014]
+            )
+        ),
+    )
+    monkeypatch.setattr(
+        feedin,
+        "cell_windzones",
+        lambda conf=None: pd.Series({1101: 1.0, 1102: 2.0, 1103: 2.0}),
+    )
+    # The wind and solar series need the coastdat sets (tested above).
+    monkeypatch.setattr(feedin, "write_feedin_by_region", lambda *a, **k: None)
+
+    def scenario_feedin(year, name, weather_year=None):
+        # The files of reegis for the map are not used.
+        assert name == "de_area_weights"
+        windzones = os.path.join(str(tmpdir), "windzone_{0}.csv".format(name))
+        if not os.path.isfile(windzones):
+            raise FileNotFoundError
+        return pd.DataFrame(np.ones((8760, 2)))
+
+    def get_feedin_per_region(*args, **kwargs):
+        raise AssertionError("The regions must not be joined again.")
+
+    monkeypatch.setattr(
+        feedin,
+        "coastdat",
+        SimpleNamespace(
+            scenario_feedin=scenario_feedin,
+            get_feedin_per_region=get_feedin_per_region,
+        ),
+    )
+    pp = pd.DataFrame(
+        {
+            "energy_source_level_2": ["Hydro", "Hydro", "Wind"],
+            "technology": ["Run-of-river", "Pumped storage", "Onshore"],
+            "capacity": [100.0, 500.0, 50.0],
+            "capacity_in": [100.0, 500.0, 50.0],
+            "com_year": [1990, 1990, 1990],
+            "com_month": [1, 1, 1],
+            "decom_year": [2050, 2050, 2050],
+        }
+    )
+    feedin.scenario_feedin(regions, 2014, "de", weights=weights, pp=pp)
+
+    path = tmpdir.join("feedin", "de_area_weights", "2014")
+    hydro = pd.read_csv(
+        path.join("2014_hydro_de_area_weights.csv"), index_col=0
+    )
+    assert hydro.columns.tolist() == ["DE01", "DE02"]
+    # 300 GWh / 100 MW
+    assert hydro.sum().tolist() == pytest.approx([3000.0, 3000.0])
+    geothermal = pd.read_csv(
+        path.join("2014_geothermal_de_area_weights.csv"),
+        index_col=0,
+    )
+    assert geothermal.sum().tolist() == pytest.approx([4380.0, 4380.0])
+    windzones = pd.read_csv(
+        tmpdir.join("windzone_de_area_weights.csv"),
+        index_col=[0, 1],
+        header=None,
+    )[2]
+    assert windzones.loc["DE01"].to_dict() == pytest.approx(
+        {0.0: 1 / 2, 1.0: 1 / 3, 2.0: 1 / 6}
+    )
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import mobility
+from scenario_builder import settings
+
+
+def national(hours=48):
+    return pd.DataFrame(
+        np.random.RandomState(3).uniform(0, 100, (hours, 2)),
+        columns=pd.MultiIndex.from_product([["DE"], ["diesel", "petrol"]]),
+    )
+
+
+def test_regional_series_add_up_to_the_national_series():
+    series = national()
+    weights = pd.Series({"DE01": 2.0, "DE02": 5.0, "DE03": 1.0})
+    regional = mobility.disaggregate(series, weights)
+    assert list(regional.columns[:2]) == [
+        ("DE01", "diesel"),
+        ("DE01", "petrol"),
+    ]
+    total = regional.T.groupby(level=1).sum().T
+    np.testing.assert_allclose(total.to_numpy(), series.to_numpy())
+    np.testing.assert_allclose(
+        regional[("DE02", "petrol")], series[("DE", "petrol")] * 5 / 8
+    )
+
+
+def test_only_the_regional_split_is_float():
+    series = national().round().astype(int)
+    weights = pd.Series({"DE01": 1.0, "DE02": 2.0})
+    regional = mobility.disaggregate(series, weights)
+    assert (regional.dtypes == float).all()
+    total = regional.T.groupby(level=1).sum().T
+    np.testing.assert_allclose(total.to_numpy(), series.to_numpy())
+
+
+def test_weights_per_fuel():
+    weights = pd.DataFrame(
+        {"diesel": [1.0, 0.0], "petrol": [1.0, 3.0]}, index=["DE01", "DE02"]
+    )
+    regional = mobility.disaggregate(national(), weights)
+    assert (regional[("DE02", "diesel")] == 0).all()
+    with pytest.raises(ValueError, match="diesel"):
+        mobility.disaggregate(national(), weights * [0, 1])
+
+
+def test_map_weights_from_csv(tmp_path):
+    filename = tmp_path / "vehicles_{map}.csv"
+    pd.Series({"DE02": 3.0, "DE01": 1.0}, name="vehicles").to_csv(
+        str(filename).format(map="de")
+    )
+    conf = settings.ConfigSnapshot(
+        {"creator": {"mobility_weights": str(filename)}}
+    )
+    regions = pd.DataFrame(index=["DE01", "DE02", "DE03"])
+    weights = mobility.map_weights(regions, 2014, "de", conf=conf)
+    assert weights.tolist() == [1.0, 3.0, 0.0]
+    assert mobility.map_weights(regions, 2014, "de", conf=None) is None
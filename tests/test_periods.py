@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import periods
+
+
+def series(n_hours, n_columns, seed):
+    hours = np.arange(n_hours)[:, None]
+    rng = np.random.RandomState(seed)
+    values = 1.5 + np.cos(2 * np.pi * hours / n_hours) + np.sin(
+        2 * np.pi * hours / 24
+    ) * rng.uniform(0.1, 0.5, n_columns)
+    return pd.DataFrame(values)
+
+
+def test_mapping_points_to_medoid_hours():
+    tables = {
+        "electricity demand series": series(8784, 20, 1),
+        "volatile series": series(8784, 200, 2),
+        "power plants": pd.DataFrame({"capacity": [1.0]}),
+    }
+    reduced = periods.reduce_series(tables, 6, period="week")
+    assert reduced["power plants"] is tables["power plants"]
+    mapping = reduced["period mapping"]
+    rep = reduced["representative periods"]
+    assert len(reduced["volatile series"]) == 6 * 168
+    assert rep["weight"].sum() == pytest.approx(8784 / 168)
+    # The hours of a medoid period are mapped to themselves.
+    for _, row in rep.iterrows():
+        hours = np.arange(row["first hour"], row["first hour"] + 168)
+        restored = reduced["volatile series"].iloc[
+            mapping.loc[hours, "reduced hour"]
+        ]
+        np.testing.assert_array_equal(
+            restored.values, tables["volatile series"].iloc[hours].values
+        )
+
+
+def test_series_of_different_length():
+    tables = {
+        "electricity demand series": series(8760, 2, 1),
+        "heat demand series": series(8784, 2, 1),
+    }
+    with pytest.raises(ValueError):
+        periods.reduce_series(tables, 4)
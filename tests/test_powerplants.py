@@ -0,0 +1,323 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import ensemble
+from scenario_builder import powerplants
+from scenario_builder import settings
+
+
+def config(group_transformer):
+    return settings.ConfigSnapshot(
+        {
+            "source_names": {"Natural gas": "natural gas"},
+            "source_groups": {"Waste": "other"},
+            "model_classes": {
+                "Wind": "volatile plants",
+                "Solar": "volatile plants",
+                "natural gas": "power plants",
+                "Lignite": "power plants",
+                "other": "power plants",
+            },
+            "powerplants": {"remove_phes": True},
+            "creator": {
+                "group_transformer": group_transformer,
+                "round": 1,
+                "limited_transformer": "",
+                "use_variable_costs": False,
+                "use_downtime_factor": False,
+                "capacity_series": True,
+            },
+        }
+    )
+
+
+def plants(n=20000):
+    rng = np.random.RandomState(7)
+    fuels = np.array(["Wind", "Solar", "Natural gas", "Lignite", "Waste"])
+    fuel = fuels[rng.randint(0, len(fuels), n)]
+    capacity = rng.lognormal(0, 1, n)
+    efficiency = rng.uniform(0.3, 0.6, n)
+    efficiency[rng.uniform(size=n) < 0.05] = np.nan
+    com_year = rng.randint(1980, 2020, n)
+    return pd.DataFrame(
+        {
+            "energy_source_level_2": fuel,
+            "technology": np.where(
+                rng.uniform(size=n) < 0.01, "Pumped storage", "Turbine"
+            ),
+            "capacity": capacity,
+            "capacity_in": capacity / np.nan_to_num(efficiency, nan=0.4),
+            "efficiency": efficiency,
+            "com_year": com_year,
+            "com_month": rng.randint(1, 13, n),
+            "decom_year": com_year + rng.randint(10, 50, n),
+            "deflex_region": np.array(["DE01", "DE02", "DE03"])[
+                rng.randint(0, 3, n)
+            ],
+        }
+    )
+
+
+@pytest.mark.parametrize("group_transformer", [True, False])
+def test_chunked_mode_equals_in_memory_mode(tmpdir, group_transformer):
+    pytest.importorskip("pyarrow")
+    conf = config(group_transformer)
+    pp = plants()
+    store = powerplants.write_pp_store(
+        pp, str(tmpdir.join("pp.parquet")), row_group_size=3000
+    )
+
+    expected = powerplants.create_powerplants(
+        powerplants.process_pp_table(pp, conf=conf).pipe(
+            powerplants._filter_year, 2014, overwrite_capacity=True
+        ),
+        {},
+        2014,
+        conf=conf,
+    )
+    expected_series = powerplants.capacity_series(
+        powerplants.process_pp_table(pp, conf=conf), 2014, conf=conf
+    )
+
+    columns = powerplants.PP_COLUMNS + ["deflex_region"]
+    chunks = powerplants.iter_pp_chunks(store, columns=columns, chunksize=1000)
+    groups, series = powerplants.group_pp_chunks(
+        chunks, 2014, "deflex_region", conf=conf, with_capacity_series=True
+    )
+    result = powerplants.create_powerplants_from_groups(
+        groups, {}, 2014, conf=conf
+    )
+    for name in ["volatile plants", "power plants"]:
+        pd.testing.assert_frame_equal(result[name], expected[name])
+    pd.testing.assert_frame_equal(series, expected_series)
+
+
+def test_plants_without_decommissioning_year_as_in_the_annual_table():
+    conf = config(False)
+    pp = plants(100)
+    pp.loc[pp.index[:10], "decom_year"] = np.nan
+    pp = powerplants.process_pp_table(pp, conf=conf)
+    missing = pp["decom_year"].isnull()
+    assert missing.any()
+    series = powerplants.capacity_series(pp, 2014, conf=conf)
+    annual = powerplants._filter_year(pp.copy(), 2014)
+    assert annual.loc[missing, "capacity_2014"].isnull().all()
+    expected = powerplants.capacity_series(
+        pp.loc[~missing], 2014, conf=conf
+    ).reindex(columns=series.columns, fill_value=0.0)
+    pd.testing.assert_frame_equal(series, expected)
+
+
+def offshore_config(**coast_regions):
+    return settings.ConfigSnapshot(
+        {
+            "powerplants": {"remove_phes": False, "clean_offshore": True},
+            "offshore_regions_set": {"de21": "DE19, DE20, DE21"},
+            "coast_regions: de21": coast_regions,
+        }
+    )
+
+
+def test_remove_onshore_technology_from_offshore_regions():
+    rng = np.random.RandomState(3)
+    n = 5000
+    pp = pd.DataFrame(
+        {
+            "energy_source_level_2": rng.choice(
+                ["Wind", "Solar", "Bioenergy", "Lignite"], n
+            ),
+            "technology": rng.choice(["Onshore", "Offshore", "PV"], n),
+            "federal_states": rng.choice(["MV", "SH", "NI"], n),
+            "de21": rng.choice(["DE01", "DE13", "DE19", "DE20", "DE21"], n),
+        },
+        index=rng.permutation(n),
+    )
+    coast = {"MV": "DE01", "SH": "DE13", "NI": "DE14"}
+    conf = offshore_config(**coast)
+
+    # The former row by row implementation
+    expected = pp.copy()
+    for ttype in ["Solar", "Bioenergy", "Wind"]:
+        for region in ["DE19", "DE20", "DE21"]:
+            condition = (expected["energy_source_level_2"] == ttype) & (
+                expected["de21"] == region
+            )
+            if ttype == "Wind":
+                condition &= expected["technology"] == "Onshore"
+            for i, v in expected.loc[condition].iterrows():
+                expected.loc[i, "de21"] = coast[v["federal_states"]]
+
+    result = powerplants.process_pp_table(pp, conf=conf, name="de21")
+    pd.testing.assert_frame_equal(result, expected)
+    assert pp["de21"].isin(["DE19"]).any()
+
+
+def test_missing_coast_region():
+    pp = pd.DataFrame(
+        {
+            "energy_source_level_2": ["Solar"],
+            "technology": ["PV"],
+            "federal_states": ["HB"],
+            "de21": ["DE20"],
+        }
+    )
+    conf = offshore_config(SH="DE13")
+    with pytest.raises(ValueError, match="HB"):
+        powerplants.process_pp_table(pp, conf=conf, name="de21")
+    # Maps without offshore regions are not changed.
+    assert powerplants.process_pp_table(pp, conf=conf, name="de02") is pp
+
+
+def heat_balance(regions, year):
+    rng = np.random.RandomState(year)
+    heat_b = {}
+    for region in regions:
+        cb = pd.DataFrame(
+            rng.uniform(0, 1000, (2, 3)),
+            index=pd.MultiIndex.from_product(
+                [[region], ["input"], list(powerplants.CHP_ROWS.values())]
+            ),
+            columns=["bioenergy", "gas", "hard coal"],
+        )
+        cb["district heating"] = cb.sum(axis=1) * 0.01
+        cb["electricity"] = cb.sum(axis=1) * 0.01
+        cb["total"] = cb.sum(axis=1)
+        heat_b[region] = {
+            "sys_heat": 0.9,
+            "hp": 0.95,
+            "heat_chp": 0.5,
+            "elec_chp": 0.35,
+            "fuel_share": cb.div(cb["total"].sum()),
+            "out_share_factor_chp": 0.9,
+            "out_share_factor_hp": 1.1,
+        }
+    return heat_b
+
+
+def test_chp_parameters_are_cached_per_map_and_year(tmpdir, monkeypatch):
+    calls = []
+
+    def transformation_balance(regions, year, name):
+        calls.append(year)
+        return pd.DataFrame({"year": [year]})
+
+    monkeypatch.setattr(
+        powerplants,
+        "energy_balance",
+        SimpleNamespace(
+            get_transformation_balance_by_region=transformation_balance
+        ),
+    )
+    monkeypatch.setattr(
+        powerplants,
+        "powerplants",
+        SimpleNamespace(
+            calculate_chp_share_and_efficiency=lambda cb: heat_balance(
+                ["DE01", "DE02"], cb["year"].iloc[0]
+            )
+        ),
+    )
+    monkeypatch.setattr(powerplants, "_CHP_PARAMETERS", {})
+    regions = pd.DataFrame(index=["DE01", "DE02"])
+    conf = settings.ConfigSnapshot({"paths": {"powerplants": str(tmpdir)}})
+
+    chp = powerplants.chp_parameters(regions, [2014, 2013], "de02", conf)
+    assert calls == [2013, 2014]
+    assert chp.index.names == ["year", "region", "plant"]
+    assert list(chp.index.levels[0]) == [2013, 2014]
+    single = powerplants.chp_parameters_from_heat_balance(
+        heat_balance(["DE01", "DE02"], 2014)
+    )
+    pd.testing.assert_frame_equal(chp.loc[2014], single)
+
+    # In memory and on disk
+    powerplants.chp_parameters(regions, [2014], "de02", conf)
+    monkeypatch.setattr(powerplants, "_CHP_PARAMETERS", {})
+    from_disk = powerplants.chp_parameters(regions, [2013, 2014], "de02", conf)
+    assert calls == [2013, 2014]
+    pd.testing.assert_frame_equal(from_disk, chp)
+
+    # A changed map is evaluated again.
+    powerplants.chp_parameters(regions.iloc[:1], [2014], "de02", conf)
+    assert calls == [2013, 2014, 2014]
+
+
+def test_chp_table_from_parameters():
+    regions = ["DE01", "DE02"]
+    heat_b = heat_balance(regions, 2014)
+    hours = np.arange(48)
+    heat_demand = pd.DataFrame(
+        {
+            (region, "district heating"): hours * (n + 1)
+            for n, region in enumerate(regions)
+        }
+    )
+    fuels = ["bioenergy", "hard coal", "natural gas"]
+    pp = pd.DataFrame(
+        {"capacity": 1000.0, "limit_elec_pp": float("inf")},
+        index=pd.MultiIndex.from_product([regions, fuels]),
+    )
+    pp["fuel"] = pp.index.get_level_values(1)
+    tables = powerplants.chp_table(heat_b, heat_demand, {"power plants": pp})
+    chp_hp = tables["heat-chp plants"]
+    assert list(chp_hp.index.get_level_values(1).unique()) == fuels
+
+    share = heat_b["DE02"]["fuel_share"].loc["DE02", :, "Heizwerke"].iloc[0]
+    d = share["district heating"] + share["electricity"]
+    share = share["hard coal"] * (1 + d / (share["total"] - d))
+    row = chp_hp.loc[("DE02", "hard coal")]
+    assert row["capacity_hp"] == round(94 * share * 1.1 + 0.005, 2)
+    assert row["limit_hp"] == round(hours.sum() * 2 * share * 1.1 + 0.5)
+    assert row["efficiency_hp"] == round(0.9 * 0.95, 2)
+    assert row["efficiency_elec_chp"] == 0.35
+    assert (chp_hp["fuel"] == chp_hp.index.get_level_values(1)).all()
+
+    # Peak and total of an ensemble instead of the heat demand
+    stats = ensemble.RunningStats()
+    stats.add(heat_demand)
+    with_design = powerplants.chp_table(
+        heat_b, None, {"power plants": pp}, design=stats.design()
+    )
+    pd.testing.assert_frame_equal(with_design["heat-chp plants"], chp_hp)
+
+
+def test_units_add_up_to_the_aggregated_tables(tmpdir):
+    pytest.importorskip("pyarrow")
+    conf = config(True)
+    pp = powerplants.process_pp_table(plants(), conf=conf)
+    units = powerplants.scenario_units(
+        None, 2014, "deflex_region", conf=conf, pp=pp
+    )
+    tables = powerplants.scenario_powerplants(
+        {}, None, 2014, "deflex_region", conf=conf, pp=pp
+    )
+    expected = pd.concat([tables["volatile plants"], tables["power plants"]])
+    expected = expected["capacity"].astype(float).sort_index()
+    pd.testing.assert_series_equal(
+        units.capacity_by().sort_index(),
+        expected,
+        check_names=False,
+        atol=0.1,
+    )
+    assert units.capacity.dtype == np.float32
+    assert len(units) < len(pp)
+
+    store = str(tmpdir.join("pp.parquet"))
+    powerplants.write_pp_store(plants(), store, row_group_size=3000)
+    chunked = powerplants.scenario_units(
+        None,
+        2014,
+        "deflex_region",
+        conf=conf.updated(
+            {
+                "creator": {"pp_chunksize": 1000},
+                "powerplants": {"pp_store": store},
+            }
+        ),
+    )
+    pd.testing.assert_series_equal(
+        chunked.capacity_by(), units.capacity_by(), rtol=1e-6
+    )
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+from scenario_builder import cli
+from scenario_builder import prefetch
+
+
+def mirror_with_files(path, names):
+    mirror = os.path.join(path, "mirror")
+    os.makedirs(mirror)
+    for name in names:
+        with open(os.path.join(mirror, name), "w") as f:
+            f.write(name)
+    return mirror
+
+
+def manifest(checksum=None):
+    ewi = {"source": "ewi.xlsm", "target": "{general}/ewi.xls"}
+    if checksum is not None:
+        ewi["sha256"] = checksum
+    return {
+        "files": [
+            ewi,
+            {
+                "source": "weather_{year}.h5",
+                "target": "{coastdat}/coastdat_{year}.h5",
+            },
+        ]
+    }
+
+
+def paths(tmpdir):
+    return {
+        "general": str(tmpdir.join("local", "general")),
+        "coastdat": str(tmpdir.join("local", "coastdat")),
+    }
+
+
+def test_copy_all_files_of_a_plan(tmpdir):
+    names = ["ewi.xlsm", "weather_2012.h5", "weather_2014.h5"]
+    mirror = mirror_with_files(str(tmpdir), names)
+    checksum = prefetch.file_checksum(os.path.join(mirror, "ewi.xlsm"))
+    files = prefetch.plan(
+        manifest(checksum), [2014, 2012, 2014], paths=paths(tmpdir)
+    )
+    assert len(files) == 3
+    result = prefetch.prefetch(files, mirror, workers=3)
+    assert sorted(result["copied"]) == [f.target for f in files]
+    target = os.path.join(paths(tmpdir)["coastdat"], "coastdat_2012.h5")
+    with open(target) as f:
+        assert f.read() == "weather_2012.h5"
+
+
+def test_missing_files_are_reported_before_copying(tmpdir):
+    mirror = mirror_with_files(str(tmpdir), ["ewi.xlsm", "weather_2014.h5"])
+    files = prefetch.plan(manifest(), [2013, 2014, 2015], paths=paths(tmpdir))
+    with pytest.raises(prefetch.MissingInputs) as error:
+        prefetch.prefetch(files, mirror)
+    assert [f.source for f in error.value.files] == [
+        "weather_2013.h5",
+        "weather_2015.h5",
+    ]
+    assert not os.path.exists(str(tmpdir.join("local")))
+
+
+def test_wrong_checksum(tmpdir):
+    mirror = mirror_with_files(str(tmpdir), ["ewi.xlsm", "weather_2014.h5"])
+    files = prefetch.plan(manifest("0" * 64), [2014], paths=paths(tmpdir))
+    with pytest.raises(prefetch.ChecksumError):
+        prefetch.prefetch(files, mirror)
+    # The other file is copied, the wrong one is not moved to its target.
+    assert os.listdir(paths(tmpdir)["general"]) == []
+    assert os.listdir(paths(tmpdir)["coastdat"]) == ["coastdat_2014.h5"]
+
+
+def test_cli_reports_a_wrong_checksum(tmpdir, monkeypatch, capsys):
+    mirror = mirror_with_files(str(tmpdir), ["ewi.xlsm", "weather_2014.h5"])
+    filename = str(tmpdir.join("manifest.json"))
+    with open(filename, "w") as f:
+        json.dump(manifest("0" * 64), f)
+    plan = prefetch.plan
+    monkeypatch.setattr(
+        prefetch,
+        "plan",
+        lambda *args, **kwargs: plan(*args, paths=paths(tmpdir), **kwargs),
+    )
+    argv = ["prefetch", "--years", "2014", "--manifest", filename]
+    assert cli.main(argv + ["--mirror", mirror]) == 1
+    assert "Checksum" in capsys.readouterr().err
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import build
+from scenario_builder import projection
+from scenario_builder import settings
+
+
+def base():
+    columns = pd.MultiIndex.from_tuples(
+        [("DE01", "district heating"), ("DE02", "district heating")]
+    )
+    return {
+        "general": pd.Series(
+            {
+                "year": 2020,
+                "name": "de_2020",
+                "weather year": 2020,
+                "map": "de",
+            }
+        ),
+        "commodity sources": pd.DataFrame(
+            {"costs": [5.0, 20.0], "emission": [400.0, 200.0]},
+            index=pd.MultiIndex.from_product(
+                [["DE"], ["lignite", "natural gas"]]
+            ),
+        ),
+        "power plants": pd.DataFrame(
+            {
+                "fuel": ["lignite", "natural gas", "lignite"],
+                "capacity": [100.0, 50.0, 300.0],
+            },
+            index=pd.MultiIndex.from_tuples(
+                [
+                    ("DE01", "lignite - 0.4"),
+                    ("DE01", "natural gas - 0.5"),
+                    ("DE02", "lignite - 0.4"),
+                ]
+            ),
+        ),
+        "heat demand series": pd.DataFrame(
+            np.arange(48.0).reshape(24, 2), columns=columns
+        ),
+        "volatile series": pd.DataFrame(np.ones((24, 2))),
+    }
+
+
+def test_wide_factors_with_fallback_to_all_regions():
+    capacity = pd.DataFrame(
+        {2030: [0.5, 2.0], 2040: [0.0, 3.0]},
+        index=pd.MultiIndex.from_tuples(
+            [("*", "lignite"), ("DE02", "lignite")]
+        ),
+    )
+    tables = base()
+    result = projection.project(tables, [2030, 2040], capacity=capacity)
+    pp = {y: t["power plants"]["capacity"].tolist() for y, t in result.items()}
+    assert pp == {2030: [50.0, 50.0, 600.0], 2040: [0.0, 50.0, 900.0]}
+    assert tables["power plants"]["capacity"].tolist() == [100.0, 50.0, 300.0]
+    for table in ("volatile series", "commodity sources"):
+        assert result[2030][table] is tables[table]
+    assert result[2040]["general"]["base year"] == 2020
+    assert result[2040]["general"]["year"] == 2040
+
+
+def test_series_and_costs_are_broadcast_over_all_years():
+    demand = pd.DataFrame(
+        {
+            "region": ["DE01", "*"],
+            "fuel": "*",
+            "year": 2030,
+            "factor": [2.0, 0.5],
+        }
+    )
+    costs = pd.DataFrame(
+        {
+            "region": "*",
+            "fuel": "natural gas",
+            "year": [2020, 2040],
+            "factor": [1.0, 3.0],
+        }
+    )
+    result = projection.project(base(), [2030], demand=demand, costs=costs)[
+        2030
+    ]
+    heat = result["heat demand series"]
+    assert heat.iloc[1].tolist() == [4.0, 1.5]
+    assert result["commodity sources"]["costs"].tolist() == [5.0, 40.0]
+
+
+def test_years_outside_of_the_factors_are_rejected():
+    capacity = pd.DataFrame({2030: [1.0]}, index=[("*", "*")])
+    with pytest.raises(ValueError, match="2050"):
+        projection.project(base(), [2030, 2050], capacity=capacity)
+
+
+def test_write_projections(tmp_path):
+    demand = pd.DataFrame(
+        {"region": "*", "fuel": "*", "year": 2030, "factor": [2.0]}
+    )
+    files = build.write_projections(
+        base(),
+        str(tmp_path),
+        [2030],
+        demand=demand,
+        conf=settings.snapshot(),
+    )
+    assert files == {2030: str(tmp_path / "de_2030_weather2020")}
+    heat = pd.read_csv(
+        tmp_path / "de_2030_weather2020" / "heat demand series.csv",
+        index_col=0,
+        header=[0, 1],
+    )
+    assert heat.iloc[1].tolist() == [4.0, 6.0]
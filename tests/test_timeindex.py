@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import timeindex
+
+
+@pytest.mark.parametrize(
+    "year, weather_year, hours",
+    [(2014, None, 8760), (2016, None, 8784), (2016, 2015, 8760)],
+)
+def test_hours(year, weather_year, hours):
+    cal = timeindex.get_calendar(year, weather_year)
+    assert cal.hours == hours
+    assert cal.index.equals(pd.RangeIndex(hours))
+    assert timeindex.get_calendar(year, year) is timeindex.get_calendar(year)
+
+
+def test_conform_shares_index_and_values():
+    cal = timeindex.get_calendar(2016, 2015)
+    series = pd.DataFrame(
+        {"DE01": np.arange(8784.0)}, index=pd.RangeIndex(8784) + 1
+    )
+    conformed = cal.conform(series)
+    assert conformed.index is cal.index
+    assert np.shares_memory(
+        conformed["DE01"].to_numpy(), series["DE01"].to_numpy()
+    )
+    assert series.index[0] == 1
+    with pytest.raises(ValueError, match="heat demand series has 8000"):
+        cal.conform(series.iloc[:8000], "heat demand series")
+
+
+def test_month_start_hours():
+    hours = timeindex.get_calendar(2016).month_start_hours
+    assert hours[[0, 2, 3, 12]].tolist() == [0, 60 * 24, 1440 + 744, 8784]
+    # Limited to the hours of a non leap weather year.
+    assert timeindex.get_calendar(2016, 2015).month_start_hours[-1] == 8760
@@ -0,0 +1,78 @@
+import os
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import build as build_module
+from scenario_builder import transport
+
+
+def build(seed):
+    rng = np.random.RandomState(seed)
+    columns = pd.MultiIndex.from_product([["DE01", "DE02"], ["wind", "pv"]])
+    tables = {
+        "volatile series": pd.DataFrame(rng.rand(8760, 4), columns=columns),
+        "mobility demand series": pd.DataFrame(
+            rng.randint(0, 100, (8760, 20)).astype(np.int64)
+        ),
+        "power plants": pd.DataFrame({"fuel": ["oil"], "capacity": [1.0]}),
+    }
+    return tables
+
+
+def worker(seed):
+    return transport.share(build(seed), min_bytes=1000)
+
+
+def test_receive_from_worker_processes():
+    with futures.ProcessPoolExecutor(max_workers=2) as pool:
+        shared = list(pool.map(worker, [1, 2]))
+    for seed, collection in zip([1, 2], shared):
+        assert isinstance(
+            collection["volatile series"], transport.SharedTable
+        )
+        assert isinstance(collection["power plants"], pd.DataFrame)
+        received = transport.receive(collection)
+        expected = build(seed)
+        for name, table in expected.items():
+            pd.testing.assert_frame_equal(received[name], table)
+        # The frame uses the shared block directly.
+        values = received["volatile series"]._mgr.blocks[0].values
+        assert not values.flags.owndata
+
+
+def shared_blocks():
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+def build_or_fail(scenario, conf=None):
+    if scenario.year == 2014:
+        raise ValueError("Scenario failed.")
+    return build(scenario.year)
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/dev/shm"), reason="Shared memory is not a directory."
+)
+def test_failed_scenario_frees_shared_blocks(monkeypatch):
+    monkeypatch.setattr(build_module, "build_scenario", build_or_fail)
+    monkeypatch.setattr(build_module, "prepare_maps", lambda *a, **k: None)
+    before = shared_blocks()
+    scenarios = build_module.scenario_grid([2013, 2014, 2015], ["de"])
+    with pytest.raises(ValueError, match="Scenario failed"):
+        build_module.build_collections(scenarios, workers=2, conf=object())
+    assert shared_blocks() == before
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/dev/shm"), reason="Shared memory is not a directory."
+)
+def test_release_unreceived_collection():
+    before = shared_blocks()
+    shared = transport.share(build(1), min_bytes=1000)
+    assert len(shared_blocks() - before) == 2
+    transport.release(shared)
+    transport.release(shared)
+    assert shared_blocks() == before
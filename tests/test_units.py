@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from scenario_builder import units
+
+
+def unit_table(n=1000000, seed=1):
+    rng = np.random.RandomState(seed)
+    regions = np.array(["DE{0:02d}".format(i) for i in range(1, 19)])
+    fuels = np.array(["lignite", "natural gas", "solar", "wind"])
+    return units.UnitTable.from_arrays(
+        capacity=rng.lognormal(0, 1, n),
+        efficiency=rng.uniform(0.3, 0.6, n),
+        region=regions[rng.randint(0, len(regions), n)],
+        fuel=fuels[rng.randint(0, len(fuels), n)],
+    )
+
+
+def test_a_million_units_are_small_and_regions_are_slices():
+    table = unit_table()
+    assert table.nbytes < 15 * 2 ** 20
+    region = table.select(regions="DE05")
+    assert np.shares_memory(region.capacity, table.capacity)
+    assert set(region.regions[region.region]) == {"DE05"}
+    both = table.select(regions=["DE05", "DE07"], fuels="wind")
+    assert set(both.fuels[both.fuel]) == {"wind"}
+    assert len(both) == (region.fuel == 3).sum() + len(
+        table.select(regions="DE07", fuels=["wind"])
+    )
+
+
+def test_concat_merges_the_lookup_indexes():
+    first = units.UnitTable.from_arrays(
+        [1, 2], [0.4, 0.5], ["B", "A"], ["x", "y"]
+    )
+    second = units.UnitTable.from_arrays([3], [0.3], ["C"], ["x"])
+    table = units.UnitTable.concat([first, second])
+    assert list(table.regions) == ["A", "B", "C"]
+    frame = table.to_frame()
+    assert frame["region"].tolist() == ["A", "B", "C"]
+    assert frame["fuel"].tolist() == ["y", "x", "x"]
+    assert frame["capacity"].tolist() == [2.0, 1.0, 3.0]
+
+
+def test_frame_and_file_round_trip(tmp_path):
+    table = unit_table(5000)
+    filename = str(tmp_path / "units.npz")
+    table.save(filename)
+    for copy in (
+        units.UnitTable.from_frame(table.to_frame()),
+        units.UnitTable.load(filename),
+    ):
+        pd.testing.assert_series_equal(copy.capacity_by(), table.capacity_by())
+        np.testing.assert_array_equal(copy.efficiency, table.efficiency)
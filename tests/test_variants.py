@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scenario_builder import variants
+
+
+def base():
+    idx = pd.MultiIndex.from_product([["DE"], ["lignite", "natural gas"]])
+    return {
+        "general": pd.Series({"year": 2014, "name": "base"}),
+        "commodity sources": pd.DataFrame(
+            {"costs": [5.0, 20.0], "emission": [400.0, 200.0]}, index=idx
+        ),
+        "power plants": pd.DataFrame(
+            {
+                "fuel": ["lignite", "lignite", "natural gas"],
+                "capacity": [100.0, 300.0, 50.0],
+            },
+            index=["DE01", "DE02", "DE01"],
+        ),
+        "volatile series": pd.DataFrame(np.ones((24, 2))),
+    }
+
+
+def test_base_is_not_changed_and_untouched_tables_are_shared():
+    tables = base()
+    expected = {name: table.copy() for name, table in tables.items()}
+    variant = variants.derive(
+        tables,
+        name="high co2",
+        co2_price=80,
+        commodity_costs={"lignite": 7.0},
+        capacity_scaling={"lignite": 0.5},
+        limit_elec_pp={"lignite": 1000},
+    )
+    for name, table in expected.items():
+        if isinstance(table, pd.Series):
+            pd.testing.assert_series_equal(tables[name], table)
+        else:
+            pd.testing.assert_frame_equal(tables[name], table)
+    assert variant["volatile series"] is tables["volatile series"]
+    assert variant["general"]["name"] == "high co2"
+    assert variant["general"]["variant co2_price"] == "80"
+
+
+def test_sweep_over_a_grid():
+    result = variants.sweep(
+        base(), co2_price=[10, 20], commodity_costs=[{"lignite": 6.0}, {}]
+    )
+    assert len(result) == 4
+    overrides, variant = result[1]
+    assert overrides == {"co2_price": 10, "commodity_costs": {}}
+    assert variant["commodity sources"]["co2_price"].tolist() == [10.0, 10.0]
+    assert variant["commodity sources"]["costs"].tolist() == [5.0, 20.0]
+    costs = result[0][1]["commodity sources"]["costs"]
+    assert costs.tolist() == [6.0, 20.0]
+
+
+def test_capacity_scaling_and_limit_per_fuel():
+    variant = variants.derive(
+        base(),
+        capacity_scaling={"natural gas": 2.0},
+        limit_elec_pp={"lignite": 1000},
+    )
+    pp = variant["power plants"]
+    assert pp["capacity"].tolist() == [100.0, 300.0, 100.0]
+    assert pp["limit_elec_pp"].tolist() == [250.0, 750.0, float("inf")]
+
+
+def test_unknown_override():
+    with pytest.raises(ValueError, match="Unknown overrides"):
+        variants.derive(base(), co2=10)